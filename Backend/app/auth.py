@@ -1,40 +1,88 @@
+import hashlib
+import time
 from datetime import datetime, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, NamedTuple
 import jwt
 from fastapi import HTTPException, status
+from app.cache import LRUCache
 from app.config import settings
 
 class TokenError:
     INVALID_PAYLOAD = "Invalid token payload"
     EXPIRED = "Token has expired"
     INVALID_TOKEN = "Invalid token"
+    REVOKED = "Token has been revoked"
+
+class TokenClaims(NamedTuple):
+    user_id: int
+    is_admin: bool
+    issued_at: float
+    expires_at: float
+
+# Verified tokens keyed by their sha256, each entry expiring together with the token itself.
+token_cache = LRUCache(settings.TOKEN_CACHE_SIZE)
+# user_id -> is_admin, re-read from the database at most once per ADMIN_STATUS_TTL_SECONDS.
+admin_status_cache = LRUCache(settings.ADMIN_STATUS_CACHE_SIZE, ttl=settings.ADMIN_STATUS_TTL_SECONDS)
+# user_id -> time before which that user's access tokens are rejected. Entries only need to outlive
+# the tokens they revoke, so they expire after one access-token lifetime.
+revoked_users = LRUCache(settings.ADMIN_STATUS_CACHE_SIZE, ttl=settings.TOKEN_EXPIRE_DELTA.total_seconds())
+_revoked_all_before = 0.0
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": settings.AUTH_HEADER},
+    )
 
 def create_access_token(payload_data: Dict[str, Any], expires_delta: timedelta = None) -> str:
     token_data = payload_data.copy()
     expiration = datetime.now(timezone.utc) + (expires_delta or settings.TOKEN_EXPIRE_DELTA)
-    token_data.update({"exp": expiration})
+    # Sub-second iat so a token minted right after a revocation is not caught by it.
+    token_data.update({"exp": expiration, "iat": time.time()})
     return jwt.encode(token_data, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
-def verify_access_token(token: str) -> int:
+def revoke_user_tokens(user_id: int | None = None):
+    global _revoked_all_before
+    if user_id is None:
+        _revoked_all_before = time.time()
+        token_cache.clear()
+        admin_status_cache.clear()
+    else:
+        revoked_users.set(user_id, time.time())
+        admin_status_cache.pop(user_id)
+
+def _check_revoked(claims: TokenClaims):
+    revoked_before = max(_revoked_all_before, revoked_users.get(claims.user_id, 0.0))
+    if claims.issued_at < revoked_before:
+        raise _unauthorized(TokenError.REVOKED)
+
+def decode_access_token(token: str) -> TokenClaims:
+    cache_key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(cache_key)
+    if claims is not None:
+        _check_revoked(claims)
+        return claims
+
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         user_id: int = payload.get("user_id")
         if user_id is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail=TokenError.INVALID_PAYLOAD,
-                headers={"WWW-Authenticate": settings.AUTH_HEADER},
-            )
-        return user_id
+            raise _unauthorized(TokenError.INVALID_PAYLOAD)
     except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=TokenError.EXPIRED,
-            headers={"WWW-Authenticate": settings.AUTH_HEADER},
-        )
+        raise _unauthorized(TokenError.EXPIRED)
     except jwt.PyJWTError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=TokenError.INVALID_TOKEN,
-            headers={"WWW-Authenticate": settings.AUTH_HEADER},
-        )
\ No newline at end of file
+        raise _unauthorized(TokenError.INVALID_TOKEN)
+
+    claims = TokenClaims(
+        user_id=user_id,
+        is_admin=bool(payload.get("is_admin", False)),
+        issued_at=float(payload.get("iat", 0)),
+        expires_at=float(payload.get("exp", time.time() + settings.TOKEN_EXPIRE_DELTA.total_seconds())),
+    )
+    _check_revoked(claims)
+    token_cache.set(cache_key, claims, expires_at=claims.expires_at)
+    return claims
+
+def verify_access_token(token: str) -> int:
+    return decode_access_token(token).user_id
@@ -1,24 +1,264 @@
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+
 import joblib
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+import numpy as np
+
+COMPACT_FORMAT_VERSION = 1
+
+
+def file_checksum(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
 
 class Categorizer:
     def __init__(self):
         self.vectorizer = None
         self.model = None
+        self.model_version = None
 
     def train(self, descriptions, labels):
+        # scikit-learn is imported here rather than at module level so the API only pays for it when
+        # a model is actually unpickled.
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
         self.vectorizer = TfidfVectorizer(max_features=500)
         X = self.vectorizer.fit_transform(descriptions)
         self.model = LogisticRegression(max_iter=1000)
         self.model.fit(X, labels)
 
+    def train_streaming(self, chunks, classes, n_features=2 ** 18, epochs=1):
+        # Out-of-core mode: HashingVectorizer is stateless, so each (descriptions, labels) chunk is
+        # vectorized and fed to partial_fit without ever holding the corpus or a vocabulary in memory.
+        # `chunks` is a callable returning a fresh iterator, so extra epochs re-read the source.
+        from sklearn.feature_extraction.text import HashingVectorizer
+        from sklearn.linear_model import SGDClassifier
+
+        self.vectorizer = HashingVectorizer(n_features=n_features, alternate_sign=False, norm="l2")
+        self.model = SGDClassifier(loss="log_loss", alpha=1e-5, random_state=42)
+        rows = 0
+        for _ in range(epochs):
+            for descriptions, labels in chunks():
+                self.model.partial_fit(self.vectorizer.transform(descriptions), labels, classes=classes)
+                rows += len(labels)
+        return rows
+
+    def search(self, descriptions, labels, param_grid=None, cv=5, n_jobs=-1):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.model_selection import GridSearchCV
+        from sklearn.pipeline import Pipeline
+
+        pipeline = Pipeline([
+            ("vectorizer", TfidfVectorizer(max_features=500)),
+            ("model", LogisticRegression(max_iter=1000)),
+        ])
+        param_grid = param_grid or {
+            "vectorizer__max_features": [500, 2000, None],
+            "vectorizer__ngram_range": [(1, 1), (1, 2)],
+            "model__C": [0.1, 1.0, 10.0],
+        }
+        grid = GridSearchCV(pipeline, param_grid, cv=cv, n_jobs=n_jobs)
+        grid.fit(descriptions, labels)
+        self.vectorizer = grid.best_estimator_.named_steps["vectorizer"]
+        self.model = grid.best_estimator_.named_steps["model"]
+        return grid.best_params_, grid.best_score_
+
     def predict(self, descriptions):
         X = self.vectorizer.transform(descriptions)
         return self.model.predict(X)
 
+    def predict_top_k(self, descriptions, k=3):
+        return top_k(self.model.predict_proba(self.vectorizer.transform(descriptions)), self.model.classes_, k)
+
+    def export_compact(self, path, dtype="float64", prune=0.0):
+        # Plain NumPy arrays for CompactCategorizer. float32 halves the artifact; prune drops the coefficient rows
+        # of terms whose largest |w| is <= prune, while the vocabulary and IDF keep every term for the norms.
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        vectorizer, model = self.vectorizer, self.model
+        if not isinstance(vectorizer, TfidfVectorizer) or not isinstance(model, LogisticRegression):
+            raise ValueError("Only TF-IDF + LogisticRegression models can be exported in the compact format")
+        if (vectorizer.analyzer != "word" or vectorizer.tokenizer or vectorizer.preprocessor
+                or vectorizer.strip_accents or vectorizer.stop_words):
+            raise ValueError("Compact export supports the default word analyzer without stop words or accent stripping")
+
+        terms = np.array(sorted(vectorizer.vocabulary_, key=vectorizer.vocabulary_.get))
+        # Features x classes, so a CSR document matrix multiplies it without a transpose.
+        coef = model.coef_.T.astype(dtype)
+        arrays = {
+            "terms": terms,
+            "idf": vectorizer.idf_.astype(dtype) if vectorizer.use_idf else np.ones(len(terms), dtype=dtype),
+            "intercept": model.intercept_.astype(dtype),
+            "classes": np.asarray(model.classes_).astype(str),
+        }
+        if prune > 0:
+            kept = np.abs(coef).max(axis=1) > prune
+            # Pruned terms point at a trailing all-zero row, so scoring stays a dense matrix product.
+            arrays["coef_rows"] = np.where(kept, np.cumsum(kept) - 1, kept.sum()).astype(np.int32)
+            coef = np.vstack([coef[kept], np.zeros((1, coef.shape[1]), dtype=dtype)])
+        arrays["coef"] = coef
+
+        multi_class = getattr(model, "multi_class", "auto")
+        params = {
+            "format_version": COMPACT_FORMAT_VERSION,
+            "lowercase": vectorizer.lowercase,
+            "token_pattern": vectorizer.token_pattern,
+            "ngram_range": list(vectorizer.ngram_range),
+            "binary": vectorizer.binary,
+            "sublinear_tf": vectorizer.sublinear_tf,
+            "norm": vectorizer.norm,
+            # Mirrors LogisticRegression.predict_proba: normalized sigmoids for OvR/binary, else softmax.
+            "ovr": multi_class in ("ovr", "warn") or (
+                multi_class in ("auto", "deprecated") and (len(model.classes_) <= 2 or model.solver == "liblinear")
+            ),
+        }
+        arrays["params"] = np.array(json.dumps(params))
+
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
     def save(self, path="models/categorizer.pkl"):
-        joblib.dump((self.vectorizer, self.model), path)
+        # Write next to the target and rename, so a running ModelRegistry never sees a partial file.
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        joblib.dump((self.vectorizer, self.model), tmp_path)
+        os.replace(tmp_path, path)
+
+    def load(self, path="models/categorizer.pkl", mmap_mode=None):
+        self.vectorizer, self.model = joblib.load(path, mmap_mode=mmap_mode)
+        self.model_version = file_checksum(path)
+
+
+def top_k(probabilities, classes, k):
+    k = min(k, len(classes))
+    # argpartition finds the k best per row in linear time; only those k are then sorted, ties by class index
+    # (as argmax breaks them) rather than by argpartition's arbitrary order.
+    best = np.sort(np.argpartition(-probabilities, k - 1, axis=1)[:, :k], axis=1)
+    rows = np.arange(len(probabilities))[:, None]
+    best = np.take_along_axis(best, np.argsort(-probabilities[rows, best], axis=1, kind="stable"), axis=1)
+    return [
+        [(str(classes[index]), float(probabilities[row, index])) for index in row_best]
+        for row, row_best in enumerate(best)
+    ]
+
+
+class CompactCategorizer:
+    # NumPy/scipy.sparse inference over an artifact written by Categorizer.export_compact: the labels of the
+    # scikit-learn model without its per-call input validation, which dominates small requests.
+    def __init__(self):
+        self.vocabulary: dict[str, int] = {}
+        self.idf = None
+        self.coef = None
+        self.coef_rows = None
+        self.intercept = None
+        self.classes = None
+        self.params: dict = {}
+        self.model_version = None
+
+    def load(self, path, mmap_mode=None):
+        # Arrays inside an .npz cannot be memory-mapped; mmap_mode is accepted for interface parity only.
+        with np.load(path, allow_pickle=False) as data:
+            self.params = json.loads(data["params"].item())
+            if self.params.get("format_version") != COMPACT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported compact model format {self.params.get('format_version')!r}")
+            self.vocabulary = {term: index for index, term in enumerate(data["terms"].tolist())}
+            self.idf = data["idf"]
+            self.intercept = data["intercept"]
+            self.classes = data["classes"].astype(object)
+            self.coef = data["coef"]
+            self.coef_rows = data["coef_rows"] if "coef_rows" in data else None
+        self._token_pattern = re.compile(self.params["token_pattern"])
+        self.model_version = file_checksum(path)
+
+    def _features(self, text) -> Counter:
+        if self.params["lowercase"]:
+            text = text.lower()
+        tokens = self._token_pattern.findall(text)
+        min_n, max_n = self.params["ngram_range"]
+        if max_n == 1:
+            grams = tokens
+        else:
+            grams = [" ".join(tokens[i:i + n]) for n in range(min_n, max_n + 1) for i in range(len(tokens) - n + 1)]
+        vocabulary = self.vocabulary
+        return Counter(vocabulary[gram] for gram in grams if gram in vocabulary)
+
+    def transform(self, descriptions):
+        from scipy import sparse
+
+        indptr = [0]
+        indices: list[int] = []
+        counts: list[int] = []
+        for text in descriptions:
+            features = self._features(text)
+            indices.extend(features.keys())
+            counts.extend(features.values())
+            indptr.append(len(indices))
+
+        values = np.asarray(counts, dtype=self.idf.dtype)
+        if self.params["binary"]:
+            values[:] = 1
+        elif self.params["sublinear_tf"]:
+            values = np.log(values) + 1
+        indices = np.asarray(indices, dtype=np.int32)
+        values *= self.idf[indices]
+        indptr = np.asarray(indptr, dtype=np.int32)
+
+        norm = self.params["norm"]
+        if norm and len(values):
+            row_lengths = np.diff(indptr)
+            # bincount rather than reduceat: reduceat indexes past the end when the last rows have no known terms.
+            rows = np.repeat(np.arange(len(row_lengths)), row_lengths)
+            per_row = np.bincount(rows, weights=values * values if norm == "l2" else np.abs(values),
+                                  minlength=len(row_lengths)).astype(values.dtype)
+            per_row[row_lengths == 0] = 1
+            if norm == "l2":
+                per_row = np.sqrt(per_row)
+            values /= np.repeat(per_row, row_lengths)
+        if self.coef_rows is not None:
+            # Normalized over the full vocabulary above; only now are pruned terms folded onto the zero row.
+            indices = self.coef_rows[indices]
+        return sparse.csr_matrix((values, indices, indptr), shape=(len(descriptions), len(self.coef)))
+
+    def decision_function(self, descriptions):
+        scores = self.transform(descriptions) @ self.coef + self.intercept
+        return scores.ravel() if scores.shape[1] == 1 else scores
+
+    def predict(self, descriptions):
+        scores = self.decision_function(descriptions)
+        if scores.ndim == 1:
+            return self.classes[(scores > 0).astype(int)]
+        return self.classes[scores.argmax(axis=1)]
+
+    def predict_proba(self, descriptions):
+        scores = self.decision_function(descriptions)
+        if self.params["ovr"]:
+            probabilities = 1 / (1 + np.exp(-scores))
+            if probabilities.ndim == 1:
+                return np.column_stack([1 - probabilities, probabilities])
+            return probabilities / probabilities.sum(axis=1, keepdims=True)
+        if scores.ndim == 1:
+            scores = np.column_stack([-scores, scores])
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_top_k(self, descriptions, k=3):
+        return top_k(self.predict_proba(descriptions), self.classes, k)
+
 
-    def load(self, path="models/categorizer.pkl"):
-        self.vectorizer, self.model = joblib.load(path)
+def load_categorizer(path, mmap_mode=None):
+    # The artifact's extension picks the engine: .npz is the compact format, anything else a joblib pickle.
+    categorizer = CompactCategorizer() if str(path).endswith(".npz") else Categorizer()
+    categorizer.load(path, mmap_mode=mmap_mode)
+    return categorizer
@@ -2,10 +2,22 @@ from dataclasses import dataclass
 from datetime import timedelta
 
 from dotenv import load_dotenv
+from pathlib import Path
 import os
 
 load_dotenv()
 
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def to_async_url(url: str) -> str:
+    for sync_driver, async_driver in (("mysql+pymysql://", "mysql+aiomysql://"), ("mysql://", "mysql+aiomysql://"),
+                                      ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sync_driver):
+            return async_driver + url[len(sync_driver):]
+    return url
+
+
 @dataclass
 class Settings:
     PROJECT_NAME: str = "Finance Categorizer"
@@ -15,19 +27,99 @@ class Settings:
     DB_USER: str = os.getenv("DB_USER")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD")
     DB_NAME: str = os.getenv("DB_NAME")
+    DB_URL: str | None = os.getenv("DATABASE_URL")
+    DB_ASYNC_URL: str | None = os.getenv("ASYNC_DATABASE_URL")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    READ_REPLICA_URL: str | None = os.getenv("READ_REPLICA_URL")
+    # After a write, that user's reads stay on the primary this long so they see their own changes.
+    READ_REPLICA_STICKY_SECONDS: float = float(os.getenv("READ_REPLICA_STICKY_SECONDS", "5"))
+    WEB_HOST: str = os.getenv("WEB_HOST", "0.0.0.0")
+    WEB_PORT: int = int(os.getenv("WEB_PORT", "8000"))
+    # Production worker processes; in-memory state is per worker (see gunicorn.conf.py).
+    WEB_WORKERS: int = int(os.getenv("WEB_WORKERS", str(os.cpu_count() or 1)))
+    WEB_BACKLOG: int = int(os.getenv("WEB_BACKLOG", "2048"))
+    WEB_KEEPALIVE_SECONDS: int = int(os.getenv("WEB_KEEPALIVE_SECONDS", "5"))
+    WEB_LIMIT_CONCURRENCY: int = int(os.getenv("WEB_LIMIT_CONCURRENCY", "1000"))
+    WEB_GRACEFUL_TIMEOUT_SECONDS: int = int(os.getenv("WEB_GRACEFUL_TIMEOUT_SECONDS", "30"))
+    SSL_CERT_PATH: str | None = os.getenv("SSL_CERT_PATH")
+    SSL_KEY_PATH: str | None = os.getenv("SSL_KEY_PATH")
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
     ALGORITHM: str = "HS256"
     TOKEN_EXPIRE_MINUTES: int = 15
     TOKEN_EXPIRE_SECONDS: int = 0
     REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    TOKEN_STORE: str = os.getenv("TOKEN_STORE", "database")
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    TOKEN_PURGE_INTERVAL_SECONDS: float = float(os.getenv("TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+    TOKEN_PURGE_BATCH_SIZE: int = int(os.getenv("TOKEN_PURGE_BATCH_SIZE", "1000"))
+    TOKEN_PURGE_THROTTLE_MS: int = int(os.getenv("TOKEN_PURGE_THROTTLE_MS", "50"))
     SECURE_COOKIES: bool = True
     V1_PREFIX: str = "/api/v1"
     AUTH_HEADER: str = "Bearer"
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+    PASSWORD_HASH_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "32"))
+    TOKEN_CACHE_SIZE: int = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+    ADMIN_STATUS_CACHE_SIZE: int = int(os.getenv("ADMIN_STATUS_CACHE_SIZE", "10000"))
+    ADMIN_STATUS_TTL_SECONDS: float = float(os.getenv("ADMIN_STATUS_TTL_SECONDS", "30"))
+    RESPONSE_CACHE_SIZE: int = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+    IMPORT_MAX_ERRORS: int = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+    MAX_PAGE_SIZE: int = 1000
+    EXPORT_CHUNK_SIZE: int = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+    # auto: MySQL FULLTEXT on MySQL, the token index everywhere else; or force "fulltext" / "index".
+    SEARCH_BACKEND: str = os.getenv("SEARCH_BACKEND", "auto")
+    SEARCH_MAX_TERMS: int = 8
+    SEARCH_PREFIX_EXPANSIONS: int = int(os.getenv("SEARCH_PREFIX_EXPANSIONS", "20"))
+    SEARCH_REINDEX_BATCH_SIZE: int = int(os.getenv("SEARCH_REINDEX_BATCH_SIZE", "2000"))
+    # What a create that matches an existing transaction's fingerprint does: "allow", "flag" or "reject".
+    DUPLICATE_POLICY: str = os.getenv("DUPLICATE_POLICY", "flag")
+    DUPLICATE_WINDOW_HOURS: int = int(os.getenv("DUPLICATE_WINDOW_HOURS", "24"))
+    # How many windows either side of an import batch its per-fingerprint counts are kept for; statements are
+    # roughly date-ordered, so counts for windows the import has left behind are dropped.
+    DUPLICATE_IMPORT_WINDOWS: int = int(os.getenv("DUPLICATE_IMPORT_WINDOWS", "31"))
+    DUPLICATE_SCAN_BATCH_SIZE: int = int(os.getenv("DUPLICATE_SCAN_BATCH_SIZE", "5000"))
+    DUPLICATE_REPORT_LIMIT: int = int(os.getenv("DUPLICATE_REPORT_LIMIT", "1000"))
+    IDEMPOTENCY_KEY_TTL_HOURS: int = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    MODEL_PATH: str = os.getenv("MODEL_PATH", str(BACKEND_DIR / "models" / "categorizer.pkl"))
+    MODEL_MMAP_MODE: str = os.getenv("MODEL_MMAP_MODE", "r")
+    MODEL_RELOAD_INTERVAL_SECONDS: float = float(os.getenv("MODEL_RELOAD_INTERVAL_SECONDS", "30"))
+    ANALYTICS_ROLLUPS: bool = os.getenv("ANALYTICS_ROLLUPS", "false").lower() in ("1", "true", "yes")
+    ANALYTICS_DEFAULT_MONTHS: int = 12
+    CATEGORY_BACKFILL_BATCH_SIZE: int = int(os.getenv("CATEGORY_BACKFILL_BATCH_SIZE", "1000"))
+    CATEGORY_BACKFILL_THROTTLE_MS: int = int(os.getenv("CATEGORY_BACKFILL_THROTTLE_MS", "50"))
+    USER_DELETE_BATCH_SIZE: int = int(os.getenv("USER_DELETE_BATCH_SIZE", "5000"))
+    USER_DELETE_THROTTLE_MS: int = int(os.getenv("USER_DELETE_THROTTLE_MS", "20"))
+    PREDICTION_CACHE_SIZE: int = int(os.getenv("PREDICTION_CACHE_SIZE", "10000"))
+    PREDICTION_MAX_BATCH_SIZE: int = int(os.getenv("PREDICTION_MAX_BATCH_SIZE", "512"))
+    PREDICTION_BATCH_WAIT_MS: float = float(os.getenv("PREDICTION_BATCH_WAIT_MS", "5"))
+    PREDICTION_WORKERS: int = int(os.getenv("PREDICTION_WORKERS", "2"))
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+    # Bearer token for scrapers on /metrics; admins' access tokens are accepted either way.
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    PROFILE_HEADER: str = "X-Profile"
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", str(BACKEND_DIR / "profiles"))
 
     @property
     def DATABASE_URL(self) -> str:
+        if self.DB_URL:
+            return self.DB_URL
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        if self.DB_ASYNC_URL:
+            return self.DB_ASYNC_URL
+        return to_async_url(self.DATABASE_URL)
+
+    @property
+    def ASYNC_READ_REPLICA_URL(self) -> str | None:
+        return to_async_url(self.READ_REPLICA_URL) if self.READ_REPLICA_URL else None
+
     @property
     def TOKEN_EXPIRE_DELTA(self):
         return timedelta(minutes=self.TOKEN_EXPIRE_MINUTES, seconds=self.TOKEN_EXPIRE_SECONDS)
@@ -37,5 +129,6 @@ class Settings:
         USERS = "/users"
         PREDICTIONS = "/predictions"
         ADMIN = "/admin"
+        ANALYTICS = "/analytics"
 
 settings = Settings()
\ No newline at end of file
@@ -1,15 +1,121 @@
-from sqlalchemy import create_engine
+import math
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from app.cache import LRUCache
 from app.config import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True)
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": True, "pool_recycle": settings.DB_POOL_RECYCLE}
+    # SQLite stand-ins use SQLAlchemy's single-connection pools, which reject sizing arguments.
+    if not url.startswith("sqlite"):
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+engine = create_engine(settings.DATABASE_URL, future=True, **engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **engine_options(settings.ASYNC_DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+# Without READ_REPLICA_URL, reads simply share the primary's engine and pool.
+async_read_engine = (
+    create_async_engine(settings.ASYNC_READ_REPLICA_URL, **engine_options(settings.ASYNC_READ_REPLICA_URL))
+    if settings.ASYNC_READ_REPLICA_URL else async_engine
+)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, autoflush=False,
+                                           expire_on_commit=False)
 Base = declarative_base()
 
+# Users who wrote within READ_REPLICA_STICKY_SECONDS, as seen by this process. Other workers learn about the
+# write from the READ_PRIMARY_COOKIE the write's response carries; the window should comfortably exceed the
+# usual replication lag.
+recent_writers = LRUCache(10000, ttl=settings.READ_REPLICA_STICKY_SECONDS)
+READ_PRIMARY_COOKIE = "read_primary_until"
+# Per request (set by ReadYourWritesMiddleware): the watermark the client sent and whether this request wrote.
+request_stickiness: ContextVar[dict | None] = ContextVar("request_stickiness", default=None)
+
+
+def replica_enabled() -> bool:
+    return async_read_engine is not async_engine and settings.READ_REPLICA_STICKY_SECONDS > 0
+
+
+def mark_recent_write(user_id: int):
+    if replica_enabled():
+        recent_writers.set(user_id, True)
+        state = request_stickiness.get()
+        if state is not None:
+            state["wrote"] = True
+
+
+def read_sessionmaker(user_id: int | None = None) -> async_sessionmaker:
+    if user_id is not None and recent_writers.get(user_id):
+        return AsyncSessionLocal
+    state = request_stickiness.get()
+    if state is not None and state["primary_until"] > time.time():
+        return AsyncSessionLocal
+    return AsyncReadSessionLocal
+
+
+class ReadYourWritesMiddleware:
+    # A response to a request that wrote sets READ_PRIMARY_COOKIE to the end of the sticky window, so the
+    # client's next reads stay on the primary whichever worker serves them.
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_enabled():
+            return await self.app(scope, receive, send)
+        try:
+            primary_until = float(HTTPConnection(scope).cookies.get(READ_PRIMARY_COOKIE, 0))
+        except ValueError:
+            primary_until = 0.0
+        state = {"primary_until": primary_until, "wrote": False}
+        token = request_stickiness.set(state)
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and state["wrote"]:
+                sticky = settings.READ_REPLICA_STICKY_SECONDS
+                attributes = "; Secure; SameSite=none" if settings.SECURE_COOKIES else "; SameSite=lax"
+                MutableHeaders(scope=message).append(
+                    "set-cookie",
+                    f"{READ_PRIMARY_COOKIE}={time.time() + sticky:.3f}; Max-Age={math.ceil(sticky)}; Path=/; "
+                    f"HttpOnly{attributes}",
+                )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_stickiness.reset(token)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def test_db_connection() -> bool:
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"❌ Database connection failed: {e}")
+        return False
+    print(f"Connected to {engine.url.render_as_string(hide_password=True)}")
+    return True
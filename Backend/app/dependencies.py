@@ -1,24 +1,49 @@
+import hmac
+
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from app.auth import verify_access_token
-from app.db import get_db
+from app.auth import TokenClaims, admin_status_cache, decode_access_token
+from app.db import get_db, get_async_db, read_sessionmaker
 from app.models import User
 from app.config import settings
 
 bearer_scheme = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> int:
-    return verify_access_token(credentials.credentials)
+def get_current_claims(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme)) -> TokenClaims:
+    return decode_access_token(credentials.credentials)
+
+def get_current_user(claims: TokenClaims = Depends(get_current_claims)) -> int:
+    return claims.user_id
+
+async def get_read_db(user_id: int = Depends(get_current_user)):
+    # Read-only endpoints: served by the replica when configured, except right after the caller wrote.
+    async with read_sessionmaker(user_id)() as db:
+        yield db
 
-def get_admin_user(user_id: int = Depends(get_current_user), db: Session = Depends(get_db)) -> int:
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.is_admin:
+def get_admin_user(claims: TokenClaims = Depends(get_current_claims), db: Session = Depends(get_db)) -> int:
+    if not claims.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
-    return user_id
+    # The claim alone would keep a demoted admin in until the token expires, so it is confirmed
+    # against the database at most once per ADMIN_STATUS_TTL_SECONDS.
+    is_admin = admin_status_cache.get(claims.user_id)
+    if is_admin is None:
+        user = db.query(User).filter(User.id == claims.user_id).first()
+        is_admin = bool(user and user.is_admin)
+        admin_status_cache.set(claims.user_id, is_admin)
+    if not is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return claims.user_id
+
+def get_metrics_reader(credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+                       db: Session = Depends(get_db)):
+    token = credentials.credentials.encode()
+    if settings.METRICS_TOKEN and hmac.compare_digest(token, settings.METRICS_TOKEN.encode()):
+        return
+    get_admin_user(decode_access_token(credentials.credentials), db)
 
 def get_refresh_token(request: Request) -> str:
     token = request.cookies.get("refresh_token")
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token not found")
-    return token
\ No newline at end of file
+    return token
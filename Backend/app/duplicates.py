@@ -0,0 +1,149 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.models import IdempotencyKey, Transaction
+from app.schemas import DuplicatePolicy
+from app.utils import clean_description
+
+EPOCH = datetime(1970, 1, 1)
+CENTS = Decimal("0.01")
+
+
+def duplicate_policy(policy: DuplicatePolicy | None = None) -> DuplicatePolicy:
+    if policy is not None:
+        return policy
+    try:
+        return DuplicatePolicy(settings.DUPLICATE_POLICY)
+    except ValueError:
+        raise RuntimeError(f"Unknown DUPLICATE_POLICY {settings.DUPLICATE_POLICY!r}; use allow, flag or reject")
+
+
+def date_bucket(date: datetime) -> int:
+    # Naive datetimes are UTC, as stored.
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return int((date - EPOCH).total_seconds()) // (settings.DUPLICATE_WINDOW_HOURS * 3600)
+
+
+def transaction_fingerprint(user_id: int, amount, type_, description: str | None, date: datetime,
+                            bucket: int | None = None) -> str:
+    # Amounts are compared in cents and descriptions after the categorizer's normalization, so "TESCO #4411"
+    # and "Tesco #4412" for the same amount on the same day collide; 128 bits keep accidental collisions out.
+    key = "|".join((
+        str(user_id),
+        str(Decimal(amount).quantize(CENTS)),
+        getattr(type_, "value", type_),
+        " ".join(clean_description(description).split()),
+        str(date_bucket(date) if bucket is None else bucket),
+    ))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def recent_fingerprints(user_id: int, amount, type_, description: str | None, date: datetime) -> list[str]:
+    # Buckets are fixed windows: a resubmission just after a boundary lands in the next one, so creates and
+    # edits are also checked against the previous bucket.
+    bucket = date_bucket(date)
+    return [transaction_fingerprint(user_id, amount, type_, description, date, b) for b in (bucket, bucket - 1)]
+
+
+def later_fingerprints(user_id: int, amount, type_, description: str | None, date: datetime) -> list[str]:
+    # The other direction: what rows matched against this one by recent_fingerprints can carry.
+    bucket = date_bucket(date)
+    return [transaction_fingerprint(user_id, amount, type_, description, date, b) for b in (bucket, bucket + 1)]
+
+
+async def find_duplicate(user_id: int, fingerprints: list[str], db: AsyncSession,
+                         before_id: int | None = None) -> int | None:
+    # The earliest transaction with one of these fingerprints; a seek on (user_id, fingerprint), not a scan.
+    query = select(func.min(Transaction.id)).where(Transaction.user_id == user_id,
+                                                   Transaction.fingerprint.in_(fingerprints))
+    if before_id is not None:
+        query = query.where(Transaction.id < before_id)
+    return (await db.execute(query)).scalar_one_or_none()
+
+
+async def fingerprint_matches(user_id: int, fingerprints: set[str], db: AsyncSession) -> dict[str, tuple[int, int]]:
+    # fingerprint -> (how many rows carry it, the earliest of them), for matching a whole import batch at once.
+    if not fingerprints:
+        return {}
+    rows = (await db.execute(
+        select(Transaction.fingerprint, func.count(), func.min(Transaction.id))
+        .where(Transaction.user_id == user_id, Transaction.fingerprint.in_(fingerprints))
+        .group_by(Transaction.fingerprint)
+    )).all()
+    return {fingerprint: (count, first_id) for fingerprint, count, first_id in rows}
+
+
+def request_hash(payload, policy: DuplicatePolicy) -> str:
+    # The duplicate policy decides the response as much as the body does, so a retry under another one is
+    # a different request.
+    return hashlib.sha256(f"{policy.value}|{payload.model_dump_json()}".encode()).hexdigest()
+
+
+async def stored_response(user_id: int, key: str, payload, policy: DuplicatePolicy, db: AsyncSession) -> dict | None:
+    row = (await db.execute(
+        select(IdempotencyKey.request_hash, IdempotencyKey.response, IdempotencyKey.created_at)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )).one_or_none()
+    if row is None:
+        return None
+    created_at = row.created_at if row.created_at.tzinfo else row.created_at.replace(tzinfo=timezone.utc)
+    if created_at < datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS):
+        # Expired but not purged yet: the key is free to be used again.
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key))
+        return None
+    if row.request_hash != request_hash(payload, policy):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Idempotency-Key was already used with a different request")
+    return json.loads(row.response)
+
+
+async def remember_response(user_id: int, key: str, payload, policy: DuplicatePolicy, response: dict,
+                            db: AsyncSession):
+    # Written in the same transaction as the create, so a key is recorded exactly when its transaction is.
+    await db.execute(insert(IdempotencyKey).values(
+        user_id=user_id, key=key, request_hash=request_hash(payload, policy),
+        response=json.dumps(response, default=str), created_at=datetime.now(timezone.utc),
+    ))
+
+
+async def purge_expired_idempotency_keys(batch_size: int) -> int:
+    purged = 0
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    async with AsyncSessionLocal() as db:
+        while True:
+            keys = (await db.execute(
+                select(IdempotencyKey.user_id, IdempotencyKey.key)
+                .where(IdempotencyKey.created_at < cutoff)
+                .limit(batch_size)
+            )).all()
+            if not keys:
+                break
+            await db.execute(delete(IdempotencyKey).where(
+                tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_([tuple(key) for key in keys])
+            ))
+            await db.commit()
+            purged += len(keys)
+            if len(keys) < batch_size:
+                break
+    return purged
+
+
+async def purge_expired_idempotency_keys_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await purge_expired_idempotency_keys(settings.TOKEN_PURGE_BATCH_SIZE)
+            if purged:
+                print(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            print(f"❌ Error purging expired idempotency keys: {e}")
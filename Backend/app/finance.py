@@ -1,31 +1,194 @@
+from decimal import Decimal
+from sqlalchemy import delete, extract, insert, update
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
-from app.models import Transaction, User
+from app.config import settings
+from app.db import mark_recent_write
+from app.models import MonthlyRollup, Transaction, User
 from fastapi import HTTPException, status
 
-def update_user_aggregates(user_id: int, db: Session):
-    try:
-        income = db.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
-            Transaction.user_id == user_id, Transaction.type == "income"
-        ).scalar() or 0
+ZERO = Decimal("0.00")
 
-        expense = db.query(func.coalesce(func.sum(Transaction.amount), 0)).filter(
-            Transaction.user_id == user_id, Transaction.type == "expense"
-        ).scalar() or 0
 
-        balance = income - expense
-        savings = balance
+def signed_amounts(amount: Decimal | None, type_: str | None) -> tuple[Decimal, Decimal]:
+    if amount is None or type_ is None:
+        return ZERO, ZERO
+    type_ = getattr(type_, "value", type_)
+    if type_ == "income":
+        return Decimal(amount), ZERO
+    if type_ == "expense":
+        return ZERO, Decimal(amount)
+    return ZERO, ZERO
+
+
+def aggregate_delta(old: tuple | None = None, new: tuple | None = None) -> tuple[Decimal, Decimal]:
+    old_income, old_expense = signed_amounts(*(old or (None, None))[:2])
+    new_income, new_expense = signed_amounts(*(new or (None, None))[:2])
+    return new_income - old_income, new_expense - old_expense
+
+
+async def apply_aggregate_delta(user_id: int, income_delta: Decimal, expense_delta: Decimal, db: AsyncSession):
+    # Every transaction write passes through here, so this is also where the user's data_version is bumped,
+    # even when the write (e.g. a description edit) leaves the totals unchanged.
+    values = {"data_version": User.data_version + 1}
+    if income_delta or expense_delta:
+        net = income_delta - expense_delta
+        values.update(
+            total_income=User.total_income + income_delta,
+            total_expense=User.total_expense + expense_delta,
+            balance=User.balance + net,
+            savings=User.savings + net,
+        )
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id, User.is_deleted.is_(False))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    mark_recent_write(user_id)
 
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-        user.total_income = income
-        user.total_expense = expense
-        user.balance = balance
-        user.savings = savings
+def rollup_delta(old: tuple | None = None, new: tuple | None = None) -> dict:
+    entries: dict[tuple, tuple[Decimal, int]] = {}
+    for row, sign in ((old, -1), (new, 1)):
+        if row is None:
+            continue
+        amount, type_, date = row
+        key = (date.year, date.month, getattr(type_, "value", type_))
+        total, count = entries.get(key, (ZERO, 0))
+        entries[key] = (total + sign * Decimal(amount), count + sign)
+    return {key: value for key, value in entries.items() if value != (ZERO, 0)}
+
+
+async def apply_rollup_delta(user_id: int, entries: dict, db: AsyncSession):
+    if not settings.ANALYTICS_ROLLUPS or not entries:
+        return
+    dialect = db.bind.dialect.name
+    for (year, month, type_), (total, count) in entries.items():
+        values = {"user_id": user_id, "year": year, "month": month, "type": type_, "total": total, "count": count}
+        if dialect == "mysql":
+            stmt = mysql_insert(MonthlyRollup).values(**values)
+            stmt = stmt.on_duplicate_key_update(
+                total=MonthlyRollup.total + stmt.inserted.total,
+                count=MonthlyRollup.count + stmt.inserted.count,
+            )
+        else:
+            stmt = sqlite_insert(MonthlyRollup).values(**values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["user_id", "year", "month", "type"],
+                set_={"total": MonthlyRollup.total + stmt.excluded.total,
+                      "count": MonthlyRollup.count + stmt.excluded.count},
+            )
+        await db.execute(stmt)
+
+
+def rebuild_monthly_rollups(db: Session, user_id: int | None = None) -> dict:
+    year = extract("year", Transaction.date)
+    month = extract("month", Transaction.date)
+    totals = db.query(
+        Transaction.user_id, year, month, Transaction.type,
+        func.sum(Transaction.amount), func.count(Transaction.id),
+    ).group_by(Transaction.user_id, year, month, Transaction.type)
+    stale = delete(MonthlyRollup)
+    if user_id is not None:
+        totals = totals.filter(Transaction.user_id == user_id)
+        stale = stale.where(MonthlyRollup.user_id == user_id)
+    try:
+        db.execute(stale)
+        rows = [
+            {"user_id": owner_id, "year": int(y), "month": int(m), "type": type_, "total": total, "count": count}
+            for owner_id, y, m, type_, total, count in totals
+        ]
+        if rows:
+            db.execute(insert(MonthlyRollup), rows)
         db.commit()
     except Exception as e:
         db.rollback()
-        print(f"❌ Error updating user aggregates: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to update aggregates")
\ No newline at end of file
+        print(f"❌ Error rebuilding monthly rollups: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to rebuild rollups")
+    return {"rows": len(rows)}
+
+
+def _user_totals(db: Session, user_id: int) -> tuple[Decimal, Decimal]:
+    income = expense = ZERO
+    for type_, total in db.query(Transaction.type, func.coalesce(func.sum(Transaction.amount), 0)).filter(
+        Transaction.user_id == user_id
+    ).group_by(Transaction.type):
+        row_income, row_expense = signed_amounts(Decimal(total), type_)
+        income += row_income
+        expense += row_expense
+    return income, expense
+
+
+def reconcile_user_aggregates(db: Session, user_id: int | None = None, repair: bool = True) -> dict:
+    sums = db.query(
+        Transaction.user_id,
+        Transaction.type,
+        func.coalesce(func.sum(Transaction.amount), 0),
+    ).group_by(Transaction.user_id, Transaction.type)
+    users = db.query(User)
+    if user_id is not None:
+        sums = sums.filter(Transaction.user_id == user_id)
+        users = users.filter(User.id == user_id)
+
+    expected: dict[int, list[Decimal]] = {}
+    for owner_id, type_, total in sums:
+        income, expense = signed_amounts(Decimal(total), type_)
+        totals = expected.setdefault(owner_id, [ZERO, ZERO])
+        totals[0] += income
+        totals[1] += expense
+
+    drifted = []
+    checked = 0
+    for user in users.yield_per(1000):
+        checked += 1
+        income, expense = expected.get(user.id, (ZERO, ZERO))
+        balance = income - expense
+        stored = (user.total_income, user.total_expense, user.balance, user.savings)
+        if stored == (income, expense, balance, balance):
+            continue
+        drifted.append({
+            "user_id": user.id,
+            "stored": {"total_income": str(stored[0]), "total_expense": str(stored[1]),
+                       "balance": str(stored[2]), "savings": str(stored[3])},
+            "expected": {"total_income": str(income), "total_expense": str(expense),
+                         "balance": str(balance), "savings": str(balance)},
+        })
+
+    if repair and drifted:
+        # The scan above takes no locks, so a delta write may have landed since. Each repair locks the user row
+        # first and only then sums: the sums include every delta committed before the lock, and deltas arriving
+        # later wait for the repair's commit and apply on top of the corrected totals.
+        db.rollback()
+        try:
+            for entry in drifted:
+                locked = db.query(User.id).filter(User.id == entry["user_id"]).with_for_update().one_or_none()
+                if locked is None:
+                    db.rollback()
+                    continue
+                income, expense = _user_totals(db, entry["user_id"])
+                entry["expected"] = {"total_income": str(income), "total_expense": str(expense),
+                                     "balance": str(income - expense), "savings": str(income - expense)}
+                db.query(User).filter(User.id == entry["user_id"]).update(
+                    {
+                        User.total_income: income,
+                        User.total_expense: expense,
+                        User.balance: income - expense,
+                        User.savings: income - expense,
+                        User.data_version: User.data_version + 1,
+                    },
+                    synchronize_session=False,
+                )
+                db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error reconciling user aggregates: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail="Failed to reconcile aggregates")
+
+    return {"checked": checked, "drifted": len(drifted), "repaired": repair, "users": drifted}
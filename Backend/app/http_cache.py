@@ -0,0 +1,56 @@
+from typing import Awaitable, Callable
+
+from fastapi import HTTPException, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import LRUCache
+from app.config import settings
+from app.models import User
+
+# (user_id, data_version, path, query) -> (body bytes, extra headers). A write bumps data_version, so stale
+# entries are never looked up again and simply age out through the TTL or LRU eviction.
+response_cache = LRUCache(settings.RESPONSE_CACHE_SIZE, ttl=settings.RESPONSE_CACHE_TTL_SECONDS)
+
+Renderer = Callable[[], Awaitable[tuple[bytes, dict]]]
+
+
+async def get_data_version(user_id: int, db: AsyncSession) -> int:
+    version = (await db.execute(
+        select(User.data_version).where(User.id == user_id, User.is_deleted.is_(False))
+    )).scalar_one_or_none()
+    if version is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return version
+
+
+def make_etag(user_id: int, version: int) -> str:
+    return f'W/"{user_id}-{version}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): the W/ prefix is ignored on both sides.
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+async def conditional_response(request: Request, user_id: int, db: AsyncSession, render: Renderer) -> Response:
+    # 304 when the client's ETag is current, else the cached body. The version is read before rendering, so a
+    # concurrent write can only make a cached body newer than its key, never older.
+    version = await get_data_version(user_id, db)
+    etag = make_etag(user_id, version)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    key = (user_id, version, request.url.path, tuple(sorted(request.query_params.multi_items())))
+    cached = response_cache.get(key)
+    if cached is None:
+        cached = await render()
+        response_cache.set(key, cached)
+    body, extra_headers = cached
+    return Response(content=body, media_type="application/json", headers={**extra_headers, **headers})
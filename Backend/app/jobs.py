@@ -0,0 +1,81 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+
+
+class Job:
+    def __init__(self, name: str, params: dict):
+        self.id = uuid4().hex[:12]
+        self.name = name
+        self.params = params
+        self.status = "pending"
+        self.progress: dict = {}
+        self.error: str | None = None
+        self.created_at = datetime.now(timezone.utc)
+        self.finished_at: datetime | None = None
+        self.task: asyncio.Task | None = None
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "params": {key: value for key, value in self.params.items()
+                       if isinstance(value, (str, int, float, bool, type(None)))},
+            "progress": self.progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobRegistry:
+    def __init__(self, max_jobs: int = 100):
+        self.max_jobs = max_jobs
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+
+    def start(self, name: str, fn, **params) -> Job:
+        job = Job(name, params)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if oldest.status == "running":
+                break
+            self._jobs.popitem(last=False)
+        job.task = asyncio.get_running_loop().create_task(self._run(job, fn, params))
+        return job
+
+    async def _run(self, job: Job, fn, params: dict):
+        job.status = "running"
+        try:
+            await fn(job, **params)
+            job.status = "completed"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            print(f"❌ Job {job.name} ({job.id}) failed: {e}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+
+    def get(self, job_id: str) -> Job:
+        job = self._jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+        return job
+
+    def cancel(self, job_id: str) -> Job:
+        job = self.get(job_id)
+        if job.task and not job.task.done():
+            job.task.cancel()
+        return job
+
+    def list(self) -> list[Job]:
+        return list(reversed(self._jobs.values()))
+
+
+job_registry = JobRegistry()
@@ -1,16 +1,46 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from app.config import settings
+from app.db import ReadYourWritesMiddleware, async_engine, async_read_engine, engine
+from app.dependencies import get_metrics_reader
+from app.model_registry import model_registry
+from app.metrics import MetricsMiddleware, instrument_engine, instrument_pool, registry
 from app.routes import router
+from app.duplicates import purge_expired_idempotency_keys_periodically
+from app.token_store import purge_expired_tokens_periodically
 import os
 from pathlib import Path
 
 #FRONTEND_DIR = Path(__file__).resolve().parent.parent.parent / "Frontend"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the categorizer before serving (a no-op when the gunicorn master preloaded it), off the event loop.
+    try:
+        await model_registry.get_async()
+    except Exception as e:
+        print(f"❌ Error loading categorizer from {model_registry.path}: {e}")
+    purge_tasks = []
+    if settings.TOKEN_PURGE_INTERVAL_SECONDS > 0:
+        purge_tasks = [
+            asyncio.create_task(purge_expired_tokens_periodically(settings.TOKEN_PURGE_INTERVAL_SECONDS)),
+            asyncio.create_task(purge_expired_idempotency_keys_periodically(settings.TOKEN_PURGE_INTERVAL_SECONDS)),
+        ]
+    yield
+    for task in purge_tasks:
+        task.cancel()
+
+
 app = FastAPI(
     title="Finance Categorizer API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -29,7 +59,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Content-Disposition"],
 )
+if settings.METRICS_ENABLED:
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "async")
+    instrument_pool(engine, "sync")
+    instrument_pool(async_engine.sync_engine, "async")
+    if async_read_engine is not async_engine:
+        instrument_engine(async_read_engine.sync_engine, "async_read")
+        instrument_pool(async_read_engine.sync_engine, "async_read")
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(get_metrics_reader)])
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# Passes requests straight through unless a read replica is configured.
+app.add_middleware(ReadYourWritesMiddleware)
+
 app.include_router(router)
 # Mount the Frontend directory
 #app.mount("/", StaticFiles(directory=str(FRONTEND_DIR), html=True), name="frontend")
\ No newline at end of file
@@ -0,0 +1,298 @@
+import bisect
+import contextvars
+import cProfile
+import io
+import pstats
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+
+from sqlalchemy import event
+
+from app.auth import decode_access_token
+from app.config import settings
+
+# Seconds; roughly Prometheus' defaults, extended down for sub-millisecond DB and cache hits.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}_total{_format_labels(self.labels, key)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # label values -> [per-bucket counts (non-cumulative, +Inf last), sum, count]
+        self._series: dict[tuple, list] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items()]
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        # Values are read at scrape time, e.g. from a connection pool, rather than pushed.
+        self._functions: dict = {}
+
+    def set_function(self, fn, **labels):
+        self._functions[tuple(labels.get(name, "") for name in self.labels)] = fn
+
+    def samples(self):
+        for key, fn in list(self._functions.items()):
+            yield f"{self.name}{_format_labels(self.labels, key)} {fn()}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def counter(self, name: str, help: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help: str, labels: tuple = ()) -> Gauge:
+        metric = Gauge(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: tuple = (), buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4.
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Request latency by route template", ("method", "route", "status"))
+db_queries_per_request = registry.histogram(
+    "db_queries_per_request", "SQL statements executed per request", ("route",), COUNT_BUCKETS)
+db_time_per_request = registry.histogram(
+    "db_time_per_request_seconds", "Time spent in SQL statements per request", ("route",))
+db_queries = registry.counter("db_queries", "SQL statements executed", ("engine",))
+model_inference_duration = registry.histogram(
+    "model_inference_duration_seconds", "Categorizer transform+predict time per batch")
+model_inference_rows = registry.counter("model_inference_rows", "Descriptions run through the categorizer")
+model_inference_failures = registry.counter(
+    "model_inference_failures", "Writes stored without a category because the categorizer failed")
+password_hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt time per call, excluding queueing", ("operation",))
+db_pool_checkouts = registry.counter("db_pool_checkouts", "Connections handed out by the pool", ("engine",))
+db_pool_connects = registry.counter("db_pool_connects", "New DBAPI connections opened by the pool", ("engine",))
+db_pool_checked_out = registry.gauge("db_pool_checked_out", "Connections currently checked out", ("engine",))
+db_pool_overflow = registry.gauge("db_pool_overflow", "Connections open beyond pool_size", ("engine",))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# Set by the middleware for each request; the SQLAlchemy hooks mutate it in place, which also works from the
+# threadpool (sync routes) and from AsyncSession greenlets, since both run with a copy of the request context.
+request_stats: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        db_queries.inc(engine=name)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+
+def instrument_pool(engine, name: str):
+    pool = engine.pool
+
+    @event.listens_for(engine, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checkouts.inc(engine=name)
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        db_pool_connects.inc(engine=name)
+
+    # Only QueuePool variants track these; SQLite's single-connection pools report nothing.
+    if hasattr(pool, "checkedout"):
+        db_pool_checked_out.set_function(pool.checkedout, engine=name)
+        db_pool_overflow.set_function(lambda: max(pool.overflow(), 0), engine=name)
+
+
+def route_template(scope) -> str:
+    route = scope.get("route")
+    # Unmatched paths share one label so scanners cannot blow up the series count.
+    return getattr(route, "path", None) or "unmatched"
+
+
+class RequestProfiler:
+    # One request at a time under cProfile, stats written to PROFILE_DIR. cProfile sees everything the loop runs
+    # meanwhile, so the dumps are for ad-hoc diagnosis; a second profiling request is served unprofiled.
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.active = False
+
+    def wants(self, scope) -> bool:
+        headers = dict(scope.get("headers") or [])
+        if not headers.get(settings.PROFILE_HEADER.lower().encode()) or self.active:
+            return False
+        authorization = headers.get(b"authorization", b"").decode()
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() != settings.AUTH_HEADER.lower() or not token:
+            return False
+        try:
+            return decode_access_token(token).is_admin
+        except Exception:
+            return False
+
+    def start(self) -> cProfile.Profile:
+        self.active = True
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile: cProfile.Profile, scope) -> str:
+        profile.disable()
+        self.active = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        route = route_template(scope).strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+        name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S%f}-{scope['method'].lower()}-{route}.prof"
+        profile.dump_stats(self.directory / name)
+        return name
+
+    def report(self, name: str, limit: int = 50, sort: str = "cumulative") -> str:
+        path = self.directory / Path(name).name
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def list(self) -> list[str]:
+        if not self.directory.exists():
+            return []
+        return sorted((path.name for path in self.directory.glob("*.prof")), reverse=True)
+
+
+profiler = RequestProfiler(settings.PROFILE_DIR)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status_code = 500
+        profile = profiler.start() if profiler.wants(scope) else None
+        held_start = None
+
+        async def send_wrapper(message):
+            nonlocal status_code, held_start
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if profile is not None:
+                    # Headers go out once the profile is written, so they can name the dump.
+                    held_start = message
+                    return
+            elif profile is not None and message["type"] == "http.response.body" and not message.get("more_body"):
+                name = profiler.stop(profile, scope)
+                held_start["headers"] = list(held_start["headers"]) + [(b"x-profile", name.encode())]
+                await send(held_start)
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if profile is not None and profiler.active:
+                profiler.stop(profile, scope)
+            request_stats.reset(token)
+            route = route_template(scope)
+            http_request_duration.observe(time.perf_counter() - started,
+                                          method=scope["method"], route=route, status=status_code)
+            db_queries_per_request.observe(stats.queries, route=route)
+            db_time_per_request.observe(stats.db_seconds, route=route)
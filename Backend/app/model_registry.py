@@ -0,0 +1,83 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from threading import Lock
+
+from app.categorizer import Categorizer, CompactCategorizer, load_categorizer
+from app.config import settings
+
+
+class ModelRegistry:
+    def __init__(self, path: str, reload_interval: float = 0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.loaded_at: datetime | None = None
+        self.load_seconds: float | None = None
+        self._model: Categorizer | CompactCategorizer | None = None
+        self._file_stat: tuple | None = None
+        self._last_check = 0.0
+        self._lock = Lock()
+        self._reload_task: asyncio.Task | None = None
+
+    def get(self) -> Categorizer | CompactCategorizer:
+        model = self._model
+        if model is None:
+            return self.reload(force=False)
+        if self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            return self.reload(force=False)
+        return model
+
+    async def get_async(self) -> Categorizer | CompactCategorizer:
+        # For the event loop: loading (joblib.load) and the periodic stat run on a thread. Once a model is
+        # loaded, a due check reloads in the background and requests keep using the current version meanwhile.
+        model = self._model
+        if model is None:
+            return await asyncio.to_thread(self.get)
+        if self.reload_interval > 0 and time.monotonic() - self._last_check >= self.reload_interval:
+            if self._reload_task is None or self._reload_task.done():
+                self._reload_task = asyncio.create_task(asyncio.to_thread(self.reload, False))
+        return model
+
+    def reload(self, force: bool = True) -> Categorizer | CompactCategorizer:
+        with self._lock:
+            self._last_check = time.monotonic()
+            try:
+                file_stat = self._stat()
+                if self._model is not None and not force and file_stat == self._file_stat:
+                    return self._model
+                model = self._load()
+            except Exception as e:
+                if self._model is None:
+                    raise
+                print(f"❌ Error reloading model from {self.path}, keeping version {self._model.model_version}: {e}")
+                return self._model
+            # Readers grab self._model without the lock; rebinding the attribute swaps atomically.
+            self._model, self._file_stat = model, file_stat
+            return model
+
+    def info(self) -> dict:
+        model = self._model
+        return {
+            "path": self.path,
+            "loaded": model is not None,
+            "version": model.model_version if model else None,
+            "format": None if model is None else "compact" if isinstance(model, CompactCategorizer) else "joblib",
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds,
+        }
+
+    def _stat(self) -> tuple:
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self) -> Categorizer | CompactCategorizer:
+        started = time.perf_counter()
+        # Memory-mapped arrays are backed by the page cache, so workers loading the same artifact share them.
+        model = load_categorizer(self.path, mmap_mode=settings.MODEL_MMAP_MODE or None)
+        self.load_seconds = time.perf_counter() - started
+        self.loaded_at = datetime.now(timezone.utc)
+        return model
+
+
+model_registry = ModelRegistry(settings.MODEL_PATH, settings.MODEL_RELOAD_INTERVAL_SECONDS)
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, String, Numeric, DateTime, Boolean
+from sqlalchemy import Integer, String, Numeric, DateTime, Boolean, Index, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime, timezone
 from decimal import Decimal
@@ -18,6 +18,10 @@ class User(Base):
     savings: Mapped[Decimal] = mapped_column(Numeric(precision=10, scale=2), default=Decimal('0.00'))
     goal: Mapped[Decimal | None] = mapped_column(Numeric(precision=10, scale=2), nullable=True)
     is_admin: Mapped[bool] = mapped_column(Boolean, default=False)
+    # Set by an admin deletion; the row stays (keeping its id out of reuse) until the purge job has removed the data.
+    is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, server_default="0")
+    # Bumped by every profile or transaction write; ETags for the user's cached GETs are derived from it.
+    data_version: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     date_created: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
 
 class Transaction(Base):
@@ -28,11 +32,75 @@ class Transaction(Base):
     type: Mapped[str] = mapped_column(String)
     description: Mapped[str | None] = mapped_column(String, nullable=True)
     date: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+    category: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    category_model_version: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    # Hash of (user, amount, type, normalized description, date bucket); see app/duplicates.py.
+    fingerprint: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    # Set when the row was written although it matched an earlier transaction's fingerprint.
+    duplicate_of: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index("ix_transactions_user_date_id", "user_id", "date", "id"),
+        Index("ix_transactions_user_amount", "user_id", "amount"),
+        Index("ix_transactions_user_type_date", "user_id", "type", "date"),
+        Index("ix_transactions_user_category", "user_id", "category"),
+        Index("ix_transactions_user_fingerprint", "user_id", "fingerprint"),
+        # Search backend on MySQL; other databases use the transaction_search_tokens index below instead.
+        Index("ix_transactions_description_fulltext", "description", mysql_prefix="FULLTEXT").ddl_if(dialect="mysql"),
+    )
+
+class TransactionSearchToken(Base):
+    # Inverted index for the non-FULLTEXT search backend: one row per (transaction, distinct description token).
+    # The key order lets a search walk one token's postings newest first and probe other tokens by point lookups.
+    __tablename__ = "transaction_search_tokens"
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    token: Mapped[str] = mapped_column(String(64), primary_key=True)
+    date: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    transaction_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_transaction_search_tokens_transaction", "transaction_id"),
+    )
+
+class TransactionSearchTerm(Base):
+    # Per-user token vocabulary with posting counts: expands prefixes and picks the rarest term to drive a search.
+    __tablename__ = "transaction_search_terms"
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    token: Mapped[str] = mapped_column(String(64), primary_key=True)
+    doc_count: Mapped[int] = mapped_column(Integer, default=0)
+
+class IdempotencyKey(Base):
+    # The stored response of a create sent with an Idempotency-Key header, replayed when the request is retried.
+    __tablename__ = "idempotency_keys"
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64))
+    response: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime, index=True, default=lambda: datetime.now(timezone.utc))
+
+class MonthlyRollup(Base):
+    __tablename__ = "monthly_rollups"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+    year: Mapped[int] = mapped_column(Integer)
+    month: Mapped[int] = mapped_column(Integer)
+    type: Mapped[str] = mapped_column(String(16))
+    total: Mapped[Decimal] = mapped_column(Numeric(precision=12, scale=2), default=Decimal('0.00'))
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "year", "month", "type", name="uq_monthly_rollups_user_month_type"),
+    )
 
 class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    user_id: Mapped[int] = mapped_column(Integer, index=True)
-    token: Mapped[str] = mapped_column(String, unique=True, index=True)
-    expires_at: Mapped[datetime] = mapped_column(DateTime)
+    user_id: Mapped[int] = mapped_column(Integer)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Serves per-user revocation and the admin session listing's "user has an unexpired token" probe.
+        Index("ix_refresh_tokens_user_expires", "user_id", "expires_at"),
+    )
@@ -0,0 +1,61 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.metrics import password_hash_duration
+from app.utils import pwd_context
+
+
+class PasswordHasher:
+    # bcrypt releases the GIL while hashing, so a thread pool gives real parallelism without
+    # shipping hashes between processes.
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.max_in_flight = workers + queue_limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _timed(operation: str, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            password_hash_duration.observe(time.perf_counter() - started, operation=operation)
+
+    async def _run(self, operation: str, fn, *args):
+        # in_flight is only touched from the event loop thread, so no lock is needed.
+        if self.in_flight >= self.max_in_flight:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many authentication requests, please retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._timed, operation, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed: str) -> tuple[bool, str | None]:
+        return await self._run("verify", pwd_context.verify_and_update, password, hashed)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "rejected": self.rejected,
+        }
+
+
+password_hasher = PasswordHasher(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_QUEUE_LIMIT)
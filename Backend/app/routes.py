@@ -1,20 +1,42 @@
-from fastapi import APIRouter, Depends, FastAPI
-from fastapi.responses import RedirectResponse
+from datetime import datetime
+from fastapi import APIRouter, Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import PlainTextResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from app.config import settings
-from app.dependencies import get_db, get_admin_user, get_refresh_token, get_current_user
+from app.dependencies import get_db, get_async_db, get_read_db, get_admin_user, get_refresh_token, get_current_user
 from app.services.auth import register_user, login_user, refresh_token_db, logout_user
 from app.services.users import get_user_profile, update_user_profile
-from app.services.transactions import get_transactions, create_transaction, update_transaction, delete_transaction
-from app.services.admin import get_logged_in_users, set_user_admin, delete_user, logout_all_users
+from app.services.transactions import (
+    get_transactions, create_transaction, create_transaction_once, update_transaction, delete_transaction,
+    apply_transaction_batch
+)
+from app.services.imports import ImportFormat, import_transactions
+from app.services.exports import ExportFormat, export_transactions
+from app.services.search import rebuild_search_index, search_transactions
+from app.services.duplicates import scan_duplicate_transactions
+from app.services.categories import backfill_categories
+from app.services.analytics import get_dashboard, get_monthly_summary, get_category_spend, get_savings_progress
+from app.services.admin import (
+    get_logged_in_users, set_user_admin, delete_user, resume_user_data_purge, logout_all_users
+)
+from app.finance import reconcile_user_aggregates, rebuild_monthly_rollups
 from app.schemas import (
-    PredictionResponse, TokenResponse, TransactionCreateRequest,
+    CategoryProbability, PredictionResponse, TokenResponse, TransactionCreateRequest,
     TransactionUpdateRequest, UserLoginRequest, UserRegisterRequest,
     UserResponse, UserUpdateRequest, AdminUserResponse, AdminUpdateRequest,
-    TransactionRequest, TransactionResponse
+    TransactionRequest, TransactionResponse, TransactionFilters, TransactionBatchRequest, DuplicatePolicy,
+    AdminUserFilters, AnalyticsDashboard, MonthlySummary, CategorySpend, SavingsProgress,
+    transaction_rows_adapter, admin_user_rows_adapter
 )
-from app.categorizer import Categorizer
-from app.utils import clean_description
+from app.model_registry import model_registry
+from app.jobs import job_registry
+from app.auth import admin_status_cache, revoked_users, token_cache
+from app.passwords import password_hasher
+from app.token_store import purge_expired_tokens
+from app.http_cache import conditional_response, response_cache
+from app.metrics import profiler
+from app.services.predictions import PredictionService
 
 app = FastAPI()
 router = APIRouter(prefix=settings.V1_PREFIX)
@@ -22,9 +44,9 @@ transaction_router = APIRouter(prefix=settings.Endpoints.TRANSACTIONS, tags=["Tr
 user_router = APIRouter(prefix=settings.Endpoints.USERS, tags=["Users"])
 prediction_router = APIRouter(prefix=settings.Endpoints.PREDICTIONS, tags=["Predictions"])
 admin_router = APIRouter(prefix=settings.Endpoints.ADMIN, tags=["Admin"])
+analytics_router = APIRouter(prefix=settings.Endpoints.ANALYTICS, tags=["Analytics"])
 
-model = Categorizer()
-model.load("models/categorizer.pkl")
+prediction_service = PredictionService(model_registry)
 
 
 @router.get("/")
@@ -32,61 +54,139 @@ async def redirect_to_frontend():
     return RedirectResponse(url="/index.html")
 
 
-@prediction_router.post("/predict", response_model=PredictionResponse)
-def predict_categories(request: TransactionRequest):
-    cleaned = [clean_description(desc) for desc in request.descriptions]
-    predictions = model.predict(cleaned)
-    return PredictionResponse(predictions=predictions.tolist())
+@prediction_router.post("/predict", response_model=PredictionResponse, response_model_exclude_none=True)
+async def predict_categories(request: TransactionRequest, top_k: int = Query(0, ge=0, le=10)):
+    if not top_k:
+        return PredictionResponse(predictions=await prediction_service.predict(request.descriptions))
+    # One inference for both fields, so the label is always the first of its row even across a model reload.
+    top = await prediction_service.predict_top_k(request.descriptions, top_k)
+    return PredictionResponse(predictions=[row[0][0] for row in top], top=[
+        [CategoryProbability(category=category, probability=probability) for category, probability in row]
+        for row in top
+    ])
 
 
 @user_router.post("/register", response_model=TokenResponse)
-def register(user: UserRegisterRequest, db: Session = Depends(get_db)):
-    return register_user(user, db)
+async def register(user: UserRegisterRequest, db: AsyncSession = Depends(get_async_db)):
+    return await register_user(user, db)
 
 
 @user_router.post("/login", response_model=TokenResponse)
-def login(user: UserLoginRequest, db: Session = Depends(get_db)):
-    return login_user(user, db)
+async def login(user: UserLoginRequest, db: AsyncSession = Depends(get_async_db)):
+    return await login_user(user, db)
 
 
 @user_router.post("/refresh", response_model=TokenResponse)
-def refresh(token: str = Depends(get_refresh_token), db: Session = Depends(get_db)):
-    return refresh_token_db(token, db)
+async def refresh(token: str = Depends(get_refresh_token), db: AsyncSession = Depends(get_async_db)):
+    return await refresh_token_db(token, db)
 
 
 @user_router.post("/logout")
-def logout(token: str = Depends(get_refresh_token), db: Session = Depends(get_db)):
-    return logout_user(token, db)
+async def logout(token: str = Depends(get_refresh_token), db: AsyncSession = Depends(get_async_db)):
+    return await logout_user(token, db)
 
 
 @user_router.get("/me", response_model=UserResponse)
-def get_profile(user_id: int = Depends(get_current_user), db: Session = Depends(get_db)):
-    return get_user_profile(user_id, db)
+async def get_profile(request: Request, user_id: int = Depends(get_current_user),
+                      db: AsyncSession = Depends(get_read_db)):
+    async def render():
+        return (await get_user_profile(user_id, db)).model_dump_json().encode(), {}
+    return await conditional_response(request, user_id, db, render)
 
 
 @user_router.put("/me", response_model=UserResponse)
 async def update_profile(update_data: UserUpdateRequest, user_id: int = Depends(get_current_user),
-                         db: Session = Depends(get_db)):
-    return update_user_profile(update_data, user_id, db)
+                         db: AsyncSession = Depends(get_async_db)):
+    return await update_user_profile(update_data, user_id, db)
 
 
 @transaction_router.get("/transactions", response_model=list[TransactionResponse])
 async def list_transactions(
-        skip: int = 0,
-        limit: int = 10,
+        request: Request,
+        skip: int = Query(0, ge=0),
+        limit: int = Query(10, ge=1, le=settings.MAX_PAGE_SIZE),
+        cursor: str | None = None,
+        filters: TransactionFilters = Depends(),
         user_id: int = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_read_db)
+):
+    async def render():
+        transactions, next_cursor = await get_transactions(user_id, skip, limit, db, cursor, filters)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return transaction_rows_adapter.dump_json(transactions), headers
+    return await conditional_response(request, user_id, db, render)
+
+
+@transaction_router.get("/search", response_model=list[TransactionResponse])
+async def search_transactions_endpoint(
+        request: Request,
+        q: str = Query(..., min_length=1, max_length=255),
+        limit: int = Query(20, ge=1, le=settings.MAX_PAGE_SIZE),
+        cursor: str | None = None,
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
 ):
-    return get_transactions(user_id, skip, limit, db)
+    async def render():
+        transactions, next_cursor = await search_transactions(user_id, q, limit, db, cursor)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return transaction_rows_adapter.dump_json(transactions), headers
+    return await conditional_response(request, user_id, db, render)
+
+
+@transaction_router.get("/export")
+async def export_transactions_endpoint(
+        format: str = Query(ExportFormat.CSV),
+        categorize: bool = False,
+        filters: TransactionFilters = Depends(),
+        user_id: int = Depends(get_current_user)
+):
+    fmt = ExportFormat.validate(format)
+    return StreamingResponse(
+        export_transactions(user_id, fmt, filters, prediction_service if categorize else None),
+        media_type=ExportFormat.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="transactions.{fmt}"'},
+    )
 
 
 @transaction_router.post("/transaction")
 async def add_transaction(
         transaction: TransactionCreateRequest,
+        response: Response,
+        on_duplicate: DuplicatePolicy | None = None,
+        idempotency_key: str | None = Header(None, min_length=1, max_length=255),
         user_id: int = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
+):
+    if not idempotency_key:
+        return await create_transaction(transaction, user_id, db, prediction_service, on_duplicate)
+    result, replayed = await create_transaction_once(transaction, idempotency_key, user_id, db,
+                                                     prediction_service, on_duplicate)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+@transaction_router.post("/batch")
+async def transaction_batch(
+        batch: TransactionBatchRequest,
+        on_duplicate: DuplicatePolicy | None = None,
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
 ):
-    return create_transaction(transaction, user_id, db)
+    return await apply_transaction_batch(batch, user_id, db, prediction_service, on_duplicate)
+
+
+@transaction_router.post("/import")
+async def import_transactions_endpoint(
+        request: Request,
+        categorize: bool = False,
+        on_duplicate: DuplicatePolicy | None = None,
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    fmt = ImportFormat.from_content_type(request.headers.get("content-type"))
+    return await import_transactions(request.stream(), fmt, user_id, db,
+                                     prediction_service if categorize else None, on_duplicate)
 
 
 @transaction_router.put("/transactions/{transaction_id}")
@@ -94,23 +194,66 @@ async def update_transaction_endpoint(
         transaction: TransactionUpdateRequest,
         transaction_id: int,
         user_id: int = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    return update_transaction(transaction, transaction_id, user_id, db)
+    return await update_transaction(transaction, transaction_id, user_id, db, prediction_service)
 
 
 @transaction_router.delete("/transactions/{transaction_id}", status_code=204)
 async def delete_transaction_endpoint(
         transaction_id: int,
         user_id: int = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    return delete_transaction(transaction_id, user_id, db)
+    return await delete_transaction(transaction_id, user_id, db)
+
+
+@analytics_router.get("/dashboard", response_model=AnalyticsDashboard)
+async def analytics_dashboard(
+        months: int = Query(settings.ANALYTICS_DEFAULT_MONTHS, ge=1, le=120),
+        window: int = Query(3, ge=1, le=24),
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return await get_dashboard(user_id, db, prediction_service, months, window)
+
+
+@analytics_router.get("/monthly", response_model=list[MonthlySummary])
+async def analytics_monthly(
+        months: int = Query(settings.ANALYTICS_DEFAULT_MONTHS, ge=1, le=120),
+        window: int = Query(3, ge=1, le=24),
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return await get_monthly_summary(user_id, db, months, window)
+
+
+@analytics_router.get("/categories", response_model=list[CategorySpend])
+async def analytics_categories(
+        date_from: datetime | None = None,
+        date_to: datetime | None = None,
+        user_id: int = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return await get_category_spend(user_id, db, prediction_service, date_from, date_to)
+
+
+@analytics_router.get("/savings", response_model=SavingsProgress)
+async def analytics_savings(user_id: int = Depends(get_current_user), db: AsyncSession = Depends(get_read_db)):
+    return await get_savings_progress(user_id, db)
 
 
 @admin_router.get("/users", response_model=list[AdminUserResponse])
-async def list_logged_in_users(_: int = Depends(get_admin_user), db: Session = Depends(get_db)):
-    return get_logged_in_users(db)
+async def list_logged_in_users(
+        limit: int = Query(100, ge=1, le=settings.MAX_PAGE_SIZE),
+        cursor: int | None = Query(None, ge=0),
+        filters: AdminUserFilters = Depends(),
+        _: int = Depends(get_admin_user),
+        db: AsyncSession = Depends(get_read_db)
+):
+    users, next_cursor = await get_logged_in_users(db, limit, cursor, filters)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return Response(content=admin_user_rows_adapter.dump_json(users), media_type="application/json", headers=headers)
 
 
 @admin_router.put("/users/{user_id}/admin")
@@ -123,24 +266,158 @@ def update_user_admin(
     return set_user_admin(user_id, update, current_user, db)
 
 
-@admin_router.delete("/users/{user_id}", status_code=204)
-def delete_user_endpoint(
+@admin_router.delete("/users/{user_id}", status_code=202)
+async def delete_user_endpoint(
         user_id: int,
+        batch_size: int = Query(settings.USER_DELETE_BATCH_SIZE, ge=1, le=100000),
+        throttle_ms: int = Query(settings.USER_DELETE_THROTTLE_MS, ge=0),
         current_user: int = Depends(get_admin_user),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
 ):
-    return delete_user(user_id, current_user, db)
+    return await delete_user(user_id, current_user, db, batch_size, throttle_ms)
 
 
 @admin_router.post("/logout_all")
-def logout_all(_: int = Depends(get_admin_user), db: Session = Depends(get_db)):
-    return logout_all_users(db)
+async def logout_all(_: int = Depends(get_admin_user), db: AsyncSession = Depends(get_async_db)):
+    return await logout_all_users(db)
+
+
+@admin_router.post("/aggregates/reconcile")
+def reconcile_aggregates(
+        user_id: int | None = None,
+        repair: bool = True,
+        _: int = Depends(get_admin_user),
+        db: Session = Depends(get_db)
+):
+    return reconcile_user_aggregates(db, user_id, repair)
+
+
+@admin_router.post("/analytics/rollups/rebuild")
+def rebuild_rollups(
+        user_id: int | None = None,
+        _: int = Depends(get_admin_user),
+        db: Session = Depends(get_db)
+):
+    return rebuild_monthly_rollups(db, user_id)
+
+
+@admin_router.post("/jobs/categories/backfill")
+async def start_category_backfill(
+        batch_size: int = Query(settings.CATEGORY_BACKFILL_BATCH_SIZE, ge=1, le=10000),
+        throttle_ms: int = Query(settings.CATEGORY_BACKFILL_THROTTLE_MS, ge=0),
+        start_after_id: int = Query(0, ge=0),
+        _: int = Depends(get_admin_user)
+):
+    job = job_registry.start("category_backfill", backfill_categories, predictor=prediction_service,
+                             batch_size=batch_size, throttle_ms=throttle_ms, start_after_id=start_after_id)
+    return job.to_dict()
+
+
+@admin_router.post("/jobs/tokens/purge")
+async def start_token_purge(
+        batch_size: int = Query(settings.TOKEN_PURGE_BATCH_SIZE, ge=1, le=10000),
+        throttle_ms: int = Query(settings.TOKEN_PURGE_THROTTLE_MS, ge=0),
+        _: int = Depends(get_admin_user)
+):
+    job = job_registry.start("token_purge", purge_expired_tokens, batch_size=batch_size, throttle_ms=throttle_ms)
+    return job.to_dict()
+
+
+@admin_router.post("/jobs/search/reindex")
+async def start_search_reindex(
+        user_id: int | None = Query(None, ge=1),
+        batch_size: int = Query(settings.SEARCH_REINDEX_BATCH_SIZE, ge=1, le=100000),
+        throttle_ms: int = Query(0, ge=0),
+        _: int = Depends(get_admin_user)
+):
+    job = job_registry.start("search_reindex", rebuild_search_index, batch_size=batch_size,
+                             throttle_ms=throttle_ms, user_id=user_id)
+    return job.to_dict()
+
+
+@admin_router.post("/jobs/duplicates/scan")
+async def start_duplicate_scan(
+        user_id: int | None = Query(None, ge=1),
+        flag: bool = False,
+        batch_size: int = Query(settings.DUPLICATE_SCAN_BATCH_SIZE, ge=1, le=100000),
+        throttle_ms: int = Query(0, ge=0),
+        _: int = Depends(get_admin_user)
+):
+    job = job_registry.start("duplicate_scan", scan_duplicate_transactions, batch_size=batch_size,
+                             throttle_ms=throttle_ms, user_id=user_id, flag=flag)
+    return job.to_dict()
+
+
+@admin_router.post("/jobs/users/{user_id}/purge")
+async def start_user_data_purge_endpoint(
+        user_id: int,
+        batch_size: int = Query(settings.USER_DELETE_BATCH_SIZE, ge=1, le=100000),
+        throttle_ms: int = Query(settings.USER_DELETE_THROTTLE_MS, ge=0),
+        _: int = Depends(get_admin_user),
+        db: AsyncSession = Depends(get_async_db)
+):
+    return await resume_user_data_purge(user_id, db, batch_size, throttle_ms)
+
+
+@admin_router.get("/jobs")
+def list_jobs(_: int = Depends(get_admin_user)):
+    return [job.to_dict() for job in job_registry.list()]
+
+
+@admin_router.get("/jobs/{job_id}")
+def get_job(job_id: str, _: int = Depends(get_admin_user)):
+    return job_registry.get(job_id).to_dict()
+
+
+@admin_router.post("/jobs/{job_id}/cancel")
+def cancel_job(job_id: str, _: int = Depends(get_admin_user)):
+    return job_registry.cancel(job_id).to_dict()
+
+
+@admin_router.get("/auth/cache")
+def get_auth_cache_stats(_: int = Depends(get_admin_user)):
+    return {
+        "tokens": token_cache.stats(),
+        "admin_status": admin_status_cache.stats(),
+        "revoked_users": revoked_users.stats(),
+        "password_hasher": password_hasher.stats(),
+        "responses": response_cache.stats(),
+    }
+
+
+@admin_router.get("/profiles")
+def list_profiles(_: int = Depends(get_admin_user)):
+    return profiler.list()
+
+
+@admin_router.get("/profiles/{name}", response_class=PlainTextResponse)
+def get_profile_report(
+        name: str,
+        sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+        limit: int = Query(50, ge=1, le=500),
+        _: int = Depends(get_admin_user)
+):
+    if name not in profiler.list():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return profiler.report(name, limit, sort)
+
+
+@admin_router.get("/model")
+def get_model_info(_: int = Depends(get_admin_user)):
+    return model_registry.info()
+
+
+@admin_router.post("/model/reload")
+def reload_model(_: int = Depends(get_admin_user)):
+    model_registry.reload()
+    return model_registry.info()
 
 
 router.include_router(user_router)
 router.include_router(transaction_router)
 router.include_router(prediction_router)
 router.include_router(admin_router)
+router.include_router(analytics_router)
 app.include_router(router)
 
 __all__ = ["router"]
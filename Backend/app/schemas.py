@@ -1,15 +1,22 @@
-from pydantic import BaseModel, EmailStr, Field, ConfigDict
+from pydantic import BaseModel, EmailStr, Field, ConfigDict, TypeAdapter
 from typing import List
+from typing_extensions import TypedDict
 from decimal import Decimal
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Annotated, Literal, Optional, Union
 
 class TransactionRequest(BaseModel):
     descriptions: List[str]
 
+class CategoryProbability(BaseModel):
+    category: str
+    probability: float
+
 class PredictionResponse(BaseModel):
     predictions: List[str]
+    # Best categories per description, most likely first; only present when top_k was requested.
+    top: Optional[List[List[CategoryProbability]]] = None
 
 class UserRegisterRequest(BaseModel):
     email: str
@@ -63,11 +70,19 @@ class TransactionType(str, Enum):
     income = "income"
     expense = "expense"
 
+class DuplicatePolicy(str, Enum):
+    allow = "allow"
+    flag = "flag"
+    reject = "reject"
+
 class TransactionCreateRequest(BaseModel):
     amount: Decimal = Field(..., gt=0)
     description: Optional[str] = None
     type: TransactionType
 
+class TransactionImportRow(TransactionCreateRequest):
+    date: Optional[datetime] = None
+
 class TransactionUpdateRequest(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -76,6 +91,39 @@ class TransactionUpdateRequest(BaseModel):
     date: Optional[datetime] = None
     type: Optional[TransactionType] = None
 
+class TransactionBatchCreate(BaseModel):
+    op: Literal["create"]
+    data: TransactionCreateRequest
+
+class TransactionBatchUpdate(BaseModel):
+    op: Literal["update"]
+    id: int
+    data: TransactionUpdateRequest
+
+class TransactionBatchDelete(BaseModel):
+    op: Literal["delete"]
+    id: int
+
+TransactionBatchOperation = Annotated[
+    Union[TransactionBatchCreate, TransactionBatchUpdate, TransactionBatchDelete], Field(discriminator="op")
+]
+
+class TransactionBatchRequest(BaseModel):
+    operations: List[TransactionBatchOperation] = Field(..., min_length=1, max_length=500)
+
+class TransactionFilters(BaseModel):
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    type: Optional[TransactionType] = None
+    min_amount: Optional[Decimal] = Field(None, ge=0)
+    max_amount: Optional[Decimal] = Field(None, ge=0)
+    description: Optional[str] = Field(None, min_length=1, max_length=255)
+    duplicate: Optional[bool] = None
+
+class AdminUserFilters(BaseModel):
+    email: Optional[str] = Field(None, min_length=1, max_length=255)
+    is_admin: Optional[bool] = None
+
 class TransactionResponse(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
@@ -84,4 +132,54 @@ class TransactionResponse(BaseModel):
     amount: Decimal
     type: TransactionType
     description: Optional[str] = None
-    date: datetime
\ No newline at end of file
+    date: datetime
+    category: Optional[str] = None
+    duplicate_of: Optional[int] = None
+
+# Serialization-only shapes for list endpoints: the rows come straight from column selects, so they are dumped
+# to JSON in one pass without building (and re-validating) a model per row. Keep in sync with the models above.
+class TransactionRow(TypedDict):
+    id: int
+    user_id: int
+    amount: Decimal
+    type: str
+    description: Optional[str]
+    date: datetime
+    category: Optional[str]
+    duplicate_of: Optional[int]
+
+class AdminUserRow(TypedDict):
+    user_id: int
+    email: str
+    firstname: str
+    lastname: str
+    logged_in_since: datetime
+    is_admin: bool
+
+transaction_rows_adapter = TypeAdapter(list[TransactionRow])
+admin_user_rows_adapter = TypeAdapter(list[AdminUserRow])
+
+class MonthlySummary(BaseModel):
+    month: str
+    income: Decimal
+    expense: Decimal
+    net: Decimal
+    income_avg: Decimal
+    expense_avg: Decimal
+    net_avg: Decimal
+
+class CategorySpend(BaseModel):
+    category: str
+    total: Decimal
+    count: int
+
+class SavingsProgress(BaseModel):
+    savings: Decimal
+    goal: Optional[Decimal] = None
+    remaining: Optional[Decimal] = None
+    progress_percent: Optional[Decimal] = None
+
+class AnalyticsDashboard(BaseModel):
+    monthly: List[MonthlySummary]
+    categories: List[CategorySpend]
+    savings: SavingsProgress
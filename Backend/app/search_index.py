@@ -0,0 +1,98 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import TransactionSearchTerm, TransactionSearchToken
+from app.utils import clean_description
+
+MAX_TOKEN_LENGTH = 64
+
+
+def search_tokens(text) -> list[str]:
+    # The categorizer's normalization (lowercase, no digits or punctuation), so "TESCO #4411" finds "tesco".
+    return list(dict.fromkeys(token[:MAX_TOKEN_LENGTH] for token in clean_description(text).split()))
+
+
+def search_backend(dialect_name: str) -> str:
+    if settings.SEARCH_BACKEND == "auto":
+        return "fulltext" if dialect_name == "mysql" else "index"
+    if settings.SEARCH_BACKEND not in ("fulltext", "index"):
+        raise RuntimeError(f"Unknown SEARCH_BACKEND {settings.SEARCH_BACKEND!r}; use auto, fulltext or index")
+    return settings.SEARCH_BACKEND
+
+
+async def apply_term_counts(counts: Counter, db: AsyncSession):
+    entries = [{"user_id": user_id, "token": token, "doc_count": count}
+               for (user_id, token), count in counts.items() if count]
+    if not entries:
+        return
+    if db.bind.dialect.name == "mysql":
+        stmt = mysql_insert(TransactionSearchTerm)
+        stmt = stmt.on_duplicate_key_update(doc_count=TransactionSearchTerm.doc_count + stmt.inserted.doc_count)
+    else:
+        stmt = sqlite_insert(TransactionSearchTerm)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "token"],
+            set_={"doc_count": TransactionSearchTerm.doc_count + stmt.excluded.doc_count},
+        )
+    await db.execute(stmt, entries)
+
+
+class SearchIndexWrites:
+    # Keeps the token index in step with transaction writes, inside the caller's transaction; term counts are
+    # summed and upserted once by flush(). A no-op with MySQL FULLTEXT, which maintains its own index.
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.enabled = search_backend(db.bind.dialect.name) == "index"
+        self.counts: Counter = Counter()
+
+    async def add(self, user_id: int, rows: list[tuple[int, str | None, datetime]]):
+        if not self.enabled:
+            return
+        postings = [
+            {"user_id": user_id, "token": token, "date": date, "transaction_id": transaction_id}
+            for transaction_id, description, date in rows
+            for token in search_tokens(description)
+        ]
+        if postings:
+            await self.db.execute(insert(TransactionSearchToken), postings)
+            self.counts.update((user_id, posting["token"]) for posting in postings)
+
+    async def remove(self, transaction_ids: list[int]):
+        if not self.enabled or not transaction_ids:
+            return
+        await self._remove(TransactionSearchToken.transaction_id.in_(transaction_ids))
+
+    async def remove_id_range(self, after_id: int, last_id: int | None = None, user_id: int | None = None):
+        # Postings of every transaction id in (after_id, last_id], including ids whose transaction is gone.
+        if not self.enabled:
+            return
+        conditions = [TransactionSearchToken.transaction_id > after_id]
+        if last_id is not None:
+            conditions.append(TransactionSearchToken.transaction_id <= last_id)
+        if user_id is not None:
+            conditions.append(TransactionSearchToken.user_id == user_id)
+        await self._remove(*conditions)
+
+    async def _remove(self, *conditions):
+        stmt = delete(TransactionSearchToken).where(*conditions)
+        if self.db.bind.dialect.delete_returning:
+            removed = (await self.db.execute(
+                stmt.returning(TransactionSearchToken.user_id, TransactionSearchToken.token)
+            )).all()
+        else:
+            removed = (await self.db.execute(
+                select(TransactionSearchToken.user_id, TransactionSearchToken.token).where(*conditions)
+            )).all()
+            await self.db.execute(stmt)
+        self.counts.subtract((user_id, token) for user_id, token in removed)
+
+    async def flush(self):
+        if self.counts:
+            await apply_term_counts(self.counts, self.db)
+            self.counts.clear()
@@ -0,0 +1,47 @@
+import gc
+
+from uvicorn.workers import UvicornWorker
+
+from app.config import settings
+
+
+class TunedUvicornWorker(UvicornWorker):
+    # "auto" picks uvloop and httptools when installed and falls back to asyncio/h11 otherwise. Keep-alive,
+    # backlog and max-requests come from the gunicorn settings; the rest has no gunicorn equivalent.
+    CONFIG_KWARGS = {
+        "loop": "auto",
+        "http": "auto",
+        "limit_concurrency": settings.WEB_LIMIT_CONCURRENCY or None,
+        "timeout_graceful_shutdown": settings.WEB_GRACEFUL_TIMEOUT_SECONDS,
+    }
+
+
+def check_workers(workers: int):
+    # TOKEN_STORE=memory keeps refresh tokens inside the worker that issued them, so with several workers a refresh
+    # or logout routed to another one would not find the token.
+    if workers > 1 and settings.TOKEN_STORE == "memory":
+        raise RuntimeError(f"TOKEN_STORE=memory needs a single worker (WEB_WORKERS={workers}); use database or redis")
+
+
+def preload():
+    # Warm shared state in the gunicorn master so forked workers share those pages copy-on-write.
+    from app.model_registry import model_registry
+
+    try:
+        model_registry.get()
+    except Exception as e:
+        # Workers fall back to loading lazily on their first prediction.
+        print(f"❌ Error preloading categorizer from {model_registry.path}: {e}")
+    # Moving everything loaded so far out of the collector's generations stops gc passes in the workers
+    # from writing to (and so un-sharing) those pages.
+    gc.freeze()
+
+
+def reset_after_fork():
+    from app.db import async_engine, async_read_engine, engine
+
+    # Connections opened in the master must not be shared with workers; close=False leaves them to the master.
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    if async_read_engine is not async_engine:
+        async_read_engine.sync_engine.dispose(close=False)
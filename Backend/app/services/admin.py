@@ -1,47 +1,155 @@
+import asyncio
+import time
+
 from fastapi import HTTPException, status
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models import User, RefreshToken, Transaction
-from app.schemas import AdminUserResponse, AdminUpdateRequest
-from datetime import datetime, timezone
-
-def get_logged_in_users(db: Session) -> list[AdminUserResponse]:
-    results = (
-        db.query(User)
-        .join(RefreshToken)
-        .filter(RefreshToken.expires_at > datetime.now(timezone.utc))
-        .group_by(User.id)
-        .order_by(RefreshToken.created_at.desc())
-        .all()
+from app.auth import admin_status_cache, revoke_user_tokens
+from app.db import AsyncSessionLocal, mark_recent_write
+from app.jobs import Job, job_registry
+from app.models import IdempotencyKey, MonthlyRollup, User, Transaction, TransactionSearchTerm, TransactionSearchToken
+from app.schemas import AdminUserFilters, AdminUserRow, AdminUpdateRequest
+from app.token_store import DatabaseTokenStore, token_store
+
+async def get_logged_in_users(db: AsyncSession, limit: int, cursor: int | None = None,
+                             filters: AdminUserFilters | None = None) -> tuple[list[AdminUserRow], str | None]:
+    # Keyset pages over users in id order; the cursor is the last user id of the previous page.
+    query = (
+        select(User.id, User.email, User.firstname, User.lastname, User.is_admin)
+        .where(User.is_deleted.is_(False))
+        .order_by(User.id)
+        .limit(limit)
     )
-    return [AdminUserResponse.model_validate(user) for user in results]
+    if cursor:
+        query = query.where(User.id > cursor)
+    if filters is not None:
+        if filters.email:
+            query = query.where(User.email.ilike(f"%{filters.email}%"))
+        if filters.is_admin is not None:
+            query = query.where(User.is_admin == filters.is_admin)
+
+    if isinstance(token_store, DatabaseTokenStore):
+        has_session, logged_in_since = token_store.session_clauses(User.id)
+        rows = (await db.execute(query.add_columns(logged_in_since).where(has_session))).all()
+        sessions = {row[0]: row[-1] for row in rows}
+    else:
+        sessions = await token_store.active_sessions(db)
+        rows = (await db.execute(query.where(User.id.in_(sessions)))).all() if sessions else []
+
+    users = [
+        {"user_id": row.id, "email": row.email, "firstname": row.firstname, "lastname": row.lastname,
+         "logged_in_since": sessions[row.id], "is_admin": row.is_admin}
+        for row in rows
+    ]
+    next_cursor = str(rows[-1].id) if len(rows) == limit else None
+    return users, next_cursor
 
 def set_user_admin(user_id: int, update: AdminUpdateRequest, current_user: int, db: Session) -> dict:
     if user_id == current_user and not update.is_admin:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot remove admin rights from yourself")
 
-    user = db.query(User).filter(User.id == user_id).first()
+    user = db.query(User).filter(User.id == user_id, User.is_deleted.is_(False)).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     user.is_admin = update.is_admin
+    user.data_version = User.data_version + 1
     db.commit()
+    mark_recent_write(user_id)
+    # Existing access tokens carry the old role claim; revoking them makes the client refresh into a new one.
+    revoke_user_tokens(user_id)
+    admin_status_cache.set(user_id, update.is_admin)
     return {"message": f"User {user_id} admin status set to {update.is_admin}"}
 
-def delete_user(user_id: int, current_user: int, db: Session) -> dict:
+async def delete_user(user_id: int, current_user: int, db: AsyncSession, batch_size: int, throttle_ms: int) -> dict:
     if user_id == current_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cannot delete your own user")
 
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    user = await db.get(User, user_id)
+    if not user or user.is_deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
-    db.query(RefreshToken).filter(RefreshToken.user_id == user_id).delete()
-    db.query(Transaction).filter(Transaction.user_id == user_id).delete()
-    db.delete(user)
-    db.commit()
-    return {"message": f"User {user_id} deleted successfully"}
+    # The account is closed at once (a short transaction: the tombstone and the sessions); logins and writes
+    # refuse a deleted user. The row itself goes last, with the purge, so its id cannot be handed to a new
+    # account (SQLite, MySQL < 8.0 after a restart) while the old transactions still carry it.
+    user.is_deleted = True
+    await token_store.revoke_user(user_id, db)
+    await db.commit()
+    revoke_user_tokens(user_id)
+    return start_user_data_purge(user_id, batch_size, throttle_ms)
 
-def logout_all_users(db: Session) -> dict:
-    db.query(RefreshToken).delete()
-    db.commit()
-    return {"message": "All users have been logged out (refresh_tokens table truncated)"}
\ No newline at end of file
+def start_user_data_purge(user_id: int, batch_size: int, throttle_ms: int) -> dict:
+    job = job_registry.start("user_delete", purge_user_transactions, user_id=user_id,
+                             batch_size=batch_size, throttle_ms=throttle_ms)
+    return job.to_dict()
+
+async def resume_user_data_purge(user_id: int, db: AsyncSession, batch_size: int, throttle_ms: int) -> dict:
+    # For a deletion job interrupted by a restart: only deleted (or already removed) users are purged.
+    user = await db.get(User, user_id)
+    if user and not user.is_deleted:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="User still exists; delete the user instead")
+    return start_user_data_purge(user_id, batch_size, throttle_ms)
+
+async def purge_user_transactions(job: Job, user_id: int, batch_size: int, throttle_ms: int):
+    # Bounded id ranges, one short transaction each, so neither row locks nor the undo log grow with the
+    # size of the user's history, and concurrent writers only ever wait for one batch.
+    last_id = 0
+    deleted = 0
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        total = (await db.execute(
+            select(func.count()).select_from(Transaction).where(Transaction.user_id == user_id)
+        )).scalar_one()
+        job.progress.update(user_id=user_id, total=total, deleted=0, last_id=0, rows_per_sec=0.0)
+        while True:
+            ids = (await db.execute(
+                select(Transaction.id)
+                .where(Transaction.user_id == user_id, Transaction.id > last_id)
+                .order_by(Transaction.id)
+                .limit(batch_size)
+            )).scalars().all()
+            if not ids:
+                break
+            result = await db.execute(
+                delete(Transaction)
+                .where(Transaction.user_id == user_id, Transaction.id.between(ids[0], ids[-1]))
+                .execution_options(synchronize_session=False)
+            )
+            await db.execute(
+                delete(TransactionSearchToken)
+                .where(TransactionSearchToken.transaction_id.between(ids[0], ids[-1]),
+                       TransactionSearchToken.user_id == user_id)
+            )
+            await db.commit()
+
+            deleted += result.rowcount
+            last_id = ids[-1]
+            elapsed = time.perf_counter() - started
+            job.progress.update(deleted=deleted, last_id=last_id,
+                                rows_per_sec=round(deleted / elapsed, 1) if elapsed else 0.0)
+            if len(ids) < batch_size:
+                break
+            if throttle_ms:
+                await asyncio.sleep(throttle_ms / 1000)
+
+        # The small per-user tables and the tombstone go together. Anything written after the last batch is
+        # swept up here too, so no transaction outlives the row whose id it carries.
+        result = await db.execute(
+            delete(Transaction).where(Transaction.user_id == user_id).execution_options(synchronize_session=False)
+        )
+        await db.execute(delete(TransactionSearchToken).where(TransactionSearchToken.user_id == user_id))
+        await db.execute(delete(TransactionSearchTerm).where(TransactionSearchTerm.user_id == user_id))
+        await db.execute(delete(MonthlyRollup).where(MonthlyRollup.user_id == user_id))
+        await db.execute(delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id))
+        await token_store.revoke_user(user_id, db)
+        await db.execute(delete(User).where(User.id == user_id, User.is_deleted.is_(True)))
+        await db.commit()
+        deleted += result.rowcount
+        job.progress.update(deleted=deleted)
+
+async def logout_all_users(db: AsyncSession) -> dict:
+    await token_store.revoke_all(db)
+    await db.commit()
+    revoke_user_tokens()
+    return {"message": f"All users have been logged out (refresh tokens cleared from the {token_store.name} store)"}
\ No newline at end of file
@@ -0,0 +1,138 @@
+from collections import defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from fastapi import HTTPException, status
+from sqlalchemy import extract, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models import MonthlyRollup, Transaction, User
+from app.schemas import AnalyticsDashboard, CategorySpend, MonthlySummary, SavingsProgress
+
+ZERO = Decimal("0.00")
+CENT = Decimal("0.01")
+
+
+def month_range(months: int, today: datetime | None = None) -> list[tuple[int, int]]:
+    today = today or datetime.now(timezone.utc)
+    index = today.year * 12 + today.month - 1
+    return [(i // 12, i % 12 + 1) for i in range(index - months + 1, index + 1)]
+
+
+async def monthly_totals(user_id: int, db: AsyncSession, first_month: tuple[int, int]) -> dict:
+    year, month = first_month
+    if settings.ANALYTICS_ROLLUPS:
+        stmt = (
+            select(MonthlyRollup.year, MonthlyRollup.month, MonthlyRollup.type, MonthlyRollup.total)
+            .where(MonthlyRollup.user_id == user_id,
+                   tuple_(MonthlyRollup.year, MonthlyRollup.month) >= (year, month))
+        )
+    else:
+        # The IN list makes ix_transactions_user_type_date seek one date range per type; without it the
+        # planner falls back to (user_id, date) and walks every type.
+        tx_year = extract("year", Transaction.date)
+        tx_month = extract("month", Transaction.date)
+        stmt = (
+            select(tx_year, tx_month, Transaction.type, func.sum(Transaction.amount))
+            .where(Transaction.user_id == user_id, Transaction.type.in_(("income", "expense")),
+                   Transaction.date >= datetime(year, month, 1))
+            .group_by(tx_year, tx_month, Transaction.type)
+        )
+    totals: dict[tuple[int, int], dict[str, Decimal]] = defaultdict(lambda: {"income": ZERO, "expense": ZERO})
+    for row_year, row_month, type_, total in await db.execute(stmt):
+        if type_ in ("income", "expense"):
+            totals[(int(row_year), int(row_month))][type_] += Decimal(total or 0)
+    return totals
+
+
+def rolling_average(values: list[Decimal], window: int) -> list[Decimal]:
+    averages = []
+    running = ZERO
+    for i, value in enumerate(values):
+        running += value
+        if i >= window:
+            running -= values[i - window]
+        averages.append((running / min(i + 1, window)).quantize(CENT))
+    return averages
+
+
+async def get_monthly_summary(user_id: int, db: AsyncSession, months: int, window: int) -> list[MonthlySummary]:
+    # Extra leading months let the first rolling averages cover a full window.
+    span = month_range(months + window - 1)
+    totals = await monthly_totals(user_id, db, span[0])
+    income = [totals[month]["income"] for month in span]
+    expense = [totals[month]["expense"] for month in span]
+    net = [i - e for i, e in zip(income, expense)]
+    income_avg, expense_avg, net_avg = (rolling_average(series, window) for series in (income, expense, net))
+    return [
+        MonthlySummary(
+            month=f"{year:04d}-{month:02d}",
+            income=income[i], expense=expense[i], net=net[i],
+            income_avg=income_avg[i], expense_avg=expense_avg[i], net_avg=net_avg[i],
+        )
+        for i, (year, month) in enumerate(span)
+    ][window - 1:]
+
+
+async def get_category_spend(user_id: int, db: AsyncSession, predictor, date_from: datetime | None = None,
+                             date_to: datetime | None = None) -> list[CategorySpend]:
+    filters = [Transaction.user_id == user_id, Transaction.type == "expense"]
+    if date_from is not None:
+        filters.append(Transaction.date >= date_from)
+    if date_to is not None:
+        filters.append(Transaction.date < date_to)
+
+    spend: dict[str, list] = defaultdict(lambda: [ZERO, 0])
+    categorized = await db.execute(
+        select(Transaction.category, func.sum(Transaction.amount), func.count(Transaction.id))
+        .where(*filters, Transaction.category.is_not(None))
+        .group_by(Transaction.category)
+    )
+    for category, total, count in categorized:
+        spend[category][0] += Decimal(total or 0)
+        spend[category][1] += count
+
+    # Rows the backfill has not reached yet are grouped by description, so each distinct merchant is
+    # classified once through the cached predictor.
+    uncategorized = (await db.execute(
+        select(Transaction.description, func.sum(Transaction.amount), func.count(Transaction.id))
+        .where(*filters, Transaction.category.is_(None))
+        .group_by(Transaction.description)
+    )).all()
+    if uncategorized:
+        categories = await predictor.predict([description or "" for description, _, _ in uncategorized])
+        for category, (_, total, count) in zip(categories, uncategorized):
+            spend[category][0] += Decimal(total or 0)
+            spend[category][1] += count
+
+    return sorted(
+        (CategorySpend(category=category, total=total, count=count) for category, (total, count) in spend.items()),
+        key=lambda item: item.total,
+        reverse=True,
+    )
+
+
+async def get_savings_progress(user_id: int, db: AsyncSession) -> SavingsProgress:
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    savings = user.savings or ZERO
+    if not user.goal:
+        return SavingsProgress(savings=savings, goal=user.goal)
+    return SavingsProgress(
+        savings=savings,
+        goal=user.goal,
+        remaining=max(user.goal - savings, ZERO),
+        progress_percent=(savings / user.goal * 100).quantize(CENT),
+    )
+
+
+async def get_dashboard(user_id: int, db: AsyncSession, predictor, months: int, window: int) -> AnalyticsDashboard:
+    monthly = await get_monthly_summary(user_id, db, months, window)
+    first_year, first_month = (int(part) for part in monthly[0].month.split("-"))
+    return AnalyticsDashboard(
+        monthly=monthly,
+        categories=await get_category_spend(user_id, db, predictor, date_from=datetime(first_year, first_month, 1)),
+        savings=await get_savings_progress(user_id, db),
+    )
@@ -1,26 +1,20 @@
-from datetime import datetime, timezone, timedelta
-from uuid import uuid4
+from datetime import datetime, timezone
 
 from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth import create_access_token
 from app.config import settings
-from app.models import User, RefreshToken
+from app.db import mark_recent_write
+from app.models import User
 from app.schemas import UserRegisterRequest, UserLoginRequest
-from app.utils import pwd_context
+from app.passwords import password_hasher
+from app.token_store import token_store
 
 
 class TokenManager:
-    @staticmethod
-    def create_refresh_token(user_id: int, db: Session) -> tuple[str, datetime]:
-        refresh_token = str(uuid4())
-        expires_at = datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-        db.add(RefreshToken(user_id=user_id, token=refresh_token, expires_at=expires_at))
-        return refresh_token, expires_at
-
-
     @staticmethod
     def set_refresh_token_cookie(response: JSONResponse, token: str, expires_at: datetime):
         response.set_cookie(
@@ -35,20 +29,26 @@ class TokenManager:
         )
 
 
-def create_token_response(user_id: int, db: Session) -> JSONResponse:
-    access_token = create_access_token({"user_id": user_id})
-    refresh_token, expires_at = TokenManager.create_refresh_token(user_id, db)
-    db.commit()
+def token_response(user: User, refresh_token: str, expires_at: datetime) -> JSONResponse:
+    access_token = create_access_token({"user_id": user.id, "is_admin": bool(user.is_admin)})
     response = JSONResponse(content={"access_token": access_token, "token_type": "bearer"})
     TokenManager.set_refresh_token_cookie(response, refresh_token, expires_at)
     return response
 
 
-def register_user(user: UserRegisterRequest, db: Session) -> JSONResponse:
-    if db.query(User).filter(User.email == user.email).first():
+async def create_token_response(user: User, db: AsyncSession) -> JSONResponse:
+    refresh_token, expires_at = await token_store.issue(user.id, db)
+    await db.commit()
+    # A fresh account may not have reached the replica yet; keep the first reads on the primary.
+    mark_recent_write(user.id)
+    return token_response(user, refresh_token, expires_at)
+
+
+async def register_user(user: UserRegisterRequest, db: AsyncSession) -> JSONResponse:
+    if (await db.execute(select(User.id).where(User.email == user.email))).first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(
         email=user.email,
         password=hashed_password,
@@ -57,40 +57,44 @@ def register_user(user: UserRegisterRequest, db: Session) -> JSONResponse:
         date_created=datetime.now(timezone.utc)
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
-    return create_token_response(new_user.id, db)
+    return await create_token_response(new_user, db)
 
 
-def login_user(user: UserLoginRequest, db: Session) -> JSONResponse:
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.password):
+async def login_user(user: UserLoginRequest, db: AsyncSession) -> JSONResponse:
+    db_user = (await db.execute(
+        select(User).where(User.email == user.email, User.is_deleted.is_(False))
+    )).scalar_one_or_none()
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
 
-    return create_token_response(db_user.id, db) # type: ignore
-
-
-def refresh_token_db(token: str, db: Session) -> JSONResponse:
-    db_token = db.query(RefreshToken).filter(RefreshToken.token == token).first()
-    if not db_token:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    valid, new_hash = await password_hasher.verify_and_update(user.password, db_user.password)
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid email or password")
+    if new_hash:
+        # Hash was made with a different BCRYPT_ROUNDS; store the re-hash with the login's commit.
+        db_user.password = new_hash
 
-    if db_token.expires_at.replace(tzinfo=timezone.utc) < datetime.now(timezone.utc):
-        db.delete(db_token)
-        db.commit()
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
+    return await create_token_response(db_user, db)
 
-    db.delete(db_token)
-    db.commit()
 
-    return create_token_response(db_token.user_id, db) # type: ignore
+async def refresh_token_db(token: str, db: AsyncSession) -> JSONResponse:
+    # Consuming the old token and issuing its replacement commit together (or not at all).
+    user_id, refresh_token, expires_at = await token_store.rotate(token, db)
+    user = await db.get(User, user_id)
+    if not user or user.is_deleted:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    await db.commit()
+    return token_response(user, refresh_token, expires_at)
 
 
-def logout_user(token: str, db: Session) -> JSONResponse:
+async def logout_user(token: str, db: AsyncSession) -> JSONResponse:
     if token:
-        db.query(RefreshToken).filter(RefreshToken.token == token).delete()
-        db.commit()
+        await token_store.revoke(token, db)
+        await db.commit()
 
     response = JSONResponse(content={"message": "Logged out successfully"})
     response.delete_cookie("refresh_token", path=f"{settings.V1_PREFIX}/users/refresh")
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+from sqlalchemy import or_, select, update
+
+from app.db import AsyncSessionLocal
+from app.jobs import Job
+from app.models import Transaction, User
+
+
+async def backfill_categories(job: Job, predictor, batch_size: int, throttle_ms: int, start_after_id: int = 0):
+    # Walks transactions in primary-key order. Rows already stamped with the current model version are
+    # skipped by the WHERE clause, so a restarted job (or start_after_id) picks up where the last one stopped.
+    last_id = start_after_id
+    processed = 0
+    started = time.perf_counter()
+    job.progress.update(rows=0, last_id=last_id, rows_per_sec=0.0)
+    async with AsyncSessionLocal() as db:
+        while True:
+            version = (await predictor.registry.get_async()).model_version
+            rows = (await db.execute(
+                select(Transaction.id, Transaction.user_id, Transaction.description)
+                .where(
+                    Transaction.id > last_id,
+                    or_(Transaction.category_model_version.is_(None),
+                        Transaction.category_model_version != version),
+                )
+                .order_by(Transaction.id)
+                .limit(batch_size)
+            )).all()
+            if not rows:
+                break
+
+            categories, version = await predictor.predict_bulk([description for _, _, description in rows])
+            await db.execute(update(Transaction), [
+                {"id": transaction_id, "category": category, "category_model_version": version}
+                for (transaction_id, _, _), category in zip(rows, categories)
+            ])
+            # Listings show the category, so cached responses of the affected users are now stale.
+            await db.execute(
+                update(User)
+                .where(User.id.in_({user_id for _, user_id, _ in rows}))
+                .values(data_version=User.data_version + 1)
+            )
+            await db.commit()
+
+            processed += len(rows)
+            last_id = rows[-1][0]
+            elapsed = time.perf_counter() - started
+            job.progress.update(rows=processed, last_id=last_id, model_version=version,
+                                rows_per_sec=round(processed / elapsed, 1) if elapsed else 0.0)
+            if throttle_ms:
+                await asyncio.sleep(throttle_ms / 1000)
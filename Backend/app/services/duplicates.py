@@ -0,0 +1,108 @@
+import asyncio
+import time
+from decimal import Decimal
+
+from sqlalchemy import func, select, update
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.duplicates import transaction_fingerprint
+from app.jobs import Job
+from app.models import Transaction, User
+
+
+async def scan_duplicate_transactions(job: Job, batch_size: int, throttle_ms: int, user_id: int | None = None,
+                                      flag: bool = False):
+    # Fingerprint existing transactions in id-ranged batches, then report the groups that share a fingerprint. Rows
+    # written before fingerprints existed (or under another DUPLICATE_WINDOW_HOURS) get theirs in the first pass, one
+    # short transaction per batch. The report is one grouped read of the (user_id, fingerprint) index. With flag=True
+    # every row but the earliest of each group gets duplicate_of set, as a flagged create would.
+    async with AsyncSessionLocal() as db:
+        last_id = 0
+        processed = updated = 0
+        started = time.perf_counter()
+        job.progress.update(rows=0, fingerprinted=0, last_id=0, rows_per_sec=0.0)
+        while True:
+            query = (
+                select(Transaction.id, Transaction.user_id, Transaction.amount, Transaction.type,
+                       Transaction.description, Transaction.date, Transaction.fingerprint)
+                .where(Transaction.id > last_id)
+                .order_by(Transaction.id)
+                .limit(batch_size)
+            )
+            if user_id is not None:
+                query = query.where(Transaction.user_id == user_id)
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+
+            changed = []
+            for row in rows:
+                fingerprint = transaction_fingerprint(row.user_id, row.amount, row.type, row.description, row.date)
+                if fingerprint != row.fingerprint:
+                    changed.append({"id": row.id, "fingerprint": fingerprint})
+            if changed:
+                # ORM bulk UPDATE by primary key: one executemany for the batch.
+                await db.execute(update(Transaction), changed)
+            await db.commit()
+
+            processed += len(rows)
+            updated += len(changed)
+            last_id = rows[-1].id
+            elapsed = time.perf_counter() - started
+            job.progress.update(rows=processed, fingerprinted=updated, last_id=last_id,
+                                rows_per_sec=round(processed / elapsed, 1) if elapsed else 0.0)
+            if throttle_ms:
+                await asyncio.sleep(throttle_ms / 1000)
+
+        query = (
+            select(Transaction.user_id, Transaction.fingerprint, func.count().label("count"),
+                   func.min(Transaction.id).label("first_id"), func.max(Transaction.amount).label("amount"),
+                   func.max(Transaction.type).label("type"))
+            .where(Transaction.fingerprint.isnot(None))
+            .group_by(Transaction.user_id, Transaction.fingerprint)
+            .having(func.count() > 1)
+            .order_by(Transaction.user_id, func.min(Transaction.id))
+        )
+        if user_id is not None:
+            query = query.where(Transaction.user_id == user_id)
+        groups = (await db.execute(query)).all()
+
+        # What the extra rows add to the users' totals: everything but the first row of each group.
+        inflated = {"income": Decimal("0.00"), "expense": Decimal("0.00")}
+        for group in groups:
+            if group.type in inflated:
+                inflated[group.type] += Decimal(group.amount) * (group.count - 1)
+        job.progress.update(
+            duplicate_groups=len(groups),
+            duplicate_rows=sum(group.count - 1 for group in groups),
+            inflated_income=str(inflated["income"]),
+            inflated_expense=str(inflated["expense"]),
+            groups=[{"user_id": group.user_id, "first_id": group.first_id, "count": group.count,
+                     "amount": str(group.amount), "type": group.type}
+                    for group in groups[:settings.DUPLICATE_REPORT_LIMIT]],
+            groups_truncated=len(groups) > settings.DUPLICATE_REPORT_LIMIT,
+        )
+
+        if flag:
+            flagged = 0
+            for group in groups:
+                result = await db.execute(
+                    update(Transaction)
+                    .where(Transaction.user_id == group.user_id, Transaction.fingerprint == group.fingerprint,
+                           Transaction.id != group.first_id, Transaction.duplicate_of.is_(None))
+                    .values(duplicate_of=group.first_id)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount:
+                    # Listings now show duplicate_of: move cached responses and ETags on.
+                    await db.execute(
+                        update(User)
+                        .where(User.id == group.user_id)
+                        .values(data_version=User.data_version + 1)
+                    )
+                await db.commit()
+                flagged += result.rowcount
+                job.progress["flagged"] = flagged
+                if throttle_ms:
+                    await asyncio.sleep(throttle_ms / 1000)
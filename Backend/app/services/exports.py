@@ -0,0 +1,161 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from pydantic import TypeAdapter
+from sqlalchemy import DateTime, Integer, Numeric, select
+
+from app.config import settings
+from app.db import read_sessionmaker
+from app.models import Transaction
+from app.schemas import TransactionFilters, TransactionRow
+from app.services.transactions import TRANSACTION_COLUMNS, filter_transactions
+
+EXPORT_FIELDS = [column.key for column in TRANSACTION_COLUMNS]
+transaction_row_adapter = TypeAdapter(TransactionRow)
+
+
+class ExportFormat:
+    CSV = "csv"
+    NDJSON = "ndjson"
+    PARQUET = "parquet"
+
+    MEDIA_TYPES = {
+        CSV: "text/csv",
+        NDJSON: "application/x-ndjson",
+        PARQUET: "application/vnd.apache.parquet",
+    }
+
+    @staticmethod
+    def validate(fmt: str) -> str:
+        fmt = fmt.lower()
+        if fmt not in ExportFormat.MEDIA_TYPES:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Export format must be csv, ndjson or parquet")
+        if fmt == ExportFormat.PARQUET:
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                                    detail="Parquet export requires the optional 'pyarrow' package")
+        return fmt
+
+
+class CsvWriter:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(self.buffer, fieldnames=EXPORT_FIELDS)
+        self.writer.writeheader()
+
+    def write(self, rows: list[dict]) -> bytes:
+        # ISO timestamps, matching the JSON endpoints and what the CSV importer accepts.
+        self.writer.writerows({**row, "date": row["date"].isoformat()} for row in rows)
+        return self.drain()
+
+    def drain(self) -> bytes:
+        data = self.buffer.getvalue().encode()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def close(self) -> bytes:
+        return self.drain()
+
+
+class NdjsonWriter:
+    def write(self, rows: list[dict]) -> bytes:
+        return b"".join(transaction_row_adapter.dump_json(row) + b"\n" for row in rows)
+
+    def close(self) -> bytes:
+        return b""
+
+
+class _ChunkSink(io.RawIOBase):
+    # File-like target for pyarrow that hands back whatever was written since the last drain.
+    def __init__(self):
+        self.chunks: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _arrow_type(pa, sql_type):
+    # The Parquet schema follows the exported columns, so the formats cannot drift apart.
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Numeric):
+        return pa.decimal128(sql_type.precision, sql_type.scale)
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    return pa.string()
+
+
+class ParquetWriter:
+    def __init__(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.schema = pa.schema([(column.key, _arrow_type(pa, column.type)) for column in TRANSACTION_COLUMNS])
+        self.sink = _ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, self.schema)
+
+    def write(self, rows: list[dict]) -> bytes:
+        # One row group per chunk; only the footer waits for close().
+        self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+WRITERS = {ExportFormat.CSV: CsvWriter, ExportFormat.NDJSON: NdjsonWriter, ExportFormat.PARQUET: ParquetWriter}
+
+
+async def fill_categories(rows: list[dict], predictor):
+    missing = [row for row in rows if row["category"] is None]
+    if missing:
+        categories = await predictor.predict([row["description"] or "" for row in missing])
+        for row, category in zip(missing, categories):
+            row["category"] = category
+
+
+async def export_transactions(user_id: int, fmt: str, filters: TransactionFilters | None = None,
+                              predictor=None, chunk_size: int | None = None) -> AsyncIterator[bytes]:
+    # Server-side cursor, so memory is bounded by one chunk. The session is opened here: the response body is
+    # still streaming after request-scoped dependencies have closed theirs.
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    writer = WRITERS[fmt]()
+    query = (
+        filter_transactions(select(*TRANSACTION_COLUMNS).where(Transaction.user_id == user_id), filters)
+        .order_by(Transaction.date, Transaction.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    async with read_sessionmaker(user_id)() as db:
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            rows = [row._asdict() for row in partition]
+            if predictor is not None:
+                await fill_categories(rows, predictor)
+            data = writer.write(rows)
+            if data:
+                yield data
+    data = writer.close()
+    if data:
+        yield data
@@ -0,0 +1,279 @@
+import codecs
+import csv
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.duplicates import date_bucket, duplicate_policy, fingerprint_matches, transaction_fingerprint
+from app.finance import aggregate_delta, apply_aggregate_delta, apply_rollup_delta, rollup_delta
+from app.models import Transaction
+from app.search_index import SearchIndexWrites
+from app.schemas import DuplicatePolicy, TransactionImportRow
+
+
+class ImportFormat:
+    CSV = "csv"
+    NDJSON = "ndjson"
+
+    @staticmethod
+    def from_content_type(content_type: str | None) -> str:
+        content_type = (content_type or "").lower()
+        if "csv" in content_type:
+            return ImportFormat.CSV
+        if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+            return ImportFormat.NDJSON
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            detail="Send text/csv or application/x-ndjson")
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Only "\n" ends a line (a "\r" before it stays and is dropped by the parsers); str.splitlines would also
+    # split on \x0b, \x1c, \u2028 and friends, which can appear inside descriptions.
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_csv_records(lines: AsyncIterator[str]) -> AsyncIterator[str]:
+    # A quoted field may span lines (multi-line memos in bank exports). Quotes inside a field are doubled, so a
+    # record is complete once it holds an even number of them.
+    record = ""
+    quotes = 0
+    async for line in lines:
+        record += line
+        quotes += line.count('"')
+        if quotes % 2 == 0:
+            yield record
+            record = ""
+            quotes = 0
+    if record:
+        yield record
+
+
+def _signed_row(amount, type_) -> dict:
+    # Bank exports carry the direction in the sign of the amount.
+    if type_ in (None, "") and amount not in (None, ""):
+        try:
+            value = Decimal(str(amount).strip())
+        except InvalidOperation:
+            return {"amount": amount, "type": None}
+        return {"amount": abs(value), "type": "expense" if value < 0 else "income"}
+    return {"amount": amount, "type": type_}
+
+
+def parse_csv_line(line: str, header: list[str]) -> dict:
+    values = next(csv.reader([line]), [])
+    record = {key: value for key, value in zip(header, values)}
+    row = _signed_row(record.get("amount"), record.get("type"))
+    row["description"] = record.get("description") or None
+    row["date"] = record.get("date") or None
+    return row
+
+
+def parse_ndjson_line(line: str) -> dict:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("Each line must be a JSON object")
+    row = _signed_row(record.get("amount"), record.get("type"))
+    row["description"] = record.get("description")
+    row["date"] = record.get("date")
+    return row
+
+
+class TransactionImporter:
+    def __init__(self, user_id: int, db: AsyncSession, categorizer=None, policy: DuplicatePolicy | None = None):
+        self.user_id = user_id
+        self.db = db
+        self.categorizer = categorizer
+        self.policy = duplicate_policy(policy)
+        self.batch: list[dict] = []
+        # Per fingerprint: rows this import has written (not counted as the user's earlier rows) and rows it
+        # has matched to earlier rows so far.
+        self.written: Counter = Counter()
+        self.matched: Counter = Counter()
+        # The fingerprints counted above by date bucket, so counts for buckets the import has left can be dropped.
+        self.counted: defaultdict[int, set[str]] = defaultdict(set)
+        self.imported = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors: list[dict] = []
+        self.categories: Counter = Counter()
+
+    def add_error(self, row_number: int, errors: list):
+        self.error_count += 1
+        if len(self.errors) < settings.IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row_number, "errors": errors})
+
+    async def add(self, row_number: int, row: dict):
+        try:
+            validated = TransactionImportRow.model_validate(row)
+        except ValidationError as e:
+            self.add_error(row_number, [
+                {"field": ".".join(str(loc) for loc in err["loc"]), "message": err["msg"]}
+                for err in e.errors()
+            ])
+            return
+        self.batch.append({
+            "user_id": self.user_id,
+            "amount": validated.amount,
+            "type": validated.type.value,
+            "description": validated.description or "",
+            "date": validated.date or datetime.now(timezone.utc),
+        })
+        if len(self.batch) >= settings.IMPORT_BATCH_SIZE:
+            await self.flush()
+
+    async def mark_duplicates(self):
+        # Match the batch against the user's transactions by fingerprint, as a multiset. A statement can legitimately
+        # hold several identical rows (two coffees on one day), so a row only counts as a duplicate while the user
+        # already has more rows with its fingerprint than this import has matched. Re-importing the same statement
+        # therefore matches row for row, and only genuinely new rows get through.
+        for row in self.batch:
+            row["fingerprint"] = transaction_fingerprint(self.user_id, row["amount"], row["type"],
+                                                         row["description"], row["date"])
+            row["duplicate_of"] = None
+        self.forget_counts({date_bucket(row["date"]) for row in self.batch})
+        if self.policy == DuplicatePolicy.allow:
+            return
+        existing = await fingerprint_matches(self.user_id, {row["fingerprint"] for row in self.batch}, self.db)
+        kept = []
+        for row in self.batch:
+            count, first_id = existing.get(row["fingerprint"], (0, None))
+            if self.matched[row["fingerprint"]] < count - self.written[row["fingerprint"]]:
+                self.matched[row["fingerprint"]] += 1
+                self.counted[date_bucket(row["date"])].add(row["fingerprint"])
+                self.duplicates += 1
+                if self.policy == DuplicatePolicy.reject:
+                    continue
+                row["duplicate_of"] = first_id
+            kept.append(row)
+        self.batch = kept
+
+    async def flush(self):
+        if not self.batch:
+            return
+        try:
+            await self.mark_duplicates()
+        except Exception as e:
+            await self.db.rollback()
+            print(f"❌ Error matching imported transactions: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Import failed after {self.imported} rows")
+        if not self.batch:
+            return
+        if self.categorizer is not None:
+            categories, version = await self.categorizer.predict_with_version(
+                [row["description"] for row in self.batch]
+            )
+            self.categories.update(categories)
+            for row, category in zip(self.batch, categories):
+                row.update(category=category, category_model_version=version)
+
+        income = expense = Decimal("0.00")
+        rollups: dict[tuple, tuple[Decimal, int]] = {}
+        for row in self.batch:
+            new = (row["amount"], row["type"], row["date"])
+            row_income, row_expense = aggregate_delta(new=new)
+            income += row_income
+            expense += row_expense
+            for key, (total, count) in rollup_delta(new=new).items():
+                batch_total, batch_count = rollups.get(key, (Decimal("0.00"), 0))
+                rollups[key] = (batch_total + total, batch_count + count)
+        try:
+            await self.insert_batch()
+            await apply_aggregate_delta(self.user_id, income, expense, self.db)
+            await apply_rollup_delta(self.user_id, rollups, self.db)
+            await self.db.commit()
+        except HTTPException:
+            await self.db.rollback()
+            raise
+        except Exception as e:
+            await self.db.rollback()
+            print(f"❌ Error importing transactions: {e}")
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                detail=f"Import failed after {self.imported} rows")
+        self.imported += len(self.batch)
+        if self.policy != DuplicatePolicy.allow:
+            for row in self.batch:
+                self.written[row["fingerprint"]] += 1
+                self.counted[date_bucket(row["date"])].add(row["fingerprint"])
+        self.batch = []
+
+    def forget_counts(self, buckets: set[int]):
+        # Keeps memory bounded by the rows near the current batch instead of the whole file. A fingerprint only
+        # recurs within its own bucket, so in a date-ordered statement nothing dropped is needed again; a row far
+        # out of order only loses its earlier counts and is matched (flagged or rejected) more eagerly.
+        low = min(buckets) - settings.DUPLICATE_IMPORT_WINDOWS
+        high = max(buckets) + settings.DUPLICATE_IMPORT_WINDOWS
+        for bucket in [bucket for bucket in self.counted if not low <= bucket <= high]:
+            for fingerprint in self.counted.pop(bucket):
+                del self.written[fingerprint], self.matched[fingerprint]
+
+    async def insert_batch(self):
+        search = SearchIndexWrites(self.db)
+        if not search.enabled:
+            await self.db.execute(insert(Transaction), self.batch)
+            return
+        # The token index needs the new ids: one multi-row INSERT ... RETURNING where supported, else row by row.
+        if self.db.bind.dialect.insert_returning:
+            ids = (await self.db.scalars(
+                insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True), self.batch
+            )).all()
+        else:
+            ids = [(await self.db.execute(insert(Transaction).values(**row))).inserted_primary_key[0]
+                   for row in self.batch]
+        await search.add(self.user_id, [(transaction_id, row["description"], row["date"])
+                                        for transaction_id, row in zip(ids, self.batch)])
+        await search.flush()
+
+    def report(self) -> dict:
+        report = {
+            "imported": self.imported,
+            "failed": self.error_count,
+            "errors": self.errors,
+            "errors_truncated": self.error_count > len(self.errors),
+            # Rejected duplicates were skipped; flagged ones were imported with duplicate_of set.
+            "duplicates": self.duplicates,
+            "duplicate_policy": self.policy.value,
+        }
+        if self.categorizer is not None:
+            report["categories"] = dict(self.categories)
+        return report
+
+
+async def import_transactions(chunks: AsyncIterator[bytes], fmt: str, user_id: int, db: AsyncSession,
+                              categorizer=None, policy: DuplicatePolicy | None = None) -> dict:
+    importer = TransactionImporter(user_id, db, categorizer, policy)
+    header = None
+    row_number = 0
+    lines = iter_lines(chunks)
+    async for line in (iter_csv_records(lines) if fmt == ImportFormat.CSV else lines):
+        if not line.strip():
+            continue
+        if fmt == ImportFormat.CSV and header is None:
+            header = [name.strip().lower() for name in next(csv.reader([line]), [])]
+            continue
+        row_number += 1
+        try:
+            row = parse_csv_line(line, header) if fmt == ImportFormat.CSV else parse_ndjson_line(line)
+        except ValueError as e:
+            importer.add_error(row_number, [{"field": None, "message": str(e)}])
+            continue
+        await importer.add(row_number, row)
+    await importer.flush()
+    return importer.report()
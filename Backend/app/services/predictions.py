@@ -0,0 +1,119 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.cache import LRUCache
+from app.config import settings
+from app.metrics import model_inference_duration, model_inference_rows
+from app.utils import clean_descriptions
+
+
+class PredictionBatcher:
+    def __init__(self, predict, executor: ThreadPoolExecutor, max_batch_size: int, max_wait_ms: float):
+        self.predict = predict
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: list[tuple[list[str], asyncio.Future]] = []
+        self._pending_size = 0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # The loop only keeps weak references to tasks; an in-flight batch must not be collected mid-run.
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, texts: list[str]) -> list[str]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((texts, future))
+        self._pending_size += len(texts)
+        if self._pending_size >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending, self._pending_size = self._pending, [], 0
+        if pending:
+            task = asyncio.get_running_loop().create_task(self._run(pending))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, pending: list[tuple[list[str], asyncio.Future]]):
+        # Requests arriving within the same window share one vectorized transform/predict call.
+        texts = list(dict.fromkeys(text for batch, _ in pending for text in batch))
+        try:
+            labels = await asyncio.get_running_loop().run_in_executor(self.executor, self.predict, texts)
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        predicted = dict(zip(texts, labels.tolist()))
+        for batch, future in pending:
+            if not future.done():
+                future.set_result([predicted[text] for text in batch])
+
+
+class PredictionService:
+    def __init__(self, registry):
+        self.registry = registry
+        self.cache = LRUCache(settings.PREDICTION_CACHE_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=settings.PREDICTION_WORKERS,
+                                           thread_name_prefix="prediction")
+        self.batcher = PredictionBatcher(self._predict_cleaned, self.executor,
+                                         settings.PREDICTION_MAX_BATCH_SIZE, settings.PREDICTION_BATCH_WAIT_MS)
+
+    def _predict_cleaned(self, texts: list[str], model=None):
+        started = time.perf_counter()
+        labels = (model or self.registry.get()).predict(texts)
+        model_inference_duration.observe(time.perf_counter() - started)
+        model_inference_rows.inc(len(texts))
+        return labels
+
+    def _top_k_cleaned(self, texts: list[str], k: int) -> list[list[tuple[str, float]]]:
+        started = time.perf_counter()
+        top = self.registry.get().predict_top_k(texts, k)
+        model_inference_duration.observe(time.perf_counter() - started)
+        model_inference_rows.inc(len(texts))
+        return top
+
+    async def predict_top_k(self, descriptions: list[str], k: int) -> list[list[tuple[str, float]]]:
+        # Probabilities are not cached or batched: they are requested rarely, and the cache holds labels only.
+        if not descriptions:
+            return []
+        cleaned = clean_descriptions(descriptions)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._top_k_cleaned, cleaned, k)
+
+    async def predict_bulk(self, descriptions: list[str]) -> tuple[list[str], str]:
+        # For background jobs: one executor call per batch, skipping the request cache so a backfill does not
+        # evict the entries interactive requests hit, and the batcher so it does not delay them.
+        model = await self.registry.get_async()
+        cleaned = clean_descriptions(descriptions)
+        texts = list(dict.fromkeys(cleaned))
+        labels = await asyncio.get_running_loop().run_in_executor(self.executor, self._predict_cleaned, texts, model)
+        predicted = dict(zip(texts, labels.tolist()))
+        return [predicted[text] for text in cleaned], model.model_version
+
+    async def predict(self, descriptions: list[str]) -> list[str]:
+        return (await self.predict_with_version(descriptions))[0]
+
+    async def predict_with_version(self, descriptions: list[str]) -> tuple[list[str], str]:
+        version = (await self.registry.get_async()).model_version
+        cleaned = clean_descriptions(descriptions)
+        results = {}
+        missing = []
+        for text in dict.fromkeys(cleaned):
+            category = self.cache.get((version, text))
+            if category is None:
+                missing.append(text)
+            else:
+                results[text] = category
+
+        if missing:
+            for text, category in zip(missing, await self.batcher.submit(missing)):
+                self.cache.set((version, text), category)
+                results[text] = category
+        return [results[text] for text in cleaned], version
@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import binascii
+import json
+import time
+from collections import defaultdict
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, exists, func, insert, or_, select, tuple_, update
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.jobs import Job
+from app.models import Transaction, TransactionSearchTerm, TransactionSearchToken, User
+from app.schemas import TransactionRow
+from app.search_index import SearchIndexWrites, search_backend, search_tokens
+from app.services.transactions import TRANSACTION_COLUMNS, TransactionCursor
+
+# InnoDB's default innodb_ft_min_token_size; shorter words are not in the FULLTEXT index at all.
+FULLTEXT_MIN_TOKEN = 3
+
+
+def _offset_cursor(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"offset": offset}).encode()).decode().rstrip("=")
+
+
+def _decode_offset_cursor(cursor: str) -> int:
+    try:
+        offset = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["offset"]
+        return max(int(offset), 0)
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    # Every string starting with prefix sorts below this one, so the prefix becomes an index range.
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+async def _fetch_rows(user_id: int, ids: list[int], db: AsyncSession) -> list:
+    rows = (await db.execute(
+        select(*TRANSACTION_COLUMNS).where(Transaction.user_id == user_id, Transaction.id.in_(ids))
+    )).all()
+    by_id = {row.id: row for row in rows}
+    return [by_id[transaction_id] for transaction_id in ids if transaction_id in by_id]
+
+
+async def _search_index(user_id: int, terms: list[str], limit: int, cursor: str | None,
+                        db: AsyncSession) -> tuple[list, str | None]:
+    # Every term must match, the last also as a prefix; newest first. The rarest term's postings are walked in
+    # (date, id) order and each candidate is probed for the other terms, so the work follows the page size.
+    *exact, prefix = terms
+    vocabulary = (await db.execute(
+        select(TransactionSearchTerm.token, TransactionSearchTerm.doc_count)
+        .where(
+            TransactionSearchTerm.user_id == user_id,
+            TransactionSearchTerm.doc_count > 0,
+            or_(TransactionSearchTerm.token.in_(exact),
+                (TransactionSearchTerm.token >= prefix) & (TransactionSearchTerm.token < _prefix_upper_bound(prefix))),
+        )
+    )).all()
+    counts = dict(vocabulary)
+    expansions = sorted((token for token in counts if token.startswith(prefix)), key=counts.get, reverse=True)
+    groups = [[term] for term in exact] + [expansions[:settings.SEARCH_PREFIX_EXPANSIONS]]
+    if any(not group or any(token not in counts for token in group) for group in groups):
+        return [], None
+
+    driver = min(groups, key=lambda group: sum(counts[token] for token in group))
+    others = [group for group in groups if group is not driver]
+    postings = []
+    for token in driver:
+        query = (
+            select(TransactionSearchToken.date, TransactionSearchToken.transaction_id)
+            .where(TransactionSearchToken.user_id == user_id, TransactionSearchToken.token == token)
+        )
+        if cursor:
+            query = query.where(tuple_(TransactionSearchToken.date, TransactionSearchToken.transaction_id)
+                                < TransactionCursor.decode(cursor))
+        for group in others:
+            other = aliased(TransactionSearchToken)
+            query = query.where(exists().where(
+                other.user_id == user_id,
+                other.token.in_(group),
+                other.date == TransactionSearchToken.date,
+                other.transaction_id == TransactionSearchToken.transaction_id,
+            ))
+        query = query.order_by(TransactionSearchToken.date.desc(), TransactionSearchToken.transaction_id.desc())
+        postings.extend((await db.execute(query.limit(limit))).all())
+
+    # Several prefix expansions can hit the same transaction; merge their pages and keep each id once.
+    page = sorted({transaction_id: date for date, transaction_id in postings}.items(),
+                  key=lambda item: (item[1], item[0]), reverse=True)[:limit]
+    rows = await _fetch_rows(user_id, [transaction_id for transaction_id, _ in page], db)
+    next_cursor = TransactionCursor.encode(rows[-1]) if len(page) == limit and rows else None
+    return rows, next_cursor
+
+
+async def _search_fulltext(user_id: int, terms: list[str], limit: int, cursor: str | None,
+                           db: AsyncSession) -> tuple[list, str | None]:
+    # Boolean mode: every term required, the last one as a prefix; ranked by InnoDB's relevance score.
+    *exact, prefix = [term for term in terms if len(term) >= FULLTEXT_MIN_TOKEN] or [""]
+    if not prefix:
+        return [], None
+    against = " ".join([f"+{term}" for term in exact] + [f"+{prefix}*"])
+    score = match(Transaction.description, against=against).in_boolean_mode()
+    offset = _decode_offset_cursor(cursor) if cursor else 0
+    rows = (await db.execute(
+        select(*TRANSACTION_COLUMNS)
+        .where(Transaction.user_id == user_id, score)
+        .order_by(score.desc(), Transaction.date.desc(), Transaction.id.desc())
+        .offset(offset)
+        .limit(limit)
+    )).all()
+    return rows, _offset_cursor(offset + limit) if len(rows) == limit else None
+
+
+async def search_transactions(user_id: int, q: str, limit: int, db: AsyncSession,
+                              cursor: str | None = None) -> tuple[list[TransactionRow], str | None]:
+    terms = search_tokens(q)[:settings.SEARCH_MAX_TERMS]
+    if not terms:
+        return [], None
+    if search_backend(db.bind.dialect.name) == "fulltext":
+        rows, next_cursor = await _search_fulltext(user_id, terms, limit, cursor, db)
+    else:
+        rows, next_cursor = await _search_index(user_id, terms, limit, cursor, db)
+    return [row._asdict() for row in rows], next_cursor
+
+
+async def rebuild_search_index(job: Job, batch_size: int, throttle_ms: int, user_id: int | None = None):
+    # Rebuilds the token index from the transactions table (after enabling the index backend, or to repair it)
+    # one id range per transaction: the range's postings are replaced by fresh ones, so searches keep working
+    # and no statement touches more than a batch. Writes made meanwhile index themselves as usual.
+    async with AsyncSessionLocal() as db:
+        if search_backend(db.bind.dialect.name) != "index":
+            raise RuntimeError("The token index is only used when the search backend is 'index'")
+
+        last_id = 0
+        processed = 0
+        started = time.perf_counter()
+        job.progress.update(rows=0, last_id=0, rows_per_sec=0.0)
+        while True:
+            query = (
+                select(Transaction.id, Transaction.user_id, Transaction.description, Transaction.date)
+                .where(Transaction.id > last_id)
+                .order_by(Transaction.id)
+                .limit(batch_size)
+                # MySQL: an edit of these rows waits until their postings are replaced, not the other way round.
+                .with_for_update()
+            )
+            if user_id is not None:
+                query = query.where(Transaction.user_id == user_id)
+            rows = (await db.execute(query)).all()
+            # Past the last transaction, only stale postings are left: clear them in batches of ids as well.
+            if not rows:
+                stale = (await db.execute(
+                    select(TransactionSearchToken.transaction_id)
+                    .where(TransactionSearchToken.transaction_id > last_id,
+                           *([TransactionSearchToken.user_id == user_id] if user_id is not None else []))
+                    .order_by(TransactionSearchToken.transaction_id)
+                    .limit(batch_size)
+                )).scalars().all()
+                if not stale:
+                    break
+                range_end = stale[-1]
+            else:
+                range_end = rows[-1].id
+
+            # Search responses are cached on data_version: move it on for everyone whose postings are replaced.
+            posting_owners = select(TransactionSearchToken.user_id).where(
+                TransactionSearchToken.transaction_id > last_id, TransactionSearchToken.transaction_id <= range_end)
+            await db.execute(
+                update(User)
+                .where(or_(User.id.in_({row.user_id for row in rows}), User.id.in_(posting_owners)),
+                       *([User.id == user_id] if user_id is not None else []))
+                .values(data_version=User.data_version + 1)
+            )
+            writes = SearchIndexWrites(db)
+            await writes.remove_id_range(last_id, range_end, user_id)
+            by_user = defaultdict(list)
+            for transaction_id, owner_id, description, date in rows:
+                by_user[owner_id].append((transaction_id, description, date))
+            for owner_id, owner_rows in by_user.items():
+                await writes.add(owner_id, owner_rows)
+            await writes.flush()
+            await db.commit()
+
+            processed += len(rows)
+            last_id = range_end
+            elapsed = time.perf_counter() - started
+            job.progress.update(rows=processed, last_id=last_id,
+                                rows_per_sec=round(processed / elapsed, 1) if elapsed else 0.0)
+            if throttle_ms:
+                await asyncio.sleep(throttle_ms / 1000)
+
+        await recount_search_terms(db, batch_size, throttle_ms, user_id)
+
+
+async def recount_search_terms(db: AsyncSession, batch_size: int, throttle_ms: int, user_id: int | None = None):
+    # Term counts are recomputed from the postings for a range of users at a time. Deleting first locks the
+    # range's terms (SQLite: the database) before the INSERT ... SELECT reads the postings, so a concurrent write
+    # cannot slip a term in between and lose it.
+    users = max(1, batch_size // 100)
+    last_user = 0 if user_id is None else user_id - 1
+    while True:
+        if user_id is None:
+            ids = (await db.execute(
+                select(User.id).where(User.id > last_user).order_by(User.id).limit(users)
+            )).scalars().all()
+            if not ids:
+                break
+        else:
+            ids = [user_id]
+        in_range = (TransactionSearchTerm.user_id > last_user, TransactionSearchTerm.user_id <= ids[-1])
+        await db.execute(delete(TransactionSearchTerm).where(*in_range))
+        await db.execute(insert(TransactionSearchTerm).from_select(
+            ["user_id", "token", "doc_count"],
+            select(TransactionSearchToken.user_id, TransactionSearchToken.token, func.count())
+            .where(TransactionSearchToken.user_id > last_user, TransactionSearchToken.user_id <= ids[-1])
+            .group_by(TransactionSearchToken.user_id, TransactionSearchToken.token),
+        ))
+        await db.commit()
+        last_user = ids[-1]
+        if user_id is not None:
+            break
+        if throttle_ms:
+            await asyncio.sleep(throttle_ms / 1000)
@@ -1,69 +1,357 @@
+import base64
+import binascii
+import json
 from datetime import datetime, timezone
+from decimal import Decimal
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models import Transaction
-from app.schemas import TransactionCreateRequest, TransactionUpdateRequest, TransactionResponse
-from app.finance import update_user_aggregates
+from app.schemas import (
+    TransactionCreateRequest, TransactionUpdateRequest, TransactionFilters, TransactionRow, TransactionBatchRequest,
+    DuplicatePolicy
+)
+from app.search_index import SearchIndexWrites
+from app.duplicates import (
+    duplicate_policy, find_duplicate, later_fingerprints, recent_fingerprints, remember_response, stored_response,
+    transaction_fingerprint
+)
+from app.metrics import model_inference_failures
+from app.finance import ZERO, aggregate_delta, apply_aggregate_delta, apply_rollup_delta, rollup_delta
 
 
-class TransactionService:
+class TransactionCursor:
     @staticmethod
-    def verify_transaction_ownership(db: Session, transaction_id: int, user_id: int) -> int:
-        transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
-        if not transaction:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
-        if transaction.user_id != user_id:
-            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                                detail="Not authorized to access this transaction")
-        return transaction.user_id
-
-
-def get_transactions(user_id: int, skip: int, limit: int, db: Session) -> list[TransactionResponse]:
-    transactions = (
-        db.query(Transaction)
-        .filter(Transaction.user_id == user_id)
-        .order_by(Transaction.date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-    return [TransactionResponse.from_orm(t) for t in transactions]
+    def encode(transaction: Transaction) -> str:
+        raw = json.dumps([transaction.date.isoformat(), transaction.id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode(cursor: str) -> tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            date, transaction_id = json.loads(raw)
+            return datetime.fromisoformat(date), int(transaction_id)
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
 
+def filter_transactions(query, filters: TransactionFilters | None):
+    if filters is None:
+        return query
+    if filters.date_from is not None:
+        query = query.filter(Transaction.date >= filters.date_from)
+    if filters.date_to is not None:
+        query = query.filter(Transaction.date < filters.date_to)
+    if filters.type is not None:
+        query = query.filter(Transaction.type == filters.type.value)
+    if filters.min_amount is not None:
+        query = query.filter(Transaction.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        query = query.filter(Transaction.amount <= filters.max_amount)
+    if filters.description:
+        query = query.filter(Transaction.description.ilike(f"%{filters.description}%"))
+    if filters.duplicate is not None:
+        query = query.filter(Transaction.duplicate_of.isnot(None) if filters.duplicate
+                             else Transaction.duplicate_of.is_(None))
+    return query
 
-def create_transaction(transaction: TransactionCreateRequest, user_id: int, db: Session) -> dict:
-    new_transaction = Transaction(
-        user_id=user_id,
-        amount=transaction.amount,
-        type=transaction.type,
-        description=transaction.description or "",
-        date=datetime.now(timezone.utc)
+
+TRANSACTION_COLUMNS = (
+    Transaction.id, Transaction.user_id, Transaction.amount, Transaction.type,
+    Transaction.description, Transaction.date, Transaction.category, Transaction.duplicate_of,
+)
+
+
+async def get_transactions(user_id: int, skip: int, limit: int, db: AsyncSession, cursor: str | None = None,
+                           filters: TransactionFilters | None = None) -> tuple[list[TransactionRow], str | None]:
+    query = (
+        filter_transactions(select(*TRANSACTION_COLUMNS).where(Transaction.user_id == user_id), filters)
+        .order_by(Transaction.date.desc(), Transaction.id.desc())
     )
-    db.add(new_transaction)
-    db.commit()
-    update_user_aggregates(user_id, db)
-    return {"message": "Transaction added and aggregates updated"}
+    if cursor:
+        date, transaction_id = TransactionCursor.decode(cursor)
+        # Row-value comparison lets the (user_id, date, id) index seek straight to the cursor.
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < (date, transaction_id))
+    elif skip:
+        query = query.offset(skip)
+
+    rows = (await db.execute(query.limit(limit))).all()
+    next_cursor = TransactionCursor.encode(rows[-1]) if len(rows) == limit else None
+    return [row._asdict() for row in rows], next_cursor
+
+
+async def categorize(description: str | None, predictor) -> dict:
+    return (await categorize_many([description], predictor))[0]
+
+
+async def categorize_many(descriptions: list[str | None], predictor) -> list[dict]:
+    if predictor is None or not descriptions:
+        return [{} for _ in descriptions]
+    try:
+        categories, version = await predictor.predict_with_version([description or "" for description in descriptions])
+    except Exception as e:
+        # The app runs without a usable model (see main.lifespan): store the write uncategorized, and the category
+        # backfill fills it in once a model loads.
+        print(f"❌ Error categorizing transactions: {e}")
+        model_inference_failures.inc(len(descriptions))
+        return [{"category": None, "category_model_version": None} for _ in descriptions]
+    return [{"category": category, "category_model_version": version} for category in categories]
+
+
+# Columns that feed the aggregates and rollups; an update touching none of them needs no pre-image.
+AGGREGATE_FIELDS = ("amount", "type", "date")
+# Columns the duplicate fingerprint is derived from.
+FINGERPRINT_FIELDS = ("amount", "type", "description", "date")
+
+
+class TransactionWrites:
+    # One unit of work over a user's transactions. Ownership sits in each UPDATE/DELETE WHERE clause; aggregate
+    # and rollup deltas are applied once by flush(), and the caller commits.
+    def __init__(self, user_id: int, db: AsyncSession, policy: DuplicatePolicy | None = None):
+        self.user_id = user_id
+        self.db = db
+        self.policy = duplicate_policy(policy)
+        self.search = SearchIndexWrites(db)
+        self.income = ZERO
+        self.expense = ZERO
+        self.rollups: dict[tuple, tuple[Decimal, int]] = {}
+
+    def _track(self, old: tuple | None = None, new: tuple | None = None):
+        income, expense = aggregate_delta(old=old, new=new)
+        self.income += income
+        self.expense += expense
+        for key, (total, count) in rollup_delta(old=old, new=new).items():
+            current_total, current_count = self.rollups.get(key, (ZERO, 0))
+            self.rollups[key] = (current_total + total, current_count + count)
 
+    def _owned(self, transaction_id: int):
+        return (Transaction.id == transaction_id) & (Transaction.user_id == self.user_id)
 
-def update_transaction(transaction: TransactionUpdateRequest, transaction_id: int, user_id: int, db: Session) -> dict:
-    TransactionService.verify_transaction_ownership(db, transaction_id, user_id)
-    db_transaction = db.query(Transaction).filter(Transaction.id == transaction_id).first()
+    async def _missing(self, transaction_id: int):
+        owner_id = (await self.db.execute(
+            select(Transaction.user_id).where(Transaction.id == transaction_id)
+        )).scalar_one_or_none()
+        if owner_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found")
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to access this transaction")
+
+    async def _locked_pre_image(self, transaction_id: int, fields: tuple = AGGREGATE_FIELDS) -> tuple:
+        row = (await self.db.execute(
+            select(*(getattr(Transaction, field) for field in fields))
+            .where(self._owned(transaction_id))
+            .with_for_update()
+        )).one_or_none()
+        if row is None:
+            await self._missing(transaction_id)
+        return tuple(row)
+
+    async def _fingerprint(self, values: dict, before_id: int | None = None) -> dict:
+        # The row stores its own bucket's fingerprint; matching also looks one bucket back (recent_fingerprints),
+        # for creates and edits alike. Only earlier rows count as originals.
+        fingerprint_values = [values[field] for field in FINGERPRINT_FIELDS]
+        duplicate_of = None
+        if self.policy != DuplicatePolicy.allow:
+            duplicate_of = await find_duplicate(self.user_id, recent_fingerprints(self.user_id, *fingerprint_values),
+                                                self.db, before_id=before_id)
+        return {"fingerprint": transaction_fingerprint(self.user_id, *fingerprint_values), "duplicate_of": duplicate_of}
+
+    async def _release_duplicates(self, transaction_id: int, old: dict):
+        # Rows flagged as copies of a row that is deleted (or no longer says the same thing): the earliest of them
+        # becomes the original and the rest point at it. Found through the (user_id, fingerprint) index.
+        fingerprint_values = [old[field] for field in FINGERPRINT_FIELDS]
+        copies = (await self.db.execute(
+            select(Transaction.id)
+            .where(Transaction.user_id == self.user_id,
+                   Transaction.fingerprint.in_(later_fingerprints(self.user_id, *fingerprint_values)),
+                   Transaction.duplicate_of == transaction_id)
+            .order_by(Transaction.id)
+        )).scalars().all()
+        if not copies:
+            return
+        await self.db.execute(
+            update(Transaction)
+            .where(Transaction.user_id == self.user_id, Transaction.id.in_(copies))
+            .values(duplicate_of=case((Transaction.id == copies[0], None), else_=copies[0]))
+            .execution_options(synchronize_session=False)
+        )
+
+    async def create(self, transaction: TransactionCreateRequest, category: dict) -> tuple[int, int | None]:
+        # Returns the new id and, when it was flagged, the id of the transaction it duplicates.
+        values = {
+            "user_id": self.user_id,
+            "amount": transaction.amount,
+            "type": transaction.type.value,
+            "description": transaction.description or "",
+            "date": datetime.now(timezone.utc),
+            **category,
+        }
+        values.update(await self._fingerprint(values))
+        duplicate_of = values["duplicate_of"]
+        if duplicate_of is not None and self.policy == DuplicatePolicy.reject:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail={"message": "Duplicate transaction", "duplicate_of": duplicate_of})
+        result = await self.db.execute(insert(Transaction).values(**values))
+        transaction_id = result.inserted_primary_key[0]
+        self._track(new=(values["amount"], values["type"], values["date"]))
+        await self.search.add(self.user_id, [(transaction_id, values["description"], values["date"])])
+        return transaction_id, duplicate_of
+
+    async def update(self, transaction_id: int, changes: dict):
+        if "type" in changes:
+            changes["type"] = getattr(changes["type"], "value", changes["type"])
+        if not any(field in changes for field in FINGERPRINT_FIELDS):
+            # Nothing the totals, the fingerprint or the search index depend on: no pre-image needed, and the
+            # UPDATE's row count doubles as the ownership check.
+            if not changes:
+                # An empty update still has to answer 404/403 for someone else's row.
+                await self._locked_pre_image(transaction_id)
+                return
+            result = await self.db.execute(
+                update(Transaction)
+                .where(self._owned(transaction_id))
+                .values(**changes)
+                .execution_options(synchronize_session=False)
+            )
+            if not result.rowcount:
+                await self._missing(transaction_id)
+            return
+
+        # One locked read serves the ownership check, the aggregate deltas, the new fingerprint and the search
+        # postings; the fingerprint and its flag are then written by the same UPDATE as the changes.
+        old = dict(zip(FINGERPRINT_FIELDS, await self._locked_pre_image(transaction_id, FINGERPRINT_FIELDS)))
+        new = {field: changes.get(field, value) for field, value in old.items()}
+        changes.update(await self._fingerprint(new, before_id=transaction_id))
+        await self.db.execute(
+            update(Transaction)
+            .where(self._owned(transaction_id))
+            .values(**changes)
+            .execution_options(synchronize_session=False)
+        )
+        if changes["fingerprint"] != transaction_fingerprint(self.user_id, *old.values()):
+            await self._release_duplicates(transaction_id, old)
+        self._track(old=tuple(old[field] for field in AGGREGATE_FIELDS),
+                    new=tuple(new[field] for field in AGGREGATE_FIELDS))
+        if self.search.enabled and ("description" in changes or "date" in changes):
+            await self.search.remove([transaction_id])
+            await self.search.add(self.user_id, [(transaction_id, new["description"], new["date"])])
+
+    async def delete(self, transaction_id: int):
+        stmt = delete(Transaction).where(self._owned(transaction_id)).execution_options(synchronize_session=False)
+        if self.db.bind.dialect.delete_returning:
+            row = (await self.db.execute(
+                stmt.returning(*(getattr(Transaction, field) for field in FINGERPRINT_FIELDS))
+            )).one_or_none()
+            if row is None:
+                await self._missing(transaction_id)
+            old = dict(zip(FINGERPRINT_FIELDS, row))
+        else:
+            # No DELETE ... RETURNING (MySQL): lock and read the pre-image, then delete.
+            old = dict(zip(FINGERPRINT_FIELDS, await self._locked_pre_image(transaction_id, FINGERPRINT_FIELDS)))
+            await self.db.execute(stmt)
+        await self._release_duplicates(transaction_id, old)
+        self._track(old=tuple(old[field] for field in AGGREGATE_FIELDS))
+        await self.search.remove([transaction_id])
+
+    async def flush(self):
+        await self.search.flush()
+        await apply_aggregate_delta(self.user_id, self.income, self.expense, self.db)
+        await apply_rollup_delta(self.user_id, {key: value for key, value in self.rollups.items()
+                                                if value != (ZERO, 0)}, self.db)
 
-    for field, value in transaction.dict(exclude_unset=True).items():
-        setattr(db_transaction, field, value)
-    db.commit()
-    update_user_aggregates(user_id, db)
+
+async def create_transaction(transaction: TransactionCreateRequest, user_id: int, db: AsyncSession,
+                             predictor=None, policy: DuplicatePolicy | None = None,
+                             idempotency_key: str | None = None) -> dict:
+    writes = TransactionWrites(user_id, db, policy)
+    category = await categorize(transaction.description, predictor)
+    transaction_id, duplicate_of = await writes.create(transaction, category)
+    await writes.flush()
+    response = {"message": "Transaction added and aggregates updated", "transaction_id": transaction_id}
+    if duplicate_of is not None:
+        response["duplicate_of"] = duplicate_of
+    if idempotency_key:
+        await remember_response(user_id, idempotency_key, transaction, writes.policy, response, db)
+    await db.commit()
+    return response
+
+
+async def create_transaction_once(transaction: TransactionCreateRequest, idempotency_key: str, user_id: int,
+                                  db: AsyncSession, predictor=None,
+                                  policy: DuplicatePolicy | None = None) -> tuple[dict, bool]:
+    # Returns the response and whether it is a replay of an earlier request with the same key.
+    policy = duplicate_policy(policy)
+    stored = await stored_response(user_id, idempotency_key, transaction, policy, db)
+    if stored is not None:
+        return stored, True
+    try:
+        return await create_transaction(transaction, user_id, db, predictor, policy, idempotency_key), False
+    except IntegrityError:
+        # A concurrent request with the same key committed first; answer with its response.
+        await db.rollback()
+        stored = await stored_response(user_id, idempotency_key, transaction, policy, db)
+        if stored is None:
+            raise
+        return stored, True
+
+
+async def update_transaction(transaction: TransactionUpdateRequest, transaction_id: int, user_id: int,
+                             db: AsyncSession, predictor=None) -> dict:
+    changes = transaction.model_dump(exclude_unset=True)
+    if "description" in changes:
+        changes.update(await categorize(changes["description"], predictor))
+    writes = TransactionWrites(user_id, db)
+    await writes.update(transaction_id, changes)
+    await writes.flush()
+    await db.commit()
     return {
         "message": f"Transaction with ID {transaction_id} updated successfully and aggregates updated",
         "transaction_id": transaction_id
     }
 
 
-def delete_transaction(transaction_id: int, user_id: int, db: Session) -> dict:
-    user_id = TransactionService.verify_transaction_ownership(db, transaction_id, user_id)
-    db.query(Transaction).filter(Transaction.id == transaction_id).delete()
-    db.commit()
-    update_user_aggregates(user_id, db)
+async def delete_transaction(transaction_id: int, user_id: int, db: AsyncSession) -> dict:
+    writes = TransactionWrites(user_id, db)
+    await writes.delete(transaction_id)
+    await writes.flush()
+    await db.commit()
     return {
         "message": f"Transaction with ID {transaction_id} deleted successfully and aggregates updated",
         "transaction_id": transaction_id
-    }
\ No newline at end of file
+    }
+
+
+async def apply_transaction_batch(batch: TransactionBatchRequest, user_id: int, db: AsyncSession,
+                                  predictor=None, policy: DuplicatePolicy | None = None) -> dict:
+    # A client's queued creates/updates/deletes, applied in order, all or nothing, with one commit.
+    described = [op.data.description for op in batch.operations
+                 if op.op == "create" or (op.op == "update" and "description" in op.data.model_fields_set)]
+    categories = iter(await categorize_many(described, predictor))
+
+    writes = TransactionWrites(user_id, db, policy)
+    results = []
+    for index, op in enumerate(batch.operations):
+        duplicate_of = None
+        try:
+            if op.op == "create":
+                transaction_id, duplicate_of = await writes.create(op.data, next(categories))
+            elif op.op == "update":
+                transaction_id = op.id
+                changes = op.data.model_dump(exclude_unset=True)
+                if "description" in changes:
+                    changes.update(next(categories))
+                await writes.update(transaction_id, changes)
+            else:
+                transaction_id = op.id
+                await writes.delete(transaction_id)
+        except HTTPException as e:
+            await db.rollback()
+            raise HTTPException(status_code=e.status_code, detail={"operation": index, "detail": e.detail})
+        result = {"op": op.op, "transaction_id": transaction_id}
+        if duplicate_of is not None:
+            result["duplicate_of"] = duplicate_of
+        results.append(result)
+    await writes.flush()
+    await db.commit()
+    return {"message": f"{len(results)} operations applied and aggregates updated", "results": results}
@@ -1,23 +1,26 @@
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import mark_recent_write
 from app.models import User
 from app.schemas import UserResponse, UserUpdateRequest
 
-def get_user_profile(user_id: int, db: Session) -> UserResponse:
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+async def get_user_profile(user_id: int, db: AsyncSession) -> UserResponse:
+    user = await db.get(User, user_id)
+    if not user or user.is_deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return UserResponse.model_validate(user)
 
 
-def update_user_profile(update_data: UserUpdateRequest, user_id: int, db: Session) -> UserResponse:
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+async def update_user_profile(update_data: UserUpdateRequest, user_id: int, db: AsyncSession) -> UserResponse:
+    user = await db.get(User, user_id)
+    if not user or user.is_deleted:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
 
     for field, value in update_data.model_dump(exclude_unset=True).items():
         setattr(user, field, value)
-    db.commit()
-    db.refresh(user)
+    user.data_version = User.data_version + 1
+    await db.commit()
+    mark_recent_write(user_id)
+    await db.refresh(user)
     return UserResponse.model_validate(user)
 
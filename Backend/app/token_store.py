@@ -0,0 +1,220 @@
+import asyncio
+import fnmatch
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db import AsyncSessionLocal
+from app.models import RefreshToken
+
+
+def hash_token(token: str) -> str:
+    # Only the digest is stored, so a leaked table or keyspace cannot be replayed as cookies.
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _invalid(detail: str = "Invalid refresh token") -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail)
+
+
+def _new_token() -> tuple[str, datetime]:
+    return str(uuid4()), datetime.now(timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+
+class DatabaseTokenStore:
+    # Refresh tokens in the refresh_tokens table. Writes join the caller's transaction; the caller commits.
+    name = "database"
+
+    async def issue(self, user_id: int, db: AsyncSession) -> tuple[str, datetime]:
+        token, expires_at = _new_token()
+        db.add(RefreshToken(user_id=user_id, token_hash=hash_token(token), expires_at=expires_at))
+        return token, expires_at
+
+    async def rotate(self, token: str, db: AsyncSession) -> tuple[int, str, datetime]:
+        row = (await db.execute(
+            select(RefreshToken.id, RefreshToken.user_id, RefreshToken.expires_at)
+            .where(RefreshToken.token_hash == hash_token(token))
+        )).first()
+        if not row:
+            raise _invalid()
+
+        deleted = await db.execute(delete(RefreshToken).where(RefreshToken.id == row.id))
+        if row.expires_at.replace(tzinfo=timezone.utc) < datetime.now(timezone.utc):
+            await db.commit()
+            raise _invalid("Refresh token expired")
+        # A concurrent refresh with the same token already consumed the row.
+        if not deleted.rowcount:
+            raise _invalid()
+
+        new_token, expires_at = await self.issue(row.user_id, db)
+        return row.user_id, new_token, expires_at
+
+    async def revoke(self, token: str, db: AsyncSession):
+        await db.execute(delete(RefreshToken).where(RefreshToken.token_hash == hash_token(token)))
+
+    async def revoke_user(self, user_id: int, db: AsyncSession):
+        await db.execute(delete(RefreshToken).where(RefreshToken.user_id == user_id))
+
+    async def revoke_all(self, db: AsyncSession):
+        await db.execute(delete(RefreshToken))
+
+    def session_clauses(self, user_id_column):
+        # Correlated (has an unexpired token, newest login) expressions for a users query, both answered per user
+        # from the (user_id, expires_at) index.
+        unexpired = (RefreshToken.user_id == user_id_column) & (RefreshToken.expires_at > datetime.now(timezone.utc))
+        logged_in_since = select(func.max(RefreshToken.created_at)).where(unexpired).scalar_subquery()
+        return exists().where(unexpired), logged_in_since
+
+    async def purge_expired(self, batch_size: int, throttle_ms: int = 0, progress: dict | None = None) -> int:
+        # Small id-keyed batches, each in its own transaction, so no single DELETE holds locks on
+        # a large range of the table while logins and refreshes keep writing to it.
+        purged = 0
+        async with AsyncSessionLocal() as db:
+            while True:
+                ids = (await db.execute(
+                    select(RefreshToken.id)
+                    .where(RefreshToken.expires_at < datetime.now(timezone.utc))
+                    .limit(batch_size)
+                )).scalars().all()
+                if not ids:
+                    break
+                await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+                await db.commit()
+                purged += len(ids)
+                if progress is not None:
+                    progress["purged"] = purged
+                if len(ids) < batch_size:
+                    break
+                if throttle_ms:
+                    await asyncio.sleep(throttle_ms / 1000)
+        return purged
+
+
+class LocalKeyValue:
+    # In-process stand-in for the subset of the redis.asyncio client the key-value store uses.
+    def __init__(self):
+        self._data: dict[str, tuple[str, float | None]] = {}
+
+    def _live(self, key: str) -> str | None:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return value
+
+    async def get(self, key: str) -> str | None:
+        return self._live(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None):
+        self._data[key] = (value, time.time() + ex if ex else None)
+
+    async def getdel(self, key: str) -> str | None:
+        value = self._live(key)
+        self._data.pop(key, None)
+        return value
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def scan_iter(self, match: str = "*"):
+        for key in list(self._data):
+            if fnmatch.fnmatchcase(key, match) and self._live(key) is not None:
+                yield key
+
+
+class KeyValueTokenStore:
+    # Refresh tokens as expiring keys in Redis (or LocalKeyValue). Expiry is left to the key TTL.
+    PREFIX = "refresh:"
+
+    def __init__(self, client, name: str):
+        self.client = client
+        self.name = name
+
+    def _key(self, token: str) -> str:
+        return self.PREFIX + hash_token(token)
+
+    async def issue(self, user_id: int, db: AsyncSession | None = None) -> tuple[str, datetime]:
+        token, expires_at = _new_token()
+        ttl = int((expires_at - datetime.now(timezone.utc)).total_seconds())
+        await self.client.set(self._key(token), f"{user_id}:{time.time()}", ex=ttl)
+        return token, expires_at
+
+    async def rotate(self, token: str, db: AsyncSession | None = None) -> tuple[int, str, datetime]:
+        # GETDEL is atomic, so two concurrent refreshes with the same token cannot both succeed.
+        value = await self.client.getdel(self._key(token))
+        if value is None:
+            raise _invalid()
+        user_id = int(value.split(":", 1)[0])
+        new_token, expires_at = await self.issue(user_id)
+        return user_id, new_token, expires_at
+
+    async def revoke(self, token: str, db: AsyncSession | None = None):
+        await self.client.delete(self._key(token))
+
+    async def _sessions(self):
+        async for key in self.client.scan_iter(match=self.PREFIX + "*"):
+            value = await self.client.get(key)
+            if value is not None:
+                user_id, created_at = value.split(":", 1)
+                yield key, int(user_id), float(created_at)
+
+    async def revoke_user(self, user_id: int, db: AsyncSession | None = None):
+        keys = [key async for key, owner_id, _ in self._sessions() if owner_id == user_id]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def revoke_all(self, db: AsyncSession | None = None):
+        keys = [key async for key in self.client.scan_iter(match=self.PREFIX + "*")]
+        if keys:
+            await self.client.delete(*keys)
+
+    async def active_sessions(self, db: AsyncSession | None = None) -> dict[int, datetime]:
+        sessions: dict[int, float] = {}
+        async for _, user_id, created_at in self._sessions():
+            sessions[user_id] = max(created_at, sessions.get(user_id, 0.0))
+        return {user_id: datetime.fromtimestamp(created_at, timezone.utc) for user_id, created_at in sessions.items()}
+
+    async def purge_expired(self, batch_size: int, throttle_ms: int = 0, progress: dict | None = None) -> int:
+        return 0
+
+
+def create_token_store():
+    if settings.TOKEN_STORE == "database":
+        return DatabaseTokenStore()
+    if settings.TOKEN_STORE == "memory":
+        return KeyValueTokenStore(LocalKeyValue(), "memory")
+    if settings.TOKEN_STORE == "redis":
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("TOKEN_STORE=redis requires the 'redis' package") from e
+        return KeyValueTokenStore(redis.from_url(settings.REDIS_URL, decode_responses=True), "redis")
+    raise RuntimeError(f"Unknown TOKEN_STORE {settings.TOKEN_STORE!r}; use database, memory or redis")
+
+
+token_store = create_token_store()
+
+
+async def purge_expired_tokens(job, batch_size: int, throttle_ms: int):
+    job.progress.update(purged=0, store=token_store.name)
+    await token_store.purge_expired(batch_size, throttle_ms, job.progress)
+
+
+async def purge_expired_tokens_periodically(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            purged = await token_store.purge_expired(settings.TOKEN_PURGE_BATCH_SIZE, settings.TOKEN_PURGE_THROTTLE_MS)
+            if purged:
+                print(f"Purged {purged} expired refresh tokens")
+        except Exception as e:
+            print(f"❌ Error purging expired refresh tokens: {e}")
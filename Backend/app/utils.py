@@ -1,16 +1,57 @@
 import re
+import sys
 from passlib.context import CryptContext
+from app.config import settings
+
+_DESCRIPTION_NOISE = re.compile(r"\d+|[^\w\s]")
+# ASCII-only descriptions (the vast majority) skip the regex engine entirely. The table is derived
+# from the same pattern, so both paths delete exactly the same characters.
+_ASCII_NOISE_TABLE = str.maketrans("", "", "".join(
+    chr(code) for code in range(128) if _DESCRIPTION_NOISE.fullmatch(chr(code))
+))
+_ASCII_BATCH_TABLE = {code: None for code in _ASCII_NOISE_TABLE if code != 0}
+
 
 def clean_description(text):
     if not isinstance(text, str):
         return ""
     text = text.lower()
-    text = re.sub(r"\d+", "", text)
-    text = re.sub(r"[^\w\s]", "", text)
-    return text.strip()
+    if text.isascii():
+        return text.translate(_ASCII_NOISE_TABLE).strip()
+    return _DESCRIPTION_NOISE.sub("", text).strip()
+
+
+def clean_descriptions(texts):
+    # pandas is only checked for when already imported (training scripts), keeping it off the API's import path.
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(texts, pd.Series):
+        return pd.Series(clean_descriptions(texts.tolist()), index=texts.index, name=texts.name, dtype=object)
 
+    # ASCII descriptions are lowercased and translated as one joined string, which amortizes the
+    # per-call overhead. NUL is normally deleted as noise, so it is kept out of the batch table to act
+    # as the separator; batches that already contain NUL fall back to per-item cleaning.
+    texts = list(texts)
+    ascii_texts = [text for text in texts if isinstance(text, str) and text.isascii()]
+    joined = "\x00".join(ascii_texts)
+    if joined.count("\x00") == len(ascii_texts) - 1:
+        parts = joined.lower().translate(_ASCII_BATCH_TABLE).split("\x00")
+        ascii_cleaned = iter([part.strip() for part in parts])
+    else:
+        ascii_cleaned = iter([clean_description(text) for text in ascii_texts])
+    return [
+        ("" if not isinstance(text, str) else next(ascii_cleaned) if text.isascii() else clean_description(text))
+        for text in texts
+    ]
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max to the configured cost makes needs_update() flag hashes made with any other cost,
+# so they are transparently re-hashed on the next successful login.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+    return pwd_context.verify(plain_password, hashed_password)
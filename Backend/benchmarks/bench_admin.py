@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_admin.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("TOKEN_STORE", "database")
+
+from sqlalchemy import delete, event, func, insert, select
+
+from app.db import AsyncSessionLocal, Base, async_engine, engine
+from app.jobs import job_registry
+from app.models import RefreshToken, Transaction, User
+from app.services.admin import get_logged_in_users, purge_user_transactions
+from harness import SyntheticData
+
+HEAVY_USERS = (1, 2)
+
+
+def seed(data: SyntheticData, rows: int, users: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": i, "email": f"user{i}@example.com", "password": "-", "firstname": "Bench",
+                                     "lastname": f"User{i}", "goal": 0, "is_admin": i % 50 == 0}
+                                    for i in range(1, users + 1)])
+        # Every third user has a live session, some of them several.
+        conn.execute(insert(RefreshToken), [{"user_id": i, "token_hash": f"{i:032x}{n:032x}",
+                                             "expires_at": now + timedelta(days=7 - n),
+                                             "created_at": now - timedelta(minutes=i + n)}
+                                            for i in range(1, users + 1, 3) for n in range(1 + i % 3)])
+        # The two heavy users own 40% of the table each; the rest is spread over everyone else.
+        heavy = int(rows * 0.4)
+        for user_id in HEAVY_USERS:
+            for offset in range(0, heavy, 50_000):
+                conn.execute(insert(Transaction), data.transactions(user_id, min(50_000, heavy - offset)))
+        rest = rows - heavy * len(HEAVY_USERS)
+        for offset in range(0, rest, 50_000):
+            chunk = data.transactions(0, min(50_000, rest - offset))
+            for i, row in enumerate(chunk):
+                row["user_id"] = 3 + (offset + i) % (users - 2)
+            conn.execute(insert(Transaction), chunk)
+
+
+class LongestTransaction:
+    """Wall time between BEGIN and COMMIT on the async engine, i.e. how long row locks could be held."""
+
+    def __init__(self):
+        self.started: float | None = None
+        self.longest = 0.0
+        target = async_engine.sync_engine
+        event.listen(target, "begin", self._begin)
+        event.listen(target, "commit", self._end)
+        event.listen(target, "rollback", self._end)
+
+    def _begin(self, conn):
+        self.started = time.perf_counter()
+
+    def _end(self, conn):
+        if self.started is not None:
+            self.longest = max(self.longest, time.perf_counter() - self.started)
+            self.started = None
+
+    def reset(self):
+        self.longest = 0.0
+
+
+async def old_listing(db):
+    # The previous implementation: every active session grouped, then every matching user, in one response.
+    sessions = dict((await db.execute(
+        select(RefreshToken.user_id, func.max(RefreshToken.created_at))
+        .where(RefreshToken.expires_at > datetime.now(timezone.utc))
+        .group_by(RefreshToken.user_id)
+    )).all())
+    return (await db.execute(select(User.id, User.email).where(User.id.in_(sessions)))).all()
+
+
+async def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await fn(db)
+            best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Admin listing and user deletion against a large transactions table")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=30_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the database of a previous run")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(SyntheticData(42), args.rows, args.users)
+        print(f"seeded {args.rows} transactions, {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    print(f"{'listing: all sessions at once':<40} {await best_of(old_listing, args.repeat):9.2f} ms")
+    first = await best_of(lambda db: get_logged_in_users(db, args.page_size), args.repeat)
+    print(f"{f'listing: first page of {args.page_size}':<40} {first:9.2f} ms")
+    deep = await best_of(lambda db: get_logged_in_users(db, args.page_size, args.users * 9 // 10), args.repeat)
+    print(f"{'listing: page at 90% of the users':<40} {deep:9.2f} ms")
+
+    locks = LongestTransaction()
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        await db.execute(delete(Transaction).where(Transaction.user_id == HEAVY_USERS[0]))
+        await db.commit()
+    print(f"{'delete: single statement':<40} {(time.perf_counter() - started) * 1000:9.2f} ms total, "
+          f"longest transaction {locks.longest * 1000:.2f} ms")
+
+    locks.reset()
+    job = job_registry.start("user_delete", purge_user_transactions, user_id=HEAVY_USERS[1],
+                             batch_size=args.batch_size, throttle_ms=0)
+    await job.task
+    print(f"{f'delete: chunked job, batch={args.batch_size}':<40} "
+          f"{(job.finished_at - job.created_at).total_seconds() * 1000:9.2f} ms total, "
+          f"longest transaction {locks.longest * 1000:.2f} ms ({job.progress['deleted']} rows)")
+    # aiosqlite connections run on non-daemon threads; close them so the interpreter can exit.
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.categorizer import Categorizer, CompactCategorizer
+from app.utils import clean_descriptions
+from harness import SyntheticData, measure_sync
+
+
+def throughput(predict, descriptions: list[str], batch_size: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for offset in range(0, len(descriptions), batch_size):
+            predict(descriptions[offset:offset + batch_size])
+        best = min(best, time.perf_counter() - started)
+    return len(descriptions) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="scikit-learn vs compact NumPy categorizer: latency and throughput")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--train-rows", type=int, default=20_000)
+    parser.add_argument("--max-features", type=int, default=500, help="vocabulary size; 0 keeps every term")
+    parser.add_argument("--ngrams", type=int, default=1, help="upper bound of the word n-gram range")
+    parser.add_argument("--test-rows", type=int, default=20_000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--prune", type=float, default=0.05, help="coefficient threshold for the pruned variant")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    data = SyntheticData(args.seed)
+    descriptions, labels = data.labelled(args.train_rows)
+    sklearn_model = Categorizer()
+    sklearn_model.vectorizer = TfidfVectorizer(max_features=args.max_features or None, ngram_range=(1, args.ngrams))
+    sklearn_model.model = LogisticRegression(max_iter=1000).fit(
+        sklearn_model.vectorizer.fit_transform(clean_descriptions(descriptions)), labels)
+    test = clean_descriptions(data.descriptions(args.test_rows))
+    expected = sklearn_model.predict(test)
+
+    engines = {"sklearn": sklearn_model}
+    work_dir = Path(tempfile.mkdtemp(prefix="bench_categorizer"))
+    for name, options in (("compact float64", {}), ("compact float32", {"dtype": "float32"}),
+                          (f"compact float32 prune={args.prune}", {"dtype": "float32", "prune": args.prune})):
+        path = work_dir / f"{len(engines)}.npz"
+        sklearn_model.export_compact(path, **options)
+        engine = CompactCategorizer()
+        engine.load(path)
+        mismatches = int((engine.predict(test) != expected).sum())
+        print(f"{name:<32} {path.stat().st_size / 1024:8.1f} KiB, {mismatches} label mismatches on {len(test)} rows")
+        engines[name] = engine
+
+    for name, engine in engines.items():
+        single = measure_sync(lambda i: engine.predict([test[i % len(test)]]), args.iterations)
+        top3 = measure_sync(lambda i: engine.predict_top_k([test[i % len(test)]], 3), args.iterations)
+        rates = "  ".join(f"batch={size}: {throughput(engine.predict, test, size, args.repeat):9.0f}/s"
+                          for size in args.batch_sizes)
+        print(f"{name:<32} single p50={single['p50_ms']:.3f} ms  top-3 p50={top3['p50_ms']:.3f} ms  {rates}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_duplicates.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("DUPLICATE_WINDOW_HOURS", "24")
+
+from sqlalchemy import insert, select
+
+from app.db import AsyncSessionLocal, Base, async_engine, engine
+from app.duplicates import date_bucket, find_duplicate, transaction_fingerprint
+from app.jobs import job_registry
+from app.models import Transaction, User
+from app.services.duplicates import scan_duplicate_transactions
+from app.utils import clean_description
+from harness import SyntheticData, measure
+
+USER_ID = 1
+
+
+def seed(data: SyntheticData, rows: int) -> list[dict]:
+    # Rows as they exist before fingerprints: the scan job has to fill the column in.
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    probes = []
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "email": "dupes@example.com", "password": "-",
+                                     "firstname": "Bench", "lastname": "User", "goal": 0}])
+        for offset in range(0, rows, 50_000):
+            chunk = data.transactions(USER_ID, min(50_000, rows - offset))
+            conn.execute(insert(Transaction), chunk)
+            probes.extend(data.random.sample(chunk, 20))
+    return probes
+
+
+async def by_fingerprint(probe: dict):
+    async with AsyncSessionLocal() as db:
+        fingerprint = transaction_fingerprint(USER_ID, probe["amount"], probe["type"], probe["description"],
+                                              probe["date"])
+        return await find_duplicate(USER_ID, [fingerprint], db)
+
+
+async def by_amount_index(probe: dict):
+    # Without a fingerprint: every row of the user with that amount and type, normalized and compared in Python.
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Transaction.id, Transaction.description, Transaction.date)
+            .where(Transaction.user_id == USER_ID, Transaction.amount == probe["amount"],
+                   Transaction.type == probe["type"])
+        )).all()
+    key = (clean_description(probe["description"]), date_bucket(probe["date"]))
+    return min((row.id for row in rows if (clean_description(row.description), date_bucket(row.date)) == key),
+               default=None)
+
+
+async def by_scan(probe: dict):
+    # The naive check: the user's whole history, compared row by row.
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Transaction.id, Transaction.amount, Transaction.type, Transaction.description, Transaction.date)
+            .where(Transaction.user_id == USER_ID)
+        )).all()
+    target = transaction_fingerprint(USER_ID, probe["amount"], probe["type"], probe["description"], probe["date"])
+    return min((row.id for row in rows
+                if transaction_fingerprint(USER_ID, row.amount, row.type, row.description, row.date) == target),
+               default=None)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fingerprint index lookups vs scanning for duplicate transactions")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--scan-iterations", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    probes = seed(SyntheticData(42), args.rows)
+    print(f"seeded {args.rows} transactions in {time.perf_counter() - started:.1f}s")
+
+    job = job_registry.start("duplicate_scan", scan_duplicate_transactions, batch_size=args.batch_size, throttle_ms=0)
+    await job.task
+    print(f"scan job: {job.progress['fingerprinted']} rows fingerprinted in "
+          f"{(job.finished_at - job.created_at).total_seconds():.1f}s ({job.progress['rows_per_sec']} rows/s), "
+          f"{job.progress['duplicate_groups']} duplicate groups [{job.status}]")
+
+    # Half the probes repeat an existing row (a resubmission), half are new amounts.
+    rng = random.Random(7)
+    misses = [{**probe, "amount": probe["amount"] + 1000} for probe in rng.sample(probes, len(probes) // 2)]
+    mixed = probes + misses
+    for probe in probes[:20]:
+        assert await by_fingerprint(probe) == await by_amount_index(probe), "lookups disagree"
+
+    print(f"{'duplicate check':<36} {'p50':>10} {'p99':>10}")
+    for name, fn, iterations in (("fingerprint index", by_fingerprint, args.iterations),
+                                 ("amount index + normalize", by_amount_index, args.iterations),
+                                 ("scan of the user's rows", by_scan, args.scan_iterations)):
+        stats = await measure(lambda i: fn(mixed[i % len(mixed)]), iterations)
+        print(f"{name:<36} {stats['p50_ms']:8.2f}ms {stats['p99_ms']:8.2f}ms")
+    # aiosqlite connections run on non-daemon threads; close them so the interpreter can exit.
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
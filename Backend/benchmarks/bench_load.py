@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_load.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production-use")
+
+from sqlalchemy import insert
+
+from app.auth import create_access_token
+from app.db import Base, engine
+from app.models import Transaction, User
+
+
+def seed(rows: int) -> str:
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": 1, "email": "bench@example.com", "password": "-", "firstname": "Bench",
+                                     "lastname": "User", "goal": Decimal("1000.00")}])
+        conn.execute(insert(Transaction), [
+            {"user_id": 1, "amount": Decimal(i % 300) + Decimal("0.50"), "type": "expense" if i % 4 else "income",
+             "description": f"Merchant {i % 100}", "date": start + timedelta(hours=i)}
+            for i in range(rows)
+        ])
+    return create_access_token({"user_id": 1})
+
+
+async def client_loop(client: httpx.AsyncClient, headers: dict, deadline: float, latencies: list, errors: list):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get("/api/v1/transactions/transactions", params={"limit": 50}, headers=headers)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError as e:
+            errors.append(e)
+
+
+async def run_level(base_url: str, headers: dict, concurrency: int, duration: float) -> dict:
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(client_loop(client, headers, deadline, latencies, errors) for _ in range(concurrency)))
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+    }
+
+
+def wait_for_server(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(base_url + "/docs", timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test of GET /transactions/transactions")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="Benchmark an already running server instead of starting one")
+    args = parser.parse_args()
+
+    token = seed(args.rows)
+    headers = {"Authorization": f"Bearer {token}"}
+    server = None
+    base_url = args.url
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=os.environ.copy(),
+        )
+    try:
+        wait_for_server(base_url)
+        for concurrency in args.concurrency:
+            result = asyncio.run(run_level(base_url, headers, concurrency, args.duration))
+            print(f"clients={result['concurrency']:<4} req/s={result['rps']:8.1f} p50={result['p50_ms']:7.2f} ms "
+                  f"p95={result['p95_ms']:7.2f} ms errors={result['errors']}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
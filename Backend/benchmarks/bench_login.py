@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_login.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production-use")
+
+import httpx
+from sqlalchemy import insert
+
+from app.db import Base, async_engine, engine
+from app.main import app
+from app.models import User
+from app.utils import pwd_context
+
+PASSWORD = "benchmark-password"
+
+
+def seed(users: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    hashed = pwd_context.hash(PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"email": f"user{i}@example.com", "password": hashed, "firstname": "Bench", "lastname": "User"}
+            for i in range(users)
+        ])
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, users: int, duration: float) -> dict:
+    counts = {"ok": 0, "throttled": 0, "failed": 0}
+    deadline = time.perf_counter() + duration
+
+    async def worker(offset: int):
+        i = offset
+        while time.perf_counter() < deadline:
+            response = await client.post("/api/v1/users/login",
+                                         json={"email": f"user{i % users}@example.com", "password": PASSWORD})
+            key = "ok" if response.status_code == 200 else "throttled" if response.status_code == 429 else "failed"
+            counts[key] += 1
+            i += concurrency
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, "logins_per_sec": counts["ok"] / elapsed, **counts}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Logins/sec at increasing concurrency (in-process ASGI)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    args = parser.parse_args()
+
+    seed(args.users)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for concurrency in args.concurrency:
+            result = await run_level(client, concurrency, args.users, args.duration)
+            print(f"clients={result['concurrency']:<4} logins/s={result['logins_per_sec']:7.1f} "
+                  f"ok={result['ok']} 429={result['throttled']} failed={result['failed']}")
+    # aiosqlite connections run on non-daemon threads; close them so the interpreter can exit.
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_pagination.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from sqlalchemy import insert
+
+from app.db import AsyncSessionLocal, Base, async_engine, engine
+from app.models import Transaction
+from app.services.transactions import get_transactions
+
+USER_ID = 1
+
+
+def seed(rows: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime(2015, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, 10_000):
+            conn.execute(insert(Transaction), [
+                {
+                    "user_id": USER_ID,
+                    "amount": Decimal(i % 500) + Decimal("0.99"),
+                    "type": "expense" if i % 3 else "income",
+                    "description": f"Merchant {i % 250}",
+                    "date": start + timedelta(minutes=i),
+                }
+                for i in range(offset, min(offset + 10_000, rows))
+            ])
+
+
+async def timed(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Offset vs keyset pagination latency")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--page", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed(max(args.rows, args.limit * (args.page + 1)))
+    # Both styles at the same depths; page 1 is identical for both (no skip, no cursor), so it is left out.
+    depths = sorted({2, max(args.page // 100, 2), max(args.page // 10, 2), args.page})
+    results = {}
+    async with AsyncSessionLocal() as db:
+        for page in depths:
+            skip = args.limit * (page - 1)
+            # Cursor pointing at the last row of page N-1, as a client paging forward would hold.
+            _, cursor = await get_transactions(USER_ID, skip - args.limit, args.limit, db)
+            results[page] = (
+                await timed(lambda: get_transactions(USER_ID, skip, args.limit, db), args.repeat),
+                await timed(lambda: get_transactions(USER_ID, 0, args.limit, db, cursor), args.repeat),
+            )
+    await async_engine.dispose()
+
+    print(f"{'page':>8} {'offset':>11} {'cursor':>11}")
+    for page, (offset_ms, cursor_ms) in results.items():
+        print(f"{page:>8} {offset_ms:8.2f} ms {cursor_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
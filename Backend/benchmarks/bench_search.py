@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_search.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("SEARCH_BACKEND", "index")
+
+from sqlalchemy import insert, select
+
+from app.db import AsyncSessionLocal, Base, async_engine, engine
+from app.jobs import job_registry
+from app.models import Transaction, User
+from app.services.search import rebuild_search_index, search_transactions
+from app.services.transactions import TRANSACTION_COLUMNS
+from harness import SyntheticData, measure
+
+USER_ID = 1
+QUERIES = [
+    ("common merchant", "tesco"),
+    ("common suffix", "purchase"),
+    ("two terms", "tesco purchase"),
+    ("prefix", "tes"),
+    ("one-letter prefix", "s"),
+    ("merchant + prefix", "uber pa"),
+    ("no match", "tesco netflix"),
+]
+
+
+def seed(data: SyntheticData, rows: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": USER_ID, "email": "search@example.com", "password": "-",
+                                     "firstname": "Bench", "lastname": "User", "goal": 0}])
+        for offset in range(0, rows, 50_000):
+            conn.execute(insert(Transaction), data.transactions(USER_ID, min(50_000, rows - offset)))
+
+
+async def like_page(q: str, limit: int):
+    # What a naive implementation would do: substring match over the user's rows, newest first.
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(
+            select(*TRANSACTION_COLUMNS)
+            .where(Transaction.user_id == USER_ID, Transaction.description.ilike(f"%{q}%"))
+            .order_by(Transaction.date.desc(), Transaction.id.desc())
+            .limit(limit)
+        )).all()
+
+
+async def search_page(q: str, limit: int, cursor: str | None = None):
+    async with AsyncSessionLocal() as db:
+        return await search_transactions(USER_ID, q, limit, db, cursor)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Token-index search vs LIKE over one user's large history")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--deep-pages", type=int, default=10, help="pages followed via the cursor")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the indexed database of a previous run")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        seed(SyntheticData(42), args.rows)
+        print(f"seeded {args.rows} transactions in {time.perf_counter() - started:.1f}s")
+        job = job_registry.start("search_reindex", rebuild_search_index, batch_size=5000, throttle_ms=0)
+        await job.task
+        print(f"indexed {job.progress['rows']} rows in {(job.finished_at - job.created_at).total_seconds():.1f}s "
+              f"({job.progress['rows_per_sec']} rows/s) [{job.status}]")
+
+    print(f"{'query':<36} {'index p50':>10} {'index p99':>10} {'LIKE p50':>10}")
+    for name, q in QUERIES:
+        rows, _ = await search_page(q, args.limit)
+        index = await measure(lambda i: search_page(q, args.limit), args.iterations)
+        like = await measure(lambda i: like_page(q, args.limit), max(args.iterations // 4, 1))
+        print(f"{f'{name} {q!r} ({len(rows)} rows)':<36} {index['p50_ms']:8.2f}ms {index['p99_ms']:8.2f}ms "
+              f"{like['p50_ms']:8.2f}ms")
+
+    cursor, slowest = None, 0.0
+    for _ in range(args.deep_pages):
+        started = time.perf_counter()
+        _, cursor = await search_page("tesco purchase", args.limit, cursor)
+        slowest = max(slowest, time.perf_counter() - started)
+        if cursor is None:
+            break
+    label = "cursor pages of 'tesco purchase'"
+    print(f"{label:<36} slowest of {args.deep_pages}: {slowest * 1000:.2f}ms")
+    # aiosqlite connections run on non-daemon threads; close them so the interpreter can exit.
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+DB_PATH = Path(tempfile.gettempdir()) / "bench_serialization.sqlite"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import insert, select
+
+from app.db import AsyncSessionLocal, Base, async_engine, engine
+from app.models import Transaction
+from app.schemas import TransactionResponse, transaction_rows_adapter
+from app.services.transactions import get_transactions
+
+USER_ID = 1
+response_adapter = TypeAdapter(list[TransactionResponse])
+
+
+def seed(rows: int):
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    start = datetime(2020, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(insert(Transaction), [
+            {
+                "user_id": USER_ID,
+                "amount": Decimal(i % 500) + Decimal("0.99"),
+                "type": "expense" if i % 3 else "income",
+                "description": f"Merchant {i % 250}",
+                "date": start + timedelta(minutes=i),
+                "category": "Groceries",
+            }
+            for i in range(rows)
+        ])
+
+
+async def orm_page(db, limit: int) -> bytes:
+    # The previous path: ORM entities, a model per row, then FastAPI's response_model validation and encoder.
+    transactions = (await db.execute(
+        select(Transaction).where(Transaction.user_id == USER_ID)
+        .order_by(Transaction.date.desc(), Transaction.id.desc()).limit(limit)
+    )).scalars().all()
+    models = [TransactionResponse.model_validate(t) for t in transactions]
+    validated = response_adapter.validate_python([model.model_dump() for model in models])
+    return json.dumps(jsonable_encoder(validated)).encode()
+
+
+async def lean_page(db, limit: int) -> bytes:
+    transactions, _ = await get_transactions(USER_ID, 0, limit, db)
+    return transaction_rows_adapter.dump_json(transactions)
+
+
+async def rows_per_sec(fn, limit: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # A fresh session per page, as in a request, so the ORM identity map does not carry over.
+        async with AsyncSessionLocal() as db:
+            started = time.perf_counter()
+            await fn(db, limit)
+            best = min(best, time.perf_counter() - started)
+    return limit / best
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Rows/sec for ORM+Pydantic vs column-tuple list serialization")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    seed(args.limit)
+    async with AsyncSessionLocal() as db:
+        old, new = json.loads(await orm_page(db, args.limit)), json.loads(await lean_page(db, args.limit))
+        assert old == new, "lean serialization changed the response body"
+
+    for name, fn in (("orm + response_model", orm_page), ("columns + TypeAdapter", lean_page)):
+        print(f"{name:<24} {await rows_per_sec(fn, args.limit, args.repeat):10.0f} rows/s")
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
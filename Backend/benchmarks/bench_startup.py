@@ -0,0 +1,52 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DB_PATH = Path(tempfile.gettempdir()) / "bench_startup.sqlite"
+
+IMPORT_SNIPPET = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+FIRST_PREDICTION_SNIPPET = """
+import time
+import app.main
+from app.model_registry import model_registry
+started = time.perf_counter()
+model_registry.get().predict(["netflix subscription"])
+first = time.perf_counter() - started
+started = time.perf_counter()
+model_registry.get().predict(["uber ride"])
+print(first, time.perf_counter() - started)
+"""
+
+
+def run(snippet: str) -> list[float]:
+    env = {**os.environ, "DATABASE_URL": os.environ.get("DATABASE_URL", f"sqlite:///{DB_PATH}")}
+    output = subprocess.run([sys.executable, "-c", snippet], cwd=BACKEND_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return [float(value) for value in output.split()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API import time and first-prediction latency")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports = [run(IMPORT_SNIPPET)[0] for _ in range(args.runs)]
+    predictions = [run(FIRST_PREDICTION_SNIPPET) for _ in range(args.runs)]
+    print(f"import app.main       median {statistics.median(imports) * 1000:8.1f} ms")
+    print(f"first prediction      median {statistics.median(p[0] for p in predictions) * 1000:8.1f} ms (lazy load)")
+    print(f"warm prediction       median {statistics.median(p[1] for p in predictions) * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
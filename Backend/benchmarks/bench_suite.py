@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+WORK_DIR = Path(tempfile.gettempdir()) / "bench_suite"
+WORK_DIR.mkdir(exist_ok=True)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{WORK_DIR / 'suite.sqlite'}")
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key-not-for-production-use")
+os.environ.setdefault("MODEL_PATH", str(WORK_DIR / "categorizer.pkl"))
+
+import httpx
+from sqlalchemy import insert
+
+from app.auth import create_access_token
+from app.categorizer import Categorizer
+from app.config import settings
+from app.db import AsyncSessionLocal, Base, SessionLocal, async_engine, engine
+from app.finance import aggregate_delta, apply_aggregate_delta, reconcile_user_aggregates
+from app.main import app
+from app.models import Transaction, User
+from harness import SyntheticData, compare, environment, measure, measure_sync, write_results
+
+V1 = settings.V1_PREFIX
+
+
+def reset_database():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+
+def train_model(data: SyntheticData, rows: int):
+    # A model trained on the seeded generator keeps prediction timings comparable between machines and runs.
+    categorizer = Categorizer()
+    categorizer.train(*data.labelled(rows))
+    categorizer.save(settings.MODEL_PATH)
+
+
+def seed_user(data: SyntheticData, user_id: int, history: int) -> dict:
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{"id": user_id, "email": f"seeded{user_id}@example.com", "password": "-",
+                                     "firstname": "Seeded", "lastname": "User", "goal": 0}])
+        for offset in range(0, history, 10_000):
+            conn.execute(insert(Transaction), data.transactions(user_id, min(10_000, history - offset)))
+    return {"Authorization": f"Bearer {create_access_token({'user_id': user_id})}"}
+
+
+async def bench_auth(client: httpx.AsyncClient, data: SyntheticData, args) -> dict:
+    users = [data.user(i) for i in range(args.users)]
+
+    async def register(i):
+        (await client.post(f"{V1}/users/register", json=users[i])).raise_for_status()
+
+    async def login(i):
+        user = users[i % len(users)]
+        (await client.post(f"{V1}/users/login", json={"email": user["email"],
+                                                       "password": user["password"]})).raise_for_status()
+
+    return {
+        "register": await measure(register, len(users), args.concurrency),
+        "login": await measure(login, args.iterations, args.concurrency),
+    }
+
+
+async def bench_transactions(client: httpx.AsyncClient, data: SyntheticData, args) -> dict:
+    headers = seed_user(data, 10_000, args.history)
+    created: list[int] = []
+    payloads = [data.transaction() for _ in range(args.iterations)]
+
+    async def create(i):
+        payload = {**payloads[i], "amount": str(payloads[i]["amount"])}
+        response = await client.post(f"{V1}/transactions/transaction", json=payload, headers=headers)
+        response.raise_for_status()
+
+    async def create_batch(i):
+        operations = [{"op": "create", "data": {**payload, "amount": str(payload["amount"])}}
+                      for payload in payloads[i:i + 10]]
+        response = await client.post(f"{V1}/transactions/batch", json={"operations": operations}, headers=headers)
+        response.raise_for_status()
+
+    async def list_page(i, limit):
+        # A distinct offset per call keeps the response cache out of the measurement.
+        response = await client.get(f"{V1}/transactions/transactions", params={"limit": limit, "skip": i},
+                                    headers=headers)
+        response.raise_for_status()
+        return response
+
+    etag = (await list_page(0, 10)).headers["etag"]
+
+    async def revalidate(i):
+        response = await client.get(f"{V1}/transactions/transactions", params={"limit": 10, "skip": 0},
+                                    headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 304, response.status_code
+
+    async def update(i):
+        response = await client.put(f"{V1}/transactions/transactions/{created[i]}",
+                                    json={"description": f"{payloads[i]['description']} (edited)"}, headers=headers)
+        response.raise_for_status()
+
+    async def delete(i):
+        response = await client.delete(f"{V1}/transactions/transactions/{created[i]}", headers=headers)
+        response.raise_for_status()
+
+    results = {
+        "list limit=10": await measure(lambda i: list_page(i, 10), args.iterations, args.concurrency),
+        "list limit=100": await measure(lambda i: list_page(i, 100), args.iterations, args.concurrency),
+        "list 304": await measure(revalidate, args.iterations, args.concurrency),
+        "create": await measure(create, args.iterations, args.concurrency),
+        "batch create x10": await measure(create_batch, args.iterations, args.concurrency),
+    }
+    newest = await list_page(0, args.iterations * 11)
+    created.extend(row["id"] for row in newest.json()[:args.iterations])
+    results["update"] = await measure(update, len(created), args.concurrency)
+    results["delete"] = await measure(delete, len(created), args.concurrency)
+    return results
+
+
+async def bench_predictions(client: httpx.AsyncClient, data: SyntheticData, args) -> dict:
+    results = {}
+    for batch_size in args.batch_sizes:
+        batches = [data.descriptions(batch_size) for _ in range(args.iterations)]
+
+        async def predict(i):
+            response = await client.post(f"{V1}/predictions/predict", json={"descriptions": batches[i]})
+            response.raise_for_status()
+
+        stats = await measure(predict, args.iterations, args.concurrency)
+        stats["descriptions_per_sec"] = round(stats["ops_per_sec"] * batch_size, 1)
+        results[f"batch={batch_size}"] = stats
+    return results
+
+
+async def bench_aggregates(data: SyntheticData, args) -> dict:
+    results = {}
+    for index, history in enumerate(args.history_sizes):
+        user_id = 20_000 + index
+        seed_user(data, user_id, history)
+
+        def recompute(i):
+            db = SessionLocal()
+            try:
+                # A full recompute from the user's history, as every write did before deltas.
+                reconcile_user_aggregates(db, user_id)
+            finally:
+                db.close()
+
+        async def delta(i):
+            async with AsyncSessionLocal() as db:
+                await apply_aggregate_delta(user_id, *aggregate_delta(new=(data.transaction()["amount"], "expense")),
+                                            db)
+                await db.commit()
+
+        results[f"recompute history={history}"] = measure_sync(recompute, args.iterations)
+        results[f"delta history={history}"] = await measure(delta, args.iterations)
+    return results
+
+
+SCENARIOS = ("auth", "transactions", "predictions", "aggregates")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput suite against SQLite and an in-process client")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--users", type=int, default=10, help="accounts registered by the auth scenario")
+    parser.add_argument("--history", type=int, default=10_000, help="rows behind the transaction scenario's user")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--history-sizes", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--train-rows", type=int, default=5_000)
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare p50 latencies against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown vs the baseline")
+    args = parser.parse_args()
+
+    data = SyntheticData(args.seed)
+    reset_database()
+    if "predictions" in args.scenarios:
+        train_model(data, args.train_rows)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for scenario in args.scenarios:
+            if scenario == "aggregates":
+                results[scenario] = await bench_aggregates(data, args)
+            else:
+                runner = {"auth": bench_auth, "transactions": bench_transactions, "predictions": bench_predictions}
+                results[scenario] = await runner[scenario](client, data, args)
+            for name, stats in results[scenario].items():
+                print(f"{scenario:<13} {name:<26} p50={stats['p50_ms']:8.2f} ms p99={stats['p99_ms']:8.2f} ms "
+                      f"{stats['ops_per_sec']:9.1f} ops/s")
+    # aiosqlite connections run on non-daemon threads; close them so the interpreter can exit.
+    await async_engine.dispose()
+
+    report = {
+        "environment": environment(seed=args.seed, iterations=args.iterations, concurrency=args.concurrency,
+                                   bcrypt_rounds=settings.BCRYPT_ROUNDS, database=settings.DATABASE_URL),
+        "results": results,
+    }
+    if args.output:
+        write_results(args.output, report)
+    if args.baseline:
+        regressions = compare(json.loads(Path(args.baseline).read_text()), report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
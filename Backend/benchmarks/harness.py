@@ -0,0 +1,125 @@
+"""Shared pieces for the benchmark scripts: seeded synthetic data, latency statistics and JSON results."""
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+
+MERCHANTS = {
+    "Groceries": ["Tesco", "Lidl", "Aldi", "Spar", "Auchan", "Penny Market"],
+    "Transport": ["Uber", "Bolt", "MAV", "BKK", "Shell", "OMV"],
+    "Dining": ["Starbucks", "McDonalds", "KFC", "Burger King", "Costa Coffee", "Wolt"],
+    "Subscriptions": ["Netflix", "Spotify", "HBO Max", "Disney Plus", "YouTube Premium", "iCloud"],
+    "Utilities": ["MVM", "Telekom", "Vodafone", "Fotav", "Dijnet", "Yettel"],
+    "Shopping": ["Amazon", "Zara", "H&M", "IKEA", "Decathlon", "eMAG"],
+}
+SUFFIXES = ["", " Purchase", " Payment", " Card", " Online", " Store"]
+
+
+class SyntheticData:
+    """Deterministic generators: the same seed always yields the same users, histories and descriptions."""
+
+    def __init__(self, seed: int = 42):
+        self.random = random.Random(seed)
+
+    def labelled_description(self) -> tuple[str, str]:
+        category = self.random.choice(list(MERCHANTS))
+        merchant = self.random.choice(MERCHANTS[category])
+        reference = f" #{self.random.randint(1000, 9999)}" if self.random.random() < 0.3 else ""
+        return f"{merchant}{self.random.choice(SUFFIXES)}{reference}", category
+
+    def descriptions(self, count: int) -> list[str]:
+        return [self.labelled_description()[0] for _ in range(count)]
+
+    def labelled(self, count: int) -> tuple[list[str], list[str]]:
+        pairs = [self.labelled_description() for _ in range(count)]
+        return [description for description, _ in pairs], [label for _, label in pairs]
+
+    def transaction(self) -> dict:
+        description, category = self.labelled_description()
+        income = self.random.random() < 0.1
+        amount = Decimal(self.random.randint(100, 500_000 if income else 50_000)) / 100
+        return {"amount": amount, "type": "income" if income else "expense", "description": description}
+
+    def transactions(self, user_id: int, count: int, start: datetime = datetime(2020, 1, 1)) -> list[dict]:
+        return [
+            {**self.transaction(), "user_id": user_id, "date": start + timedelta(minutes=37 * i)}
+            for i in range(count)
+        ]
+
+    def user(self, index: int) -> dict:
+        return {"email": f"user{index}@example.com", "password": f"benchmark-password-{index}",
+                "firstname": "Bench", "lastname": f"User{index}"}
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict:
+    if not latencies:
+        return {"count": 0}
+    ms = sorted(latency * 1000 for latency in latencies)
+    cuts = statistics.quantiles(ms, n=100, method="inclusive") if len(ms) > 1 else ms * 99
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "p50_ms": round(cuts[49], 3),
+        "p90_ms": round(cuts[89], 3),
+        "p99_ms": round(cuts[98], 3),
+        "max_ms": round(ms[-1], 3),
+        "ops_per_sec": round(len(ms) / elapsed, 1) if elapsed else None,
+    }
+
+
+async def measure(fn, iterations: int, concurrency: int = 1) -> dict:
+    """Await fn(i) for i in range(iterations) across `concurrency` workers and summarize the latencies."""
+    latencies: list[float] = []
+    counter = iter(range(iterations))
+
+    async def worker():
+        for i in counter:
+            started = time.perf_counter()
+            await fn(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def measure_sync(fn, iterations: int) -> dict:
+    latencies: list[float] = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        call_started = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def environment(**extra) -> dict:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        **extra,
+    }
+
+
+def write_results(path: str | Path, results: dict):
+    Path(path).write_text(json.dumps(results, indent=2, sort_keys=True))
+
+
+def compare(baseline: dict, current: dict, threshold: float, metric: str = "p50_ms") -> list[str]:
+    """Names of the benchmarks whose `metric` got worse than the baseline by more than `threshold` (a ratio)."""
+    regressions = []
+    for scenario, cases in current.get("results", {}).items():
+        for name, stats in cases.items():
+            before = baseline.get("results", {}).get(scenario, {}).get(name, {}).get(metric)
+            after = stats.get(metric)
+            if before and after and after > before * (1 + threshold):
+                regressions.append(f"{scenario}/{name}: {metric} {before} -> {after}")
+    return regressions
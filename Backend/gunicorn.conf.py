@@ -0,0 +1,36 @@
+# Production process model, used by `run_uvicorn.py` when ENVIRONMENT=production:
+#   kill -HUP <master pid>   start fresh workers and retire the old ones once their in-flight requests finish
+#   kill -USR2 <master pid>  re-exec a new master (new code) next to the old one; then -QUIT the old master
+#
+# Each worker is a separate process with its own copy of the in-memory state:
+#   /metrics            counters and histograms of the worker that answered the scrape
+#   /admin/jobs         jobs are listed and polled only on the worker that started them
+#   access revocation   logout and admin revocation reject access tokens at once only on the worker that
+#                       handled them; elsewhere they stay valid until expiry (TOKEN_EXPIRE_MINUTES), while
+#                       refresh tokens are revoked everywhere through the token store
+#   admin status        a demotion reaches the other workers within ADMIN_STATUS_TTL_SECONDS
+#   caches              prediction, token and response caches are per worker (responses are keyed by
+#                       users.data_version, so they are never stale)
+# TOKEN_STORE=memory is refused with more than one worker.
+from app.config import settings
+from app.server import check_workers, preload, reset_after_fork
+
+bind = f"{settings.WEB_HOST}:{settings.WEB_PORT}"
+workers = settings.WEB_WORKERS
+check_workers(workers)
+worker_class = "app.server.TunedUvicornWorker"
+preload_app = True
+backlog = settings.WEB_BACKLOG
+keepalive = settings.WEB_KEEPALIVE_SECONDS
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT_SECONDS
+certfile = settings.SSL_CERT_PATH
+keyfile = settings.SSL_KEY_PATH
+
+
+def when_ready(server):
+    # Runs in the master after the preloaded app is imported and before the first worker is forked.
+    preload()
+
+
+def post_fork(server, worker):
+    reset_after_fork()
@@ -0,0 +1,57 @@
+import argparse
+import importlib.util
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, insert, select
+
+from app.db import engine
+
+# Brings an existing database up to the current models: applies the numbered scripts in migrations/ that are
+# not yet recorded in schema_migrations, in order, each in its own transaction. Run it before starting a new
+# release (python migrate.py), or with --list to see what is pending. Databases built by create_all() need it too:
+# the steps find their changes already present and are only recorded.
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+schema_migrations = Table(
+    "schema_migrations", MetaData(),
+    Column("version", String(64), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def available() -> list[Path]:
+    return sorted(path for path in MIGRATIONS_DIR.glob("[0-9]*.py"))
+
+
+def load(path: Path):
+    spec = importlib.util.spec_from_file_location(f"migrations.{path.stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+parser.add_argument("--list", action="store_true", help="show applied and pending migrations, change nothing")
+args = parser.parse_args()
+
+schema_migrations.create(engine, checkfirst=True)
+with engine.connect() as conn:
+    applied = set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+pending = [path for path in available() if path.stem not in applied]
+if args.list:
+    for path in available():
+        print(f"{'applied' if path.stem in applied else 'pending'}  {path.stem}")
+    raise SystemExit(0)
+
+print(f"Migrating {engine.url.render_as_string(hide_password=True)}: {len(pending)} pending")
+for path in pending:
+    migration = load(path)
+    with engine.begin() as conn:
+        migration.upgrade(conn)
+        conn.execute(insert(schema_migrations).values(version=path.stem, applied_at=datetime.now(timezone.utc)))
+    print(f"  applied {path.stem}")
+    if getattr(migration, "AFTERWARDS", None):
+        print(f"    then: {migration.AFTERWARDS}")
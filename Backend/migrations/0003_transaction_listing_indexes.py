@@ -0,0 +1,9 @@
+from app.models import Transaction
+from migrations import create_index
+
+# user-003: keyset pagination walks (user_id, date, id); the amount filters seek on (user_id, amount).
+
+
+def upgrade(conn):
+    create_index(conn, Transaction, "ix_transactions_user_date_id")
+    create_index(conn, Transaction, "ix_transactions_user_amount")
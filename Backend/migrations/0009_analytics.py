@@ -0,0 +1,12 @@
+from app.models import MonthlyRollup, Transaction
+from migrations import create_index, create_table
+
+# user-009: the monthly_rollups table behind ANALYTICS_ROLLUPS, and the (user_id, type, date) index the
+# monthly series seeks per type. An existing database starts with empty rollups.
+
+AFTERWARDS = "before enabling ANALYTICS_ROLLUPS, backfill them with POST /admin/analytics/rollups/rebuild"
+
+
+def upgrade(conn):
+    create_table(conn, MonthlyRollup)
+    create_index(conn, Transaction, "ix_transactions_user_type_date")
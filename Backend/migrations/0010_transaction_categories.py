@@ -0,0 +1,12 @@
+from app.models import Transaction
+from migrations import add_column, create_index
+
+# user-010: stored categories and the model version that produced them. Existing rows start uncategorized.
+
+AFTERWARDS = "fill in categories with POST /admin/jobs/categories/backfill"
+
+
+def upgrade(conn):
+    add_column(conn, Transaction, "category")
+    add_column(conn, Transaction, "category_model_version")
+    create_index(conn, Transaction, "ix_transactions_user_category")
@@ -0,0 +1,41 @@
+import hashlib
+
+from sqlalchemy import bindparam, text
+
+from migrations import create_index_sql, drop_column, drop_index, has_column, has_unique
+
+# user-013: refresh_tokens.token (the raw cookie value) becomes token_hash, its SHA-256 hex digest. Existing
+# rows are hashed in place, so sessions survive the upgrade; the expiry index serves the purge job.
+
+BATCH_SIZE = 1000
+
+
+def upgrade(conn):
+    if has_column(conn, "refresh_tokens", "token"):
+        if not has_column(conn, "refresh_tokens", "token_hash"):
+            conn.execute(text("ALTER TABLE refresh_tokens ADD COLUMN token_hash VARCHAR(64)"))
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, token FROM refresh_tokens WHERE id > :last_id AND token_hash IS NULL "
+                     "ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE},
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                text("UPDATE refresh_tokens SET token_hash = :token_hash WHERE id = :row_id")
+                .bindparams(bindparam("token_hash"), bindparam("row_id")),
+                [{"row_id": row.id, "token_hash": hashlib.sha256(row.token.encode()).hexdigest()} for row in rows],
+            )
+            last_id = rows[-1].id
+        # The old column carried a unique index; SQLite cannot drop an indexed column.
+        drop_index(conn, "refresh_tokens", "ix_refresh_tokens_token")
+        drop_column(conn, "refresh_tokens", "token")
+        if conn.dialect.name == "mysql":
+            conn.execute(text("ALTER TABLE refresh_tokens MODIFY token_hash VARCHAR(64) NOT NULL"))
+        if not has_unique(conn, "refresh_tokens", ["token_hash"]):
+            create_index_sql(conn, "refresh_tokens", "uq_refresh_tokens_token_hash",
+                             "CREATE UNIQUE INDEX uq_refresh_tokens_token_hash ON refresh_tokens (token_hash)")
+    create_index_sql(conn, "refresh_tokens", "ix_refresh_tokens_expires_at",
+                     "CREATE INDEX ix_refresh_tokens_expires_at ON refresh_tokens (expires_at)")
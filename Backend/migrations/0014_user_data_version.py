@@ -0,0 +1,8 @@
+from app.models import User
+from migrations import add_column
+
+# user-014: the per-user counter behind ETags and the response cache; every write to a user's data bumps it.
+
+
+def upgrade(conn):
+    add_column(conn, User, "data_version")
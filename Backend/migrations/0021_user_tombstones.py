@@ -0,0 +1,11 @@
+from app.models import RefreshToken, User
+from migrations import add_column, create_index, drop_index
+
+# user-021: deleted users are tombstoned until their purge job finishes, and the refresh_tokens user_id index
+# becomes (user_id, expires_at) for per-user revocation and the admin session listing.
+
+
+def upgrade(conn):
+    add_column(conn, User, "is_deleted")
+    create_index(conn, RefreshToken, "ix_refresh_tokens_user_expires")
+    drop_index(conn, "refresh_tokens", "ix_refresh_tokens_user_id")
@@ -0,0 +1,15 @@
+from app.models import Transaction, TransactionSearchTerm, TransactionSearchToken
+from migrations import create_index, create_table
+
+# user-024: search backends. MySQL gets a FULLTEXT index on transactions.description; the token index tables
+# are created everywhere (SEARCH_BACKEND=index can be forced on MySQL too) and start empty.
+
+AFTERWARDS = "with the token index backend, fill it with POST /admin/jobs/search/reindex"
+
+
+def upgrade(conn):
+    create_table(conn, TransactionSearchToken)
+    create_table(conn, TransactionSearchTerm)
+    if conn.dialect.name == "mysql":
+        # InnoDB builds a FULLTEXT index in place but without concurrent DML: writes wait until it is done.
+        create_index(conn, Transaction, "ix_transactions_description_fulltext")
@@ -0,0 +1,15 @@
+from app.models import IdempotencyKey, Transaction
+from migrations import add_column, create_index, create_table
+
+# user-025: duplicate detection. transactions get a nullable fingerprint and duplicate_of, plus the (user_id,
+# fingerprint) index the create/edit/import checks seek; idempotency_keys stores replayable responses. Existing
+# rows start without a fingerprint, so they are not matched until the scan job has filled it in.
+
+AFTERWARDS = "fill in fingerprints for existing rows with POST /admin/jobs/duplicates/scan"
+
+
+def upgrade(conn):
+    add_column(conn, Transaction, "fingerprint")
+    add_column(conn, Transaction, "duplicate_of")
+    create_index(conn, Transaction, "ix_transactions_user_fingerprint")
+    create_table(conn, IdempotencyKey)
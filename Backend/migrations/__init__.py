@@ -0,0 +1,73 @@
+from sqlalchemy import inspect, text
+
+# Helpers for the numbered migrations in this package (applied by migrate.py). Every step checks the live schema
+# first, so a migration is a no-op on a database that create_all() built from the current models, and a run
+# interrupted halfway (MySQL commits each DDL statement on its own) can simply be repeated.
+
+
+def has_table(conn, table: str) -> bool:
+    return inspect(conn).has_table(table)
+
+
+def has_column(conn, table: str, column: str) -> bool:
+    return column in {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def has_index(conn, table: str, name: str) -> bool:
+    inspector = inspect(conn)
+    names = {index["name"] for index in inspector.get_indexes(table)}
+    names |= {constraint["name"] for constraint in inspector.get_unique_constraints(table)}
+    return name in names
+
+
+def has_unique(conn, table: str, columns: list[str]) -> bool:
+    # Whatever its name: create_all() leaves column-level unique=True unnamed (SQLite) or named after the column.
+    inspector = inspect(conn)
+    uniques = [index["column_names"] for index in inspector.get_indexes(table) if index["unique"]]
+    uniques += [constraint["column_names"] for constraint in inspector.get_unique_constraints(table)]
+    return columns in uniques
+
+
+def create_table(conn, model):
+    if not has_table(conn, model.__tablename__):
+        model.__table__.create(conn)
+
+
+def add_column(conn, model, name: str):
+    # Type, nullability and server default come from the current model definition.
+    table = model.__table__
+    column = table.c[name]
+    if has_column(conn, table.name, name):
+        return
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {name} {column.type.compile(conn.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    conn.execute(text(ddl))
+
+
+def drop_column(conn, table: str, name: str):
+    if has_column(conn, table, name):
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {name}"))
+
+
+def create_index(conn, model, name: str):
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    if not has_index(conn, model.__tablename__, name):
+        index.create(conn)
+
+
+def create_index_sql(conn, table: str, name: str, ddl: str):
+    # For indexes the model does not declare by name (e.g. column-level unique=True).
+    if not has_index(conn, table, name):
+        conn.execute(text(ddl))
+
+
+def drop_index(conn, table: str, name: str):
+    if not has_index(conn, table, name):
+        return
+    if conn.dialect.name == "mysql":
+        conn.execute(text(f"DROP INDEX {name} ON {table}"))
+    else:
+        conn.execute(text(f"DROP INDEX {name}"))
@@ -0,0 +1,18 @@
+import sys
+from app.db import SessionLocal
+from app.finance import reconcile_user_aggregates
+
+# Recompute user totals from the transactions table and repair any drift.
+# Meant to be scheduled (e.g. nightly cron); pass --dry-run to only report.
+repair = "--dry-run" not in sys.argv
+
+db = SessionLocal()
+try:
+    report = reconcile_user_aggregates(db, repair=repair)
+finally:
+    db.close()
+
+print(f"Checked {report['checked']} users, {report['drifted']} drifted"
+      f"{' (repaired)' if repair and report['drifted'] else ''}.")
+for entry in report["users"]:
+    print(f"  user {entry['user_id']}: stored={entry['stored']} expected={entry['expected']}")
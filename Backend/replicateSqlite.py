@@ -0,0 +1,42 @@
+import argparse
+import sqlite3
+import time
+
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+# Local stand-in for primary/replica replication: with DATABASE_URL and READ_REPLICA_URL pointing at two
+# SQLite files, this copies the primary into the replica every --interval seconds through SQLite's online
+# backup API, so the API can be exercised against a replica that lags the primary, like a real one does.
+
+
+def sqlite_path(url: str | None, name: str) -> str:
+    if not url or make_url(url).get_backend_name() != "sqlite" or not make_url(url).database:
+        raise SystemExit(f"{name} must be a file-backed sqlite:/// URL")
+    return make_url(url).database
+
+
+def replicate(primary_path: str, replica_path: str):
+    primary = sqlite3.connect(primary_path)
+    replica = sqlite3.connect(replica_path)
+    try:
+        primary.backup(replica)
+    finally:
+        replica.close()
+        primary.close()
+
+
+parser = argparse.ArgumentParser(description="Copy the SQLite primary into the SQLite read replica")
+parser.add_argument("--interval", type=float, default=1.0, help="seconds between copies (the simulated lag)")
+parser.add_argument("--once", action="store_true", help="copy once and exit")
+args = parser.parse_args()
+
+primary_path = sqlite_path(settings.DATABASE_URL, "DATABASE_URL")
+replica_path = sqlite_path(settings.READ_REPLICA_URL, "READ_REPLICA_URL")
+print(f"Replicating {primary_path} -> {replica_path}" + ("" if args.once else f" every {args.interval}s"))
+while True:
+    replicate(primary_path, replica_path)
+    if args.once:
+        break
+    time.sleep(args.interval)
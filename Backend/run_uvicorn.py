@@ -1,27 +1,65 @@
+import importlib.util
 import os
-from dotenv import load_dotenv
 import subprocess
+import sys
+from pathlib import Path
 
-load_dotenv()
+from app.config import settings
+from app.server import check_workers
 
-cert_path = os.getenv("SSL_CERT_PATH")
-key_path = os.getenv("SSL_KEY_PATH")
+BACKEND_DIR = Path(__file__).resolve().parent
 
-if not cert_path or not key_path:
+if not settings.SSL_CERT_PATH or not settings.SSL_KEY_PATH:
     raise ValueError("SSL_CERT_PATH and SSL_KEY_PATH must be set in .env file")
 
-command = [
-    "uvicorn",
-    "app.main:app",
-    "--host", "0.0.0.0",
-    "--port", "8000",
-    "--ssl-certfile", cert_path,
-    "--ssl-keyfile", key_path,
-    "--reload"
-]
+
+def development_command() -> list[str]:
+    return [
+        "uvicorn",
+        "app.main:app",
+        "--host", settings.WEB_HOST,
+        "--port", str(settings.WEB_PORT),
+        "--ssl-certfile", settings.SSL_CERT_PATH,
+        "--ssl-keyfile", settings.SSL_KEY_PATH,
+        "--reload"
+    ]
+
+
+def production_command() -> list[str]:
+    check_workers(settings.WEB_WORKERS)
+    if os.name != "nt" and importlib.util.find_spec("gunicorn"):
+        return [sys.executable, "-m", "gunicorn", "app.main:app", "-c", str(BACKEND_DIR / "gunicorn.conf.py")]
+    # No gunicorn (e.g. Windows): uvicorn's own supervisor still gives N workers and SIGHUP restarts,
+    # but each worker imports the app and loads the model separately.
+    print("gunicorn not available, falling back to uvicorn workers without preloading")
+    return [
+        "uvicorn",
+        "app.main:app",
+        "--host", settings.WEB_HOST,
+        "--port", str(settings.WEB_PORT),
+        "--ssl-certfile", settings.SSL_CERT_PATH,
+        "--ssl-keyfile", settings.SSL_KEY_PATH,
+        "--workers", str(settings.WEB_WORKERS),
+        "--loop", "auto",
+        "--http", "auto",
+        "--backlog", str(settings.WEB_BACKLOG),
+        "--limit-concurrency", str(settings.WEB_LIMIT_CONCURRENCY),
+        "--timeout-keep-alive", str(settings.WEB_KEEPALIVE_SECONDS),
+        "--timeout-graceful-shutdown", str(settings.WEB_GRACEFUL_TIMEOUT_SECONDS),
+        "--no-access-log",
+    ]
+
+
+production = settings.ENVIRONMENT == "production"
+command = production_command() if production else development_command()
 
 print(f"Running command: {' '.join(command)}")
 
+if production and os.name != "nt":
+    # Replace this process so the server keeps our PID and receives HUP/USR2/TERM directly.
+    os.chdir(BACKEND_DIR)
+    os.execvp(command[0], command)
+
 try:
     subprocess.run(command)
 except KeyboardInterrupt:
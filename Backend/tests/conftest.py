@@ -0,0 +1,77 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The app reads its settings and builds its engines at import time, so the test environment is set up before
+# anything from app/ is imported.
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+TEST_DIR = Path(tempfile.mkdtemp(prefix="finance-tests-"))
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DIR / 'primary.sqlite'}"
+os.environ["SECRET_KEY"] = "test-secret-key-that-is-long-enough-for-hs256"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["TOKEN_PURGE_INTERVAL_SECONDS"] = "0"
+os.environ["METRICS_ENABLED"] = "false"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import admin_status_cache, revoked_users, token_cache
+from app.config import settings
+from app.db import Base, SessionLocal, async_engine, engine, recent_writers
+from app.http_cache import response_cache
+from app.main import app
+from app.models import User
+
+V1 = settings.V1_PREFIX
+
+
+@pytest.fixture
+def client():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    for cache in (token_cache, admin_status_cache, revoked_users, response_cache, recent_writers):
+        cache.clear()
+    with TestClient(app) as test_client:
+        yield test_client
+        # Pooled aiosqlite connections belong to this client's event loop; close them on it.
+        test_client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def run(client):
+    """Await a coroutine function on the client's event loop, e.g. run(service_fn, arg)."""
+    return lambda fn, *args, **kwargs: client.portal.call(lambda: fn(*args, **kwargs))
+
+
+def register(client: TestClient, email: str, admin: bool = False) -> dict:
+    response = client.post(f"{V1}/users/register", json={"email": email, "password": "secret-password",
+                                                          "firstname": "Test", "lastname": "User"})
+    assert response.status_code == 200, response.text
+    if admin:
+        db = SessionLocal()
+        db.query(User).filter(User.email == email).update({User.is_admin: True})
+        db.commit()
+        db.close()
+        # Log in again so the access token carries the admin claim.
+        response = client.post(f"{V1}/users/login", json={"email": email, "password": "secret-password"})
+        assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def user_id(email: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(User.id).filter(User.email == email).scalar()
+    finally:
+        db.close()
+
+
+def totals(email: str) -> tuple:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.email == email).one()
+        return user.total_income, user.total_expense, user.balance
+    finally:
+        db.close()
@@ -0,0 +1,53 @@
+import asyncio
+
+from app.db import SessionLocal
+from app.jobs import job_registry
+from app.models import Transaction, User
+from conftest import V1, register, user_id
+
+
+def create(client, headers, description):
+    response = client.post(f"{V1}/transactions/transaction", headers=headers,
+                           json={"amount": 5, "type": "expense", "description": description})
+    assert response.status_code == 200, response.text
+
+
+def stored(uid: int) -> tuple:
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == uid).one_or_none()
+        count = db.query(Transaction).filter(Transaction.user_id == uid).count()
+        return (user.is_deleted if user else None), count
+    finally:
+        db.close()
+
+
+def test_deleted_user_is_tombstoned_until_the_purge_finishes(client, run):
+    admin = register(client, "admin@example.com", admin=True)
+    alice = register(client, "alice@example.com")
+    for description in ("Coffee", "Lunch", "Taxi"):
+        create(client, alice, description)
+    alice_id = user_id("alice@example.com")
+
+    # One row per batch with a long pause: the job is parked after its first batch.
+    response = client.delete(f"{V1}/admin/users/{alice_id}?batch_size=1&throttle_ms=60000", headers=admin)
+    assert response.status_code == 202, response.text
+    job_id = response.json()["id"]
+    client.portal.call(asyncio.sleep, 0.2)
+
+    assert stored(alice_id) == (True, 2)
+    login = client.post(f"{V1}/users/login", json={"email": "alice@example.com", "password": "secret-password"})
+    assert login.status_code == 401
+    listed = client.get(f"{V1}/admin/users", headers=admin).json()
+    assert alice_id not in [row["user_id"] for row in listed]
+    assert client.delete(f"{V1}/admin/users/{alice_id}", headers=admin).status_code == 404
+
+    # A restart loses the job; resuming it finishes the purge and only then drops the row.
+    client.portal.call(job_registry.cancel, job_id)
+    response = client.post(f"{V1}/admin/jobs/users/{alice_id}/purge?throttle_ms=0", headers=admin)
+    assert response.status_code == 200, response.text
+    run(asyncio.wait_for, job_registry.get(response.json()["id"]).task, 5)
+    assert stored(alice_id) == (None, 0)
+
+    register(client, "alice@example.com")
+    assert stored(user_id("alice@example.com"))[1] == 0
@@ -0,0 +1,35 @@
+import numpy as np
+
+from app.categorizer import Categorizer, CompactCategorizer
+from app.model_registry import ModelRegistry
+
+DESCRIPTIONS = ["grocery milk", "grocery bread store", "fuel station", "petrol fuel", "cinema ticket", "movie ticket"]
+LABELS = ["Groceries", "Groceries", "Transport", "Transport", "Entertainment", "Entertainment"]
+
+
+def test_compact_model_handles_descriptions_without_known_terms(tmp_path):
+    model = Categorizer()
+    model.train(DESCRIPTIONS, LABELS)
+    path = tmp_path / "compact.npz"
+    model.export_compact(path)
+    compact = CompactCategorizer()
+    compact.load(path)
+
+    # Unknown-only descriptions first, in the middle and last (the last used to index past the end).
+    batch = ["zzz", "grocery milk", "qqq", "fuel station", "xyzzy"]
+    assert compact.predict(batch).tolist() == model.predict(batch).tolist()
+    assert np.allclose(compact.predict_proba(batch), model.model.predict_proba(model.vectorizer.transform(batch)))
+    assert compact.predict(["nothing known"]).tolist() == model.predict(["nothing known"]).tolist()
+
+
+def test_registry_keeps_the_loaded_model_when_the_file_disappears(tmp_path):
+    model = Categorizer()
+    model.train(DESCRIPTIONS, LABELS)
+    path = tmp_path / "categorizer.pkl"
+    model.save(str(path))
+    registry = ModelRegistry(str(path), reload_interval=1e-9)
+    loaded = registry.get()
+
+    path.unlink()
+    assert registry.get() is loaded
+    assert registry.reload() is loaded
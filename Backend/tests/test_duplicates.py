@@ -0,0 +1,97 @@
+import asyncio
+
+from app.db import SessionLocal
+from app.jobs import job_registry
+from app.models import Transaction
+from conftest import V1, register
+from test_imports import import_csv
+
+
+def create(client, headers, amount, description="Coffee", **params):
+    response = client.post(f"{V1}/transactions/transaction", headers=headers, params=params,
+                           json={"amount": amount, "type": "expense", "description": description})
+    assert response.status_code == 200, response.text
+    return response.json()["transaction_id"]
+
+
+def duplicate_of() -> dict[int, int | None]:
+    db = SessionLocal()
+    try:
+        return dict(db.query(Transaction.id, Transaction.duplicate_of).order_by(Transaction.id).all())
+    finally:
+        db.close()
+
+
+def test_edits_are_fingerprinted_like_creates(client):
+    headers = register(client, "a@example.com")
+    original = create(client, headers, 5)
+    other = create(client, headers, 5, "Tea")
+    assert duplicate_of() == {original: None, other: None}
+
+    response = client.put(f"{V1}/transactions/transactions/{other}", headers=headers, json={"description": "Coffee"})
+    assert response.status_code == 200, response.text
+    assert duplicate_of() == {original: None, other: original}
+
+    response = client.put(f"{V1}/transactions/transactions/{other}", headers=headers, json={"amount": 6})
+    assert response.status_code == 200, response.text
+    assert duplicate_of() == {original: None, other: None}
+
+
+def test_deleting_the_original_promotes_the_earliest_copy(client):
+    headers = register(client, "a@example.com")
+    original, first, second = (create(client, headers, 5) for _ in range(3))
+    assert duplicate_of() == {original: None, first: original, second: original}
+
+    response = client.delete(f"{V1}/transactions/transactions/{original}", headers=headers)
+    assert response.status_code == 204, response.text
+    assert duplicate_of() == {first: None, second: first}
+
+
+def test_idempotency_key_covers_the_duplicate_policy(client):
+    headers = {**register(client, "a@example.com"), "Idempotency-Key": "k1"}
+    create(client, headers, 5, on_duplicate="flag")
+
+    # Same body and key, but a retry that asks for rejection must not be answered with the flagged create.
+    response = client.post(f"{V1}/transactions/transaction", headers=headers, params={"on_duplicate": "reject"},
+                           json={"amount": 5, "type": "expense", "description": "Coffee"})
+    assert response.status_code == 422
+    assert len(duplicate_of()) == 1
+
+
+def test_reimporting_a_statement_matches_row_for_row(client):
+    headers = register(client, "a@example.com")
+    body = (b"date,amount,description\n"
+            b"2024-01-01,-3,Coffee\n"
+            b"2024-01-01,-3,Coffee\n"
+            b"2024-01-02,-40,Groceries\n")
+
+    first = import_csv(client, headers, body, on_duplicate="reject")
+    assert first["imported"] == 3 and first["duplicates"] == 0
+
+    again = import_csv(client, headers, body, on_duplicate="reject")
+    assert again["imported"] == 0 and again["duplicates"] == 3
+
+    # A later statement with a third coffee that day adds exactly that one.
+    third = import_csv(client, headers, body + b"2024-01-01,-3,Coffee\n", on_duplicate="reject")
+    assert third["imported"] == 1 and third["duplicates"] == 3
+    assert len(duplicate_of()) == 4
+
+
+def test_flagging_scan_invalidates_cached_listings(client, run):
+    admin = register(client, "admin@example.com", admin=True)
+    headers = register(client, "a@example.com")
+    original, copy = (create(client, headers, 5, on_duplicate="allow") for _ in range(2))
+    listing = client.get(f"{V1}/transactions/transactions", headers=headers)
+    assert listing.status_code == 200 and "etag" in listing.headers
+
+    response = client.post(f"{V1}/admin/jobs/duplicates/scan?flag=true", headers=admin)
+    assert response.status_code == 200, response.text
+    job = job_registry.get(response.json()["id"])
+    run(asyncio.wait_for, job.task, 5)
+    assert job.status == "completed", job.error
+    assert job.progress["flagged"] == 1
+
+    response = client.get(f"{V1}/transactions/transactions",
+                          headers={**headers, "If-None-Match": listing.headers["etag"]})
+    assert response.status_code == 200
+    assert {row["id"]: row["duplicate_of"] for row in response.json()} == {original: None, copy: original}
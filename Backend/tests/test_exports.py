@@ -0,0 +1,22 @@
+import io
+
+import pytest
+
+from app.services.exports import EXPORT_FIELDS
+from conftest import V1, register
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_parquet_export_carries_every_export_field(client):
+    headers = register(client, "a@example.com")
+    for _ in range(2):
+        response = client.post(f"{V1}/transactions/transaction", headers=headers, params={"on_duplicate": "flag"},
+                               json={"amount": 5, "type": "expense", "description": "Coffee"})
+        assert response.status_code == 200, response.text
+
+    response = client.get(f"{V1}/transactions/export?format=parquet", headers=headers)
+    assert response.status_code == 200, response.text
+    table = pq.read_table(io.BytesIO(response.content))
+    assert table.column_names == EXPORT_FIELDS
+    assert table.column("duplicate_of").to_pylist() == [None, table.column("id")[0].as_py()]
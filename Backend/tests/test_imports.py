@@ -0,0 +1,56 @@
+from app.config import settings
+from app.db import AsyncSessionLocal, SessionLocal
+from app.models import Transaction
+from app.schemas import DuplicatePolicy
+from app.services.imports import TransactionImporter
+from conftest import V1, register, user_id
+
+
+def import_csv(client, headers, body: bytes, **params):
+    response = client.post(f"{V1}/transactions/import", content=body, params=params,
+                           headers={**headers, "content-type": "text/csv"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def descriptions() -> list[str]:
+    db = SessionLocal()
+    try:
+        return [row.description for row in db.query(Transaction.description).order_by(Transaction.id)]
+    finally:
+        db.close()
+
+
+def test_quoted_fields_may_span_lines(client):
+    headers = register(client, "a@example.com")
+    body = ('date,amount,description\r\n'
+            '2024-01-01,-5,"Rent\r\nflat 2, ""B"""\r\n'
+            '2024-01-02,3,Refund bakery\n').encode()
+
+    report = import_csv(client, headers, body)
+
+    assert report["imported"] == 2 and report["failed"] == 0
+    assert descriptions() == ['Rent\r\nflat 2, "B"', "Refund bakery"]
+
+
+def test_duplicate_counts_stay_near_the_current_batch(client, run, monkeypatch):
+    register(client, "a@example.com")
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 4)
+    monkeypatch.setattr(settings, "DUPLICATE_IMPORT_WINDOWS", 1)
+    # Two identical coffees a day for a month, in date order.
+    rows = [{"amount": "3", "type": "expense", "description": "Coffee", "date": f"2024-01-{day:02d}"}
+            for day in range(1, 31) for _ in range(2)]
+
+    async def import_statement():
+        async with AsyncSessionLocal() as db:
+            importer = TransactionImporter(user_id("a@example.com"), db, policy=DuplicatePolicy.reject)
+            for row_number, row in enumerate(rows, start=2):
+                await importer.add(row_number, row)
+                assert len(importer.written) + len(importer.matched) <= 2 * 4
+            await importer.flush()
+            return importer.report()
+
+    first = run(import_statement)
+    assert first["imported"] == 60 and first["duplicates"] == 0
+    again = run(import_statement)
+    assert again["imported"] == 0 and again["duplicates"] == 60
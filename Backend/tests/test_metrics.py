@@ -0,0 +1,34 @@
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.config import settings
+from app.db import SessionLocal
+from app.dependencies import get_metrics_reader
+from conftest import register
+
+
+def bearer(headers_or_token) -> HTTPAuthorizationCredentials:
+    token = headers_or_token if isinstance(headers_or_token, str) else headers_or_token["Authorization"].split()[1]
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def test_metrics_need_the_scrape_token_or_an_admin(client, monkeypatch):
+    admin = register(client, "admin@example.com", admin=True)
+    user = register(client, "user@example.com")
+    db = SessionLocal()
+    try:
+        # Without a token configured only admins get in.
+        get_metrics_reader(bearer(admin), db)
+        with pytest.raises(HTTPException) as denied:
+            get_metrics_reader(bearer(user), db)
+        assert denied.value.status_code == 403
+
+        monkeypatch.setattr(settings, "METRICS_TOKEN", "scrape-token")
+        get_metrics_reader(bearer("scrape-token"), db)
+        get_metrics_reader(bearer(admin), db)
+        with pytest.raises(HTTPException) as denied:
+            get_metrics_reader(bearer("wrong-token"), db)
+        assert denied.value.status_code == 401
+    finally:
+        db.close()
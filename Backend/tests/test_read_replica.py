@@ -0,0 +1,73 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app import db as app_db
+from app.db import READ_PRIMARY_COOKIE, recent_writers
+from conftest import TEST_DIR, V1, register
+
+PRIMARY = TEST_DIR / "primary.sqlite"
+REPLICA = TEST_DIR / "replica.sqlite"
+
+
+@pytest.fixture
+def replica(client, monkeypatch):
+    # A second SQLite file as the replica; replicate() copies the primary into it, anything later is "lag".
+    def replicate():
+        with sqlite3.connect(PRIMARY) as source, sqlite3.connect(REPLICA) as target:
+            source.backup(target)
+
+    replicate()
+    engine = create_async_engine(f"sqlite+aiosqlite:///{REPLICA}")
+    monkeypatch.setattr(app_db, "async_read_engine", engine)
+    monkeypatch.setattr(app_db, "AsyncReadSessionLocal",
+                        async_sessionmaker(engine, class_=AsyncSession, autoflush=False, expire_on_commit=False))
+    yield replicate
+    client.portal.call(engine.dispose)
+
+
+def create(client, headers, description):
+    response = client.post(f"{V1}/transactions/transaction", headers=headers,
+                           json={"amount": 5, "type": "expense", "description": description})
+    assert response.status_code == 200, response.text
+    return response
+
+
+def listed(client, headers, cookie: str | None = None) -> list[str]:
+    # Each read as if from another worker: no in-process memory of the write, only what the client sends.
+    recent_writers.clear()
+    client.cookies.clear()
+    if cookie is not None:
+        headers = {**headers, "Cookie": f"{READ_PRIMARY_COOKIE}={cookie}"}
+    response = client.get(f"{V1}/transactions/transactions", headers=headers)
+    assert response.status_code == 200, response.text
+    return sorted(row["description"] for row in response.json())
+
+
+def test_reads_follow_the_write_watermark_across_workers(client, replica):
+    headers = register(client, "reader@example.com")
+    create(client, headers, "Coffee")
+    replica()
+    response = create(client, headers, "Lunch")
+    watermark = response.cookies[READ_PRIMARY_COOKIE]
+    assert float(watermark) > time.time()
+
+    # Without the cookie the read goes to the lagging replica; with it, to the primary.
+    assert listed(client, headers) == ["Coffee"]
+    assert listed(client, headers, watermark) == ["Coffee", "Lunch"]
+    # An expired or garbled watermark falls back to the replica.
+    assert listed(client, headers, f"{time.time() - 1:.3f}") == ["Coffee"]
+    assert listed(client, headers, "garbage") == ["Coffee"]
+
+
+def test_recent_writer_sticks_to_the_primary_within_a_process(client, replica):
+    headers = register(client, "writer@example.com")
+    replica()
+    create(client, headers, "Taxi")
+    client.cookies.clear()
+
+    response = client.get(f"{V1}/transactions/transactions", headers=headers)
+    assert [row["description"] for row in response.json()] == ["Taxi"]
+    assert READ_PRIMARY_COOKIE not in response.cookies
@@ -0,0 +1,79 @@
+import asyncio
+from collections import Counter
+from datetime import datetime
+
+from app.db import SessionLocal
+from app.jobs import job_registry
+from app.models import TransactionSearchTerm, TransactionSearchToken
+from conftest import V1, register, user_id
+
+
+def create(client, headers, description):
+    response = client.post(f"{V1}/transactions/transaction", headers=headers,
+                           json={"amount": 5, "type": "expense", "description": description})
+    assert response.status_code == 200, response.text
+    return response.json()["transaction_id"]
+
+
+def index_state() -> tuple[set, dict]:
+    db = SessionLocal()
+    try:
+        postings = {(row.user_id, row.token, row.transaction_id) for row in db.query(TransactionSearchToken)}
+        terms = {(row.user_id, row.token): row.doc_count for row in db.query(TransactionSearchTerm)}
+        return postings, terms
+    finally:
+        db.close()
+
+
+def test_reindex_replaces_postings_and_recounts_terms(client, run):
+    admin = register(client, "admin@example.com", admin=True)
+    headers = register(client, "search@example.com")
+    owner = user_id("search@example.com")
+    for description in ("Tesco groceries", "Shell fuel", "Tesco petrol"):
+        create(client, headers, description)
+    expected = index_state()
+
+    # Damage the index: a lost posting, a posting of a transaction that does not exist and drifted counts.
+    db = SessionLocal()
+    db.query(TransactionSearchToken).filter(TransactionSearchToken.token == "shell").delete()
+    db.add(TransactionSearchToken(user_id=owner, token="ghost", date=datetime(2024, 1, 1), transaction_id=999))
+    db.query(TransactionSearchTerm).filter(TransactionSearchTerm.token == "tesco").update({"doc_count": 7})
+    db.commit()
+    db.close()
+
+    # Batches of one transaction, so every id range and the trailing stale range are exercised.
+    response = client.post(f"{V1}/admin/jobs/search/reindex?batch_size=1", headers=admin)
+    assert response.status_code == 200, response.text
+    job = job_registry.get(response.json()["id"])
+    run(asyncio.wait_for, job.task, 5)
+    assert job.status == "completed", job.error
+
+    postings, terms = index_state()
+    assert postings == expected[0]
+    assert terms == Counter((user, token) for user, token, _ in postings)
+    found = client.get(f"{V1}/transactions/search?q=shell", headers=headers).json()
+    assert [row["description"] for row in found] == ["Shell fuel"]
+
+
+def test_reindex_invalidates_cached_searches(client, run):
+    admin = register(client, "admin@example.com", admin=True)
+    headers = register(client, "search@example.com")
+    create(client, headers, "Shell fuel")
+    db = SessionLocal()
+    db.query(TransactionSearchToken).delete()
+    db.query(TransactionSearchTerm).delete()
+    db.commit()
+    db.close()
+    before = client.get(f"{V1}/transactions/search?q=shell", headers=headers)
+    assert before.json() == []
+
+    response = client.post(f"{V1}/admin/jobs/search/reindex", headers=admin)
+    assert response.status_code == 200, response.text
+    job = job_registry.get(response.json()["id"])
+    run(asyncio.wait_for, job.task, 5)
+    assert job.status == "completed", job.error
+
+    after = client.get(f"{V1}/transactions/search?q=shell",
+                       headers={**headers, "If-None-Match": before.headers["etag"]})
+    assert after.status_code == 200
+    assert [row["description"] for row in after.json()] == ["Shell fuel"]
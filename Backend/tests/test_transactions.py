@@ -0,0 +1,119 @@
+from decimal import Decimal
+
+from app.db import SessionLocal
+from app.models import Transaction
+from app.routes import prediction_service
+from conftest import V1, register, totals
+
+
+def transaction_ids() -> list[int]:
+    db = SessionLocal()
+    try:
+        return [row.id for row in db.query(Transaction.id).order_by(Transaction.id)]
+    finally:
+        db.close()
+
+
+def create(client, headers, amount, type_="expense", description="Coffee"):
+    response = client.post(f"{V1}/transactions/transaction", headers=headers,
+                           json={"amount": amount, "type": type_, "description": description})
+    assert response.status_code == 200, response.text
+    return response.json()["transaction_id"]
+
+
+def test_batch_applies_every_operation(client):
+    headers = register(client, "a@example.com")
+    existing = create(client, headers, 10)
+    doomed = create(client, headers, 4)
+
+    response = client.post(f"{V1}/transactions/batch", headers=headers, json={"operations": [
+        {"op": "create", "data": {"amount": 100, "type": "income", "description": "Salary"}},
+        {"op": "update", "id": existing, "data": {"amount": 25}},
+        {"op": "delete", "id": doomed},
+    ]})
+
+    assert response.status_code == 200, response.text
+    results = response.json()["results"]
+    assert [result["op"] for result in results] == ["create", "update", "delete"]
+    assert transaction_ids() == [existing, results[0]["transaction_id"]]
+    assert totals("a@example.com") == (Decimal("100.00"), Decimal("25.00"), Decimal("75.00"))
+
+
+def test_batch_is_all_or_nothing(client):
+    headers = register(client, "a@example.com")
+    existing = create(client, headers, 10)
+
+    response = client.post(f"{V1}/transactions/batch", headers=headers, json={"operations": [
+        {"op": "create", "data": {"amount": 100, "type": "income", "description": "Salary"}},
+        {"op": "update", "id": existing, "data": {"amount": 25}},
+        {"op": "delete", "id": existing + 1000},
+    ]})
+
+    assert response.status_code == 404
+    assert response.json()["detail"] == {"operation": 2, "detail": "Transaction not found"}
+    # Neither the create nor the update survived, and the totals did not move.
+    assert transaction_ids() == [existing]
+    assert totals("a@example.com") == (Decimal("0.00"), Decimal("10.00"), Decimal("-10.00"))
+
+
+def test_batch_cannot_touch_another_users_transactions(client):
+    owner = register(client, "owner@example.com")
+    other = register(client, "other@example.com")
+    theirs = create(client, owner, 10)
+
+    for operation in ({"op": "update", "id": theirs, "data": {"amount": 1}}, {"op": "delete", "id": theirs}):
+        response = client.post(f"{V1}/transactions/batch", headers=other, json={"operations": [
+            {"op": "create", "data": {"amount": 5, "type": "expense", "description": "Lunch"}},
+            operation,
+        ]})
+        assert response.status_code == 403
+        assert response.json()["detail"]["operation"] == 1
+
+    assert transaction_ids() == [theirs]
+    assert totals("owner@example.com") == (Decimal("0.00"), Decimal("10.00"), Decimal("-10.00"))
+    assert totals("other@example.com") == (Decimal("0.00"), Decimal("0.00"), Decimal("0.00"))
+
+
+def test_single_writes_check_ownership(client):
+    owner = register(client, "owner@example.com")
+    other = register(client, "other@example.com")
+    theirs = create(client, owner, 10)
+
+    assert client.put(f"{V1}/transactions/transactions/{theirs}", headers=other,
+                      json={"amount": 1}).status_code == 403
+    assert client.delete(f"{V1}/transactions/transactions/{theirs}", headers=other).status_code == 403
+    assert client.delete(f"{V1}/transactions/transactions/{theirs + 1}", headers=other).status_code == 404
+    assert totals("owner@example.com")[1] == Decimal("10.00")
+
+
+def test_update_without_aggregate_fields_keeps_totals(client):
+    headers = register(client, "a@example.com")
+    transaction_id = create(client, headers, 10)
+
+    response = client.put(f"{V1}/transactions/transactions/{transaction_id}", headers=headers,
+                          json={"description": "Tea"})
+
+    assert response.status_code == 200
+    assert totals("a@example.com")[1] == Decimal("10.00")
+
+
+def test_writes_survive_a_missing_model(client, monkeypatch):
+    headers = register(client, "a@example.com")
+
+    async def unavailable(descriptions):
+        raise FileNotFoundError("model.joblib")
+
+    monkeypatch.setattr(prediction_service, "predict_with_version", unavailable)
+    created = create(client, headers, 10)
+    response = client.put(f"{V1}/transactions/transactions/{created}", headers=headers, json={"description": "Tea"})
+    assert response.status_code == 200, response.text
+    response = client.post(f"{V1}/transactions/batch", headers=headers, json={"operations": [
+        {"op": "create", "data": {"amount": 3, "type": "expense", "description": "Lunch"}},
+    ]})
+    assert response.status_code == 200, response.text
+
+    db = SessionLocal()
+    try:
+        assert [row.category for row in db.query(Transaction.category)] == [None, None]
+    finally:
+        db.close()
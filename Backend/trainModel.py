@@ -1,15 +1,110 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
 import pandas as pd
-from app.utils import clean_description
-from app.categorizer import Categorizer
+from app.utils import clean_descriptions
+from app.categorizer import Categorizer, CompactCategorizer, file_checksum
+
+
+def peak_rss_mb() -> float | None:
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux.
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1)
 
-# Load labeled transaction data
-df = pd.read_csv("data/sample_transactions.csv")
-df["clean_description"] = df["Description"].apply(clean_description)
 
-# Train model
+parser = argparse.ArgumentParser(description="Train the transaction categorizer")
+parser.add_argument("--data", default="data/sample_transactions.csv")
+parser.add_argument("--output", default="models/categorizer.pkl")
+parser.add_argument("--mode", choices=["full", "streaming"], default="full",
+                    help="full: TF-IDF + logistic regression in memory; streaming: hashed features + SGD over chunks")
+parser.add_argument("--chunksize", type=int, default=100_000)
+parser.add_argument("--epochs", type=int, default=3)
+parser.add_argument("--search", action="store_true", help="Cross-validated hyperparameter search (full mode)")
+parser.add_argument("--cv", type=int, default=5)
+parser.add_argument("--jobs", type=int, default=-1, help="Parallel workers for --search (-1 = all cores)")
+parser.add_argument("--compact", action="store_true",
+                    help="Also export the NumPy inference format (.npz next to --output; point MODEL_PATH at it)")
+parser.add_argument("--float32", action="store_true", help="Store compact weights as float32")
+parser.add_argument("--prune", type=float, default=0.0, help="Drop compact coefficients with |w| <= this")
+args = parser.parse_args()
+if args.compact and args.mode == "streaming":
+    parser.error("--compact needs a TF-IDF model (full mode)")
+
+started = time.perf_counter()
 categorizer = Categorizer()
-categorizer.train(df["clean_description"], df["Category"])
+report = {"mode": args.mode, "data": args.data}
+
+if args.mode == "streaming":
+    def chunks():
+        for chunk in pd.read_csv(args.data, usecols=["Description", "Category"], chunksize=args.chunksize):
+            chunk = chunk.dropna(subset=["Category"])
+            yield clean_descriptions(chunk["Description"]), chunk["Category"]
+
+    # partial_fit needs every label up front; this pass only reads the label column.
+    classes = sorted(set().union(*(
+        set(chunk["Category"].dropna())
+        for chunk in pd.read_csv(args.data, usecols=["Category"], chunksize=args.chunksize)
+    )))
+    report["rows"] = categorizer.train_streaming(chunks, classes, epochs=args.epochs) // args.epochs
+else:
+    # Load labeled transaction data
+    df = pd.read_csv(args.data)
+    df["clean_description"] = clean_descriptions(df["Description"])
+    report["rows"] = len(df)
+
+    min_class_size = int(df["Category"].value_counts().min())
+    if args.search and min_class_size >= 2:
+        best_params, best_score = categorizer.search(df["clean_description"], df["Category"],
+                                                     cv=min(args.cv, min_class_size), n_jobs=args.jobs)
+        report.update(best_params={k: str(v) for k, v in best_params.items()}, cv_score=best_score)
+    else:
+        if args.search:
+            print("Not enough samples per category for cross-validation, training with defaults.")
+        categorizer.train(df["clean_description"], df["Category"])
+
+report["train_seconds"] = round(time.perf_counter() - started, 3)
+report["peak_rss_mb"] = peak_rss_mb()
+
+# Save a versioned artifact, then publish it under the path the API's model registry watches.
+timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+base, ext = os.path.splitext(args.output)
+versioned_path = f"{base}-{timestamp}{ext}"
+categorizer.save(versioned_path)
+report["version"] = file_checksum(versioned_path)
+report["artifact"] = versioned_path
+with open(f"{versioned_path}.json", "w") as f:
+    json.dump(report, f, indent=2)
+
+tmp_path = f"{args.output}.tmp-{os.getpid()}"
+shutil.copyfile(versioned_path, tmp_path)
+os.replace(tmp_path, args.output)
+
+peak_rss = "n/a" if report["peak_rss_mb"] is None else f"{report['peak_rss_mb']} MB"
+print(f"Model trained and saved ({report['rows']} rows, {report['train_seconds']} s, "
+      f"peak RSS {peak_rss}, version {report['version']}).")
+if "cv_score" in report:
+    print(f"Best CV score {report['cv_score']:.3f} with {report['best_params']}")
 
-# Save model
-categorizer.save()
-print("Model trained and saved.")
+if args.compact:
+    compact_path = f"{base}-{timestamp}.npz"
+    categorizer.export_compact(compact_path, dtype="float32" if args.float32 else "float64", prune=args.prune)
+    # The compact engine must agree with the model it came from before it is published.
+    compact = CompactCategorizer()
+    compact.load(compact_path)
+    mismatches = int((compact.predict(df["clean_description"]) != categorizer.predict(df["clean_description"])).sum())
+    if mismatches:
+        print(f"Compact model disagrees on {mismatches} training rows; not published ({compact_path}).")
+    else:
+        tmp_path = f"{base}.npz.tmp-{os.getpid()}"
+        shutil.copyfile(compact_path, tmp_path)
+        os.replace(tmp_path, f"{base}.npz")
+        print(f"Compact model exported to {base}.npz ({os.path.getsize(compact_path) / 1024:.0f} KiB).")